@@ -0,0 +1 @@
+"""tvdbpy benchmarks."""
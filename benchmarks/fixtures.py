@@ -0,0 +1,114 @@
+"""Benchmark fixtures: the test data and synthetically scaled versions."""
+
+from __future__ import unicode_literals
+
+import copy
+import io
+import os
+import zipfile
+
+import xml.etree.ElementTree as ET
+
+
+TESTDATA_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.realpath(__file__))),
+    'tvdbpy', 'tests', 'testdata')
+
+UPDATES_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8" ?>\n<Data time="1376778001">\n')
+SERIES_UPDATE = '<Series><id>%d</id><time>%d</time></Series>\n'
+EPISODE_UPDATE = (
+    '<Episode><id>%d</id><Series>%d</Series><time>%d</time></Episode>\n')
+BANNER_UPDATE = (
+    '<Banner><Series>%d</Series><format>680x1000</format>'
+    '<path>posters/%d-1.jpg</path><time>%d</time><type>poster</type>'
+    '</Banner>\n')
+
+
+def read_testdata(filename):
+    """Return the raw content of a test data file."""
+    with open(os.path.join(TESTDATA_DIR, filename), 'rb') as f:
+        return f.read()
+
+
+def load_series_data(filename='80348.zip'):
+    """Return the parsed en.xml from a series zip in the test data."""
+    with zipfile.ZipFile(os.path.join(TESTDATA_DIR, filename)) as f:
+        return ET.fromstring(f.read('en.xml'))
+
+
+def make_zip(members):
+    """Return a deflated zip holding the (name, content) members."""
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as f:
+        for name, content in members:
+            f.writestr(name, content)
+    return output.getvalue()
+
+
+def _set_text(xml_data, tag, text):
+    elem = xml_data.find(tag)
+    if elem is None:
+        elem = ET.SubElement(xml_data, tag)
+    elem.text = text
+
+
+def scaled_series_data(episodes=10000):
+    """Return the 80348 series data, with its episodes cycled to `episodes`.
+
+    Episodes get new ids and are numbered in seasons of 100 episodes.
+
+    """
+    data = load_series_data()
+    template = data.findall('./Episode')
+    root = ET.Element('Data')
+    root.append(data.find('./Series'))
+    for i in range(episodes):
+        episode = copy.deepcopy(template[i % len(template)])
+        _set_text(episode, 'id', str(1000000 + i))
+        _set_text(episode, 'SeasonNumber', str(i // 100 + 1))
+        _set_text(episode, 'EpisodeNumber', str(i % 100 + 1))
+        root.append(episode)
+    return root
+
+
+def scaled_series_zip(episodes=10000):
+    """Return a series zip (as served by the API) with `episodes` episodes."""
+    data = scaled_series_data(episodes)
+    return make_zip([('en.xml', ET.tostring(data, encoding='utf-8'))])
+
+
+def scaled_updates_xml(entries=1000000, timestamp=1376700000):
+    """Yield chunks of an updates XML file with `entries` entries.
+
+    Entries are mostly episode updates, with a series and a banner
+    update every ten.
+
+    """
+    yield UPDATES_HEADER
+    chunk = []
+    for i in range(entries):
+        series_id = 70000 + i % 5000
+        time = timestamp + i % 86400
+        kind = i % 10
+        if kind == 0:
+            chunk.append(SERIES_UPDATE % (series_id, time))
+        elif kind == 9:
+            chunk.append(BANNER_UPDATE % (series_id, series_id, time))
+        else:
+            chunk.append(EPISODE_UPDATE % (1000000 + i, series_id, time))
+        if len(chunk) == 10000:
+            yield ''.join(chunk)
+            chunk = []
+    chunk.append('</Data>\n')
+    yield ''.join(chunk)
+
+
+def scaled_updates_zip(entries=1000000, timeframe='all'):
+    """Return an updates zip (as served by the API) with `entries` items."""
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as f:
+        with f.open('updates_%s.xml' % timeframe, 'w') as member:
+            for chunk in scaled_updates_xml(entries):
+                member.write(chunk.encode('utf-8'))
+    return output.getvalue()
@@ -0,0 +1,141 @@
+"""Model memory benchmark.
+
+Compares the bytes per object of the slotted, interned models against
+dict based objects keeping the raw field strings (as models used to),
+and the memory kept by a series with its episodes loaded lazily against
+building them all.
+
+Usage: python -m benchmarks.memory [copies] [episodes]
+
+"""
+
+from __future__ import print_function, unicode_literals
+
+import copy
+import gc
+import sys
+import tracemalloc
+
+from collections import defaultdict
+
+import xml.etree.ElementTree as ET
+
+from benchmarks.fixtures import scaled_series_data
+from benchmarks.parsing import LegacyEpisode, load_series_data
+from tvdbpy.helpers import BaseTvDB
+from tvdbpy.parsers import get_parser
+from tvdbpy.tvdb import Episode, Season, Series, Update
+
+
+UPDATE_XML = (
+    '<Episode><id>%s</id><Series>%s</Series><time>1234567890</time>'
+    '</Episode>')
+
+
+class LegacyUpdate(BaseTvDB):
+    """Dict based Update keeping the raw field strings."""
+
+    def __init__(self, xml_data, client=None):
+        super(LegacyUpdate, self).__init__(client=client)
+        self.id = self._elem_value(xml_data, 'id')
+        self.kind = xml_data.tag.lower()
+        self.series = self._elem_value(xml_data, 'Series')
+        self.season = self._elem_value(xml_data, 'SeasonNum')
+        self.path = self._elem_value(xml_data, 'path')
+        self.type = self._elem_value(xml_data, 'type')
+        self.format = self._elem_value(xml_data, 'format')
+        self.language = self._elem_value(xml_data, 'language')
+        self.timestamp = self._elem_value(xml_data, 'time')
+
+
+class ElementIndexedSeries(Series):
+    """Series indexing its lazy episodes by XML element (as it used to)."""
+
+    __slots__ = ()
+
+    def _load_episodes(self, data=None):
+        self._seasons = defaultdict(lambda: Season(self))
+        for xml_data in data.findall('./Episode'):
+            season = self._elem_value(xml_data, 'SeasonNumber', cast=int)
+            number = self._elem_value(xml_data, 'EpisodeNumber', cast=int)
+            self._seasons[season]._add_xml_data(number, xml_data)
+
+
+def eager_series(data):
+    return [Episode(xml_data) for xml_data in data.findall('./Episode')]
+
+
+def lazy_series(cls, build=False):
+    def load(data):
+        series = cls(data.find('./Series'))
+        series._load_episodes(data)
+        if build:
+            for season in series.seasons.values():
+                for number in season:
+                    season[number]
+        return series
+    return load
+
+
+def kept_memory(load, parser, content):
+    """Return the bytes still allocated by load(data), once data is freed."""
+    gc.collect()
+    tracemalloc.start()
+    data = parser.fromstring(content)
+    result = load(data)
+    del data
+    gc.collect()
+    kept = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return kept
+
+
+def measure(cls, elements):
+    """Return the bytes allocated per cls instance built from elements."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    items = [cls(xml_data) for xml_data in elements]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # exclude the list holding the items
+    return (after - before - sys.getsizeof(items)) / float(len(items))
+
+
+def series_main(episodes=5000):
+    content = ET.tostring(scaled_series_data(episodes), encoding='utf-8')
+    print('%d episodes series, memory kept once parsed' % episodes)
+    for parser in ('etree', 'flat'):
+        for label, load in (
+                ('all episodes built', eager_series),
+                ('lazy, element index', lazy_series(ElementIndexedSeries)),
+                ('lazy, packed fields', lazy_series(Series)),
+                ('lazy, then all built', lazy_series(Series, build=True))):
+            kept = kept_memory(load, get_parser(parser), content)
+            print('%-6s %-22s %8.1f MiB' % (
+                parser, label, kept / (1024.0 * 1024)))
+
+
+def main(copies=50, series_episodes=5000):
+    data = load_series_data()
+    # independent copies, so values are not shared between parses
+    episodes = [copy.deepcopy(e)
+                for _ in range(copies) for e in data.findall('./Episode')]
+    updates = [ET.fromstring(UPDATE_XML % (e.findtext('id'),
+                                           e.findtext('seriesid')))
+               for e in episodes]
+
+    print('%d objects per run' % len(episodes))
+    for name, legacy, compact, elements in (
+            ('Episode', LegacyEpisode, Episode, episodes),
+            ('Update', LegacyUpdate, Update, updates)):
+        before = measure(legacy, elements)
+        after = measure(compact, elements)
+        print('%-8s %8.1f -> %8.1f bytes/object (%.0f%% less)' % (
+            name, before, after, 100 * (1 - after / before)))
+    print()
+    series_main(series_episodes)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
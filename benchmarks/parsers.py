@@ -0,0 +1,81 @@
+"""XML parser backends benchmark.
+
+Compares the parser backends (ElementTree, lxml if installed and the
+flat records parser) on the scaled series and updates fixtures: parsing
+the document, and parsing it and building the models.
+
+Usage: python -m benchmarks.parsers [episodes] [updates] [repeat]
+
+"""
+
+from __future__ import print_function, unicode_literals
+
+import sys
+import timeit
+
+import xml.etree.ElementTree as ET
+
+from benchmarks.fixtures import scaled_series_data, scaled_updates_xml
+from tvdbpy.parsers import FlatParser, PARSERS, get_parser
+from tvdbpy.tvdb import Episode, Update
+
+
+def available_parsers():
+    parsers = []
+    for name in sorted(PARSERS):
+        try:
+            parsers.append(get_parser(name))
+        except ImportError:
+            print('%s: not available' % name)
+    return parsers
+
+
+def check_same_output(parsers, content, cls, path):
+    expected = None
+    for parser in parsers:
+        # the flat parser must not fall back for these fixtures
+        if isinstance(parser, FlatParser):
+            parser._parse_flat(content)
+        items = [cls(xml_data) for xml_data in
+                 parser.fromstring(content).findall(path)]
+        values = [[getattr(item, attr) for attr, _, _ in cls._fields]
+                  for item in items]
+        if expected is None:
+            expected = values
+        elif values != expected:
+            raise AssertionError('%s parser output differs' % parser.name)
+
+
+def report(name, content, parsers, cls, path, repeat):
+    print('%s (%.1f MiB)' % (name, len(content) / (1024.0 * 1024)))
+    for parser in parsers:
+        def parse():
+            parser.fromstring(content)
+
+        def parse_and_build():
+            for xml_data in parser.fromstring(content).findall(path):
+                cls(xml_data)
+
+        parse_time = min(timeit.repeat(parse, number=1, repeat=repeat))
+        build_time = min(
+            timeit.repeat(parse_and_build, number=1, repeat=repeat))
+        print('  %-6s parse %9.1f ms   parse + models %9.1f ms' % (
+            parser.name, parse_time * 1000, build_time * 1000))
+
+
+def main(episodes=10000, updates=200000, repeat=5):
+    parsers = available_parsers()
+    series = ET.tostring(scaled_series_data(episodes), encoding='utf-8')
+    updates_content = ''.join(scaled_updates_xml(updates)).encode('utf-8')
+    check_same_output(parsers, series, Episode, './Episode')
+    check_same_output(parsers, updates_content, Update, './')
+
+    print('best of %d runs' % repeat)
+    report('series, %d episodes' % episodes, series, parsers, Episode,
+           './Episode', repeat)
+    report('updates, %d entries' % updates, updates_content, parsers,
+           Update, './', repeat)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
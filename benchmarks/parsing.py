@@ -0,0 +1,102 @@
+"""Model construction benchmark.
+
+Compares building Episode objects with the single-pass field schema
+against looking up each field with its own find() call (and parsing the
+air date on access).
+
+Usage: python -m benchmarks.parsing [repeat]
+
+"""
+
+from __future__ import print_function, unicode_literals
+
+import sys
+import timeit
+
+from datetime import datetime
+
+from benchmarks.fixtures import load_series_data
+from tvdbpy.helpers import BaseTvDB
+from tvdbpy.tvdb import Episode
+
+
+class LegacyEpisode(BaseTvDB):
+    """Episode loading each field with its own find() call."""
+
+    def __init__(self, xml_data, series=None, client=None):
+        super(LegacyEpisode, self).__init__(client=client)
+        self._series = series
+        self.id = self._elem_value(xml_data, 'id')
+        self.imdb_id = self._elem_value(xml_data, 'IMDB_ID')
+        self.series_id = self._elem_value(xml_data, 'seriesid')
+        self.number = self._elem_value(xml_data, 'EpisodeNumber', cast=int)
+        self.season = self._elem_value(xml_data, 'SeasonNumber', cast=int)
+        self.name = self._elem_value(xml_data, 'EpisodeName')
+        self.overview = self._elem_value(xml_data, 'Overview')
+        self.guest_stars = self._elem_list_value(xml_data, 'GuestStars')
+        self.director = self._elem_value(xml_data, 'Director')
+        self.writers = self._elem_list_value(xml_data, 'Writer')
+        self.language = self._elem_value(xml_data, 'Language')
+        self._image = self._elem_value(xml_data, 'filename')
+        self._first_aired = self._elem_value(xml_data, 'FirstAired')
+        self.rating = self._elem_value(xml_data, 'Rating', cast=float)
+        self.rating_count = self._elem_value(xml_data, 'RatingCount', cast=int)
+
+    @property
+    def first_aired(self):
+        res = None
+        if self._first_aired is not None:
+            res = datetime.strptime(self._first_aired, "%Y-%m-%d").date()
+        return res
+
+
+def check_same_output(episodes):
+    attrs = [attr.lstrip('_') for attr, _, _ in Episode._fields
+             if attr != '_image']
+    for xml_data in episodes:
+        expected = LegacyEpisode(xml_data)
+        result = Episode(xml_data)
+        for attr in attrs:
+            if getattr(result, attr) != getattr(expected, attr):
+                raise AssertionError('Episode.%s differs' % attr)
+
+
+def report(name, funcs, count, repeat):
+    print(name)
+    results = []
+    for label, func in funcs:
+        best = min(timeit.repeat(func, number=1, repeat=repeat))
+        results.append(best)
+        print('  %-16s %8.3f ms  %8.2f us/episode' % (
+            label, best * 1000, best * 1e6 / count))
+    print('  speedup: %.2fx' % (results[0] / results[1]))
+
+
+def main(repeat=20):
+    data = load_series_data()
+    episodes = data.findall('./Episode')
+    check_same_output(episodes)
+
+    def build(cls):
+        def _build():
+            for xml_data in episodes:
+                cls(xml_data)
+        return _build
+
+    def build_and_read_dates(cls):
+        def _build():
+            for xml_data in episodes:
+                cls(xml_data).first_aired
+        return _build
+
+    print('%d episodes, best of %d runs' % (len(episodes), repeat))
+    for name, func in (('construction', build),
+                       ('construction + first_aired',
+                        build_and_read_dates)):
+        report(name, (('find per field', func(LegacyEpisode)),
+                      ('single pass', func(Episode))),
+               len(episodes), repeat)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,101 @@
+"""Title search index benchmark.
+
+Indexes synthetic series titles (random word combinations, following
+a Zipf distribution over a 20k words vocabulary) and times
+lookups: prefix queries, misspelled queries only matched by similarity,
+and queries matching nothing.
+
+Usage: python -m benchmarks.search [titles] [repeat]
+
+"""
+
+from __future__ import print_function, unicode_literals
+
+import itertools
+import random
+import sys
+import timeit
+
+from tvdbpy.search import SearchIndex
+
+
+WORDS = (
+    'the a of and in night day dark star american family house show '
+    'life man woman world new story last first game city love war time '
+    'black white red blue king queen lost secret great little big old '
+    'young doctor law order street island river mountain ocean space '
+    'shadow light fire ice blood gold silver iron stone wild dead living '
+    'chronicles adventures tales legends mysteries files diaries '
+    'brothers sisters friends neighbors strangers heroes hunters kings'
+).split()
+
+QUERIES = (
+    'th',
+    'the night',
+    'the nigth',
+    'dark star',
+    'amercan famly',
+    'xyzzy plugh',
+)
+
+
+SYLLABLES = (
+    'ka ri to ne mo la su vi den bar cor mal tin gro fel pra ston wick '
+    'ash bel cra dor ell fin gar hol jun kel lor mir nor pel quin ros '
+    'sel tor ul ven wes yar zan'
+).split()
+
+
+class Title(object):
+    """Indexed item stand-in."""
+
+    def __init__(self, series_id, name):
+        self.id = series_id
+        self.name = name
+
+
+def vocabulary(rng, size=20000):
+    """Return the common words followed by made up ones, by frequency."""
+    words = list(WORDS)
+    seen = set(words)
+    while len(words) < size:
+        word = ''.join(rng.choice(SYLLABLES)
+                       for _ in range(rng.randint(2, 3)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+
+def synthetic_titles(count, seed=1):
+    """Return titles of 1 to 5 words, with Zipf distributed words."""
+    rng = random.Random(seed)
+    words = vocabulary(rng)
+    cum_weights = list(itertools.accumulate(
+        1.0 / rank for rank in range(1, len(words) + 1)))
+    titles = []
+    for i in range(count):
+        title = rng.choices(
+            words, cum_weights=cum_weights, k=rng.randint(1, 5))
+        titles.append(Title(str(i), ' '.join(
+            word.capitalize() for word in title)))
+    return titles
+
+
+def main(titles=200000, repeat=20):
+    index = SearchIndex()
+    start = timeit.default_timer()
+    index.warm(synthetic_titles(titles))
+    print('%d titles indexed in %.1f s; best of %d runs' % (
+        titles, timeit.default_timer() - start, repeat))
+    for query in QUERIES:
+        best = min(timeit.repeat(
+            lambda: index.lookup(query), number=1, repeat=repeat))
+        results = index.lookup(query)
+        print('  %-16s %7.3f ms  %2d results, first: %s' % (
+            repr(query), best * 1000, len(results),
+            results[0].name if results else '-'))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,127 @@
+"""Local fake TvDB API server for the benchmarks.
+
+Usage: python -m benchmarks.server [port]
+
+"""
+
+from __future__ import print_function, unicode_literals
+
+import sys
+import threading
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    import urllib.parse as urlparse
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    import urlparse
+
+from benchmarks.fixtures import read_testdata
+
+
+API_KEY = 'BENCHMARK'
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class FakeTvDBHandler(BaseHTTPRequestHandler):
+    """Answer GET requests from the server routes."""
+
+    # keep-alive, so clients reuse their pooled connections
+    protocol_version = 'HTTP/1.1'
+    # headers and body are written apart, avoid delayed ACK stalls
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        path = urlparse.urlsplit(self.path).path
+        route = self.server.routes.get(path)
+        if route is None:
+            self.send_response(404)
+            self.send_header('Content-Type', 'text/plain')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        content_type, body = route
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeTvDBServer(object):
+    """Local HTTP server answering TvDB API paths from fixtures.
+
+    Routes map API paths (relative to `url`, without the query string) to
+    (content type, body) pairs; unknown paths get a 404.
+
+    """
+
+    def __init__(self, host='127.0.0.1', port=0):
+        super(FakeTvDBServer, self).__init__()
+        self.routes = {}
+        self._server = ThreadingHTTPServer((host, port), FakeTvDBHandler)
+        self._server.routes = self.routes
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return 'http://%s:%s/api/' % (host, port)
+
+    def add(self, path, body, content_type='text/xml'):
+        """Serve body for the given API path."""
+        self.routes['/api/' + path] = (content_type, body)
+
+    def add_testdata(self, api_key=API_KEY):
+        """Serve the test data files on their API paths."""
+        for path, filename, content_type in (
+                ('GetSeries.php', 'getseries.xml', 'text/xml'),
+                ('%s/series/80348/en.xml', 'series.xml', 'text/xml'),
+                ('%s/series/80348/all/en.zip', '80348.zip', 'application/zip'),
+                ('%s/episodes/332179/en.xml', 'episode.xml', 'text/xml'),
+                ('%s/updates/updates_day.zip', 'updates_day.zip',
+                 'application/zip'),
+                ('%s/updates/updates_month.zip', 'updates_month.zip',
+                 'application/zip')):
+            if '%s' in path:
+                path = path % api_key
+            self.add(path, read_testdata(filename), content_type)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main(port=8000):
+    server = FakeTvDBServer(port=port)
+    server.add_testdata()
+    print('Serving the test data at %s (API key: %s)' % (server.url, API_KEY))
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,231 @@
+"""Parsing and client hot paths benchmark suite.
+
+Runs each case against a local fake TvDB server serving the test data
+and synthetically scaled fixtures (a 10k episodes series and a million
+entries updates_all.zip by default), reporting throughput, latency
+percentiles and peak (Python heap) memory. Results can be saved as a
+baseline and later runs compared against it; the comparison exits with
+status 1 if any case median latency regressed past the tolerance.
+
+Usage: python -m benchmarks.suite [--quick] [--repeat N] [--cases NAME,...]
+                                  [--save PATH] [--compare PATH]
+
+"""
+
+from __future__ import print_function, unicode_literals
+
+import argparse
+import json
+import platform
+import sys
+import timeit
+import tracemalloc
+
+from collections import OrderedDict
+
+import xml.etree.ElementTree as ET
+
+from benchmarks.fixtures import (
+    read_testdata,
+    scaled_series_data,
+    scaled_series_zip,
+    scaled_updates_zip,
+)
+from benchmarks.server import API_KEY, FakeTvDBServer
+from tvdbpy import snapshot
+from tvdbpy.table import EpisodeTable
+from tvdbpy.tvdb import Episode, Series, TvDB
+
+
+# series id serving the scaled series fixture
+SCALED_SERIES_ID = 1
+
+SCALES = {
+    'full': {'episodes': 10000, 'updates': 1000000, 'repeat': 5},
+    'quick': {'episodes': 1000, 'updates': 20000, 'repeat': 5},
+}
+
+
+def percentile(values, percent):
+    """Return the nearest-rank percentile of the values."""
+    values = sorted(values)
+    index = max(0, int(round(percent / 100.0 * len(values))) - 1)
+    return values[min(index, len(values) - 1)]
+
+
+class Case(object):
+    """Benchmark case: func() runs it once and returns the items handled."""
+
+    def __init__(self, name, func):
+        super(Case, self).__init__()
+        self.name = name
+        self.func = func
+
+    def run(self, repeat):
+        """Return the case results over `repeat` timed runs (and a warmup)."""
+        items = self.func()
+        timings = []
+        for _ in range(repeat):
+            start = timeit.default_timer()
+            self.func()
+            timings.append(timeit.default_timer() - start)
+        median = percentile(timings, 50)
+        return {
+            'runs': repeat,
+            'items': items,
+            'items_per_second': items / median if median else 0.0,
+            'p50_ms': median * 1000,
+            'p90_ms': percentile(timings, 90) * 1000,
+            'p99_ms': percentile(timings, 99) * 1000,
+            'peak_mib': self.peak_memory() / (1024.0 * 1024),
+        }
+
+    def peak_memory(self):
+        """Return the peak bytes allocated during a (traced) run."""
+        tracemalloc.start()
+        try:
+            self.func()
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+
+def make_cases(server, scale):
+    """Return the benchmark cases, using the server for client calls."""
+    client = TvDB(api_key=API_KEY)
+    client._base_api_url = server.url
+
+    server.add_testdata()
+    server.add('%s/series/%s/all/en.zip' % (API_KEY, SCALED_SERIES_ID),
+               scaled_series_zip(scale['episodes']), 'application/zip')
+    server.add('%s/updates/updates_all.zip' % API_KEY,
+               scaled_updates_zip(scale['updates']), 'application/zip')
+
+    data = scaled_series_data(scale['episodes'])
+    episodes = data.findall('./Episode')
+    series = ET.fromstring(read_testdata('series.xml')).find('./Series')
+
+    def build_series():
+        return len([Series(series) for _ in range(1000)])
+
+    def build_episodes():
+        return len([Episode(xml_data) for xml_data in episodes])
+
+    def parse_multiple_entries():
+        return len(client._parse_multiple_entries(data, Episode, './Episode'))
+
+    def get_series():
+        client.get_series_by_id(80348)
+        return 1
+
+    def get_series_extended():
+        result = client.get_series_by_id(SCALED_SERIES_ID, extended=True)
+        return sum(len(season) for season in result.seasons.values())
+
+    def updated():
+        return len(client.updated(TvDB.ALL))
+
+    def iter_updated():
+        return sum(1 for _ in client.iter_updated(TvDB.ALL))
+
+    scaled_series = Series(data.find('./Series'))
+    scaled_series._load_episodes(data)
+    series_snapshot = snapshot.dumps(scaled_series)
+
+    def snapshot_dumps():
+        snapshot.dumps(scaled_series)
+        return len(episodes)
+
+    def season_rating_means():
+        episode_table = EpisodeTable.from_xml(data)
+        for group in episode_table.group_by_season().values():
+            group.mean('rating')
+        return len(episode_table)
+
+    def snapshot_loads():
+        result = snapshot.loads(series_snapshot)
+        return sum(len([season[number] for number in season])
+                   for season in result.seasons.values())
+
+    return [
+        Case('series_construction', build_series),
+        Case('episode_construction', build_episodes),
+        Case('parse_multiple_entries', parse_multiple_entries),
+        Case('get_series', get_series),
+        Case('get_series_extended', get_series_extended),
+        Case('updated', updated),
+        Case('iter_updated', iter_updated),
+        Case('snapshot_dumps', snapshot_dumps),
+        Case('snapshot_loads', snapshot_loads),
+        Case('season_rating_means', season_rating_means),
+    ]
+
+
+def report(results, baseline=None, tolerance=0.2):
+    """Print the results table; return the names of regressed cases."""
+    regressions = []
+    print('%-24s %10s %12s %10s %10s %10s %10s' % (
+        'case', 'items', 'items/s', 'p50 ms', 'p90 ms', 'p99 ms',
+        'peak MiB'))
+    for name, result in results.items():
+        line = '%-24s %10d %12.0f %10.2f %10.2f %10.2f %10.1f' % (
+            name, result['items'], result['items_per_second'],
+            result['p50_ms'], result['p90_ms'], result['p99_ms'],
+            result['peak_mib'])
+        previous = (baseline or {}).get(name)
+        if previous is not None:
+            change = result['p50_ms'] / previous['p50_ms'] - 1
+            line += '  %+6.1f%% p50' % (change * 100)
+            if change > tolerance:
+                line += '  REGRESSION'
+                regressions.append(name)
+        print(line)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--quick', action='store_true',
+                        help='use smaller scaled fixtures')
+    parser.add_argument('--repeat', type=int, help='timed runs per case')
+    parser.add_argument('--cases', help='comma separated cases to run')
+    parser.add_argument('--save', metavar='PATH',
+                        help='save the results as a baseline')
+    parser.add_argument('--compare', metavar='PATH',
+                        help='compare the results with a saved baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='p50 latency increase flagged as regression')
+    args = parser.parse_args(argv)
+
+    scale_name = 'quick' if args.quick else 'full'
+    scale = SCALES[scale_name]
+    repeat = args.repeat or scale['repeat']
+    selected = args.cases.split(',') if args.cases else None
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            saved = json.load(f)
+        if saved['scale'] != scale_name:
+            parser.error('baseline was run with the %s scale' % saved['scale'])
+        baseline = saved['results']
+
+    results = OrderedDict()
+    with FakeTvDBServer() as server:
+        print('%s scale: %d episodes series, %d updates; %d runs per case' % (
+            scale_name, scale['episodes'], scale['updates'], repeat))
+        for case in make_cases(server, scale):
+            if selected is None or case.name in selected:
+                results[case.name] = case.run(repeat)
+    regressions = report(results, baseline, args.tolerance)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'scale': scale_name,
+                       'python': platform.python_version(),
+                       'platform': platform.platform(),
+                       'results': results}, f, indent=2)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -10,5 +10,14 @@ setup(name='tvdbpy',
       author_email='mbordese@gmail.com',
       url='http://github.com/matiasb/tvdbpy',
       license='BSD',
-      packages=find_packages(),
+      packages=find_packages(exclude=['benchmarks', 'benchmarks.*']),
+      install_requires=[
+          # concurrent.futures backport, for batch calls
+          'futures; python_version < "3"',
+      ],
+      extras_require={
+          'async': ['aiohttp'],
+          'lxml': ['lxml'],
+          'numpy': ['numpy'],
+      },
 )
@@ -0,0 +1,281 @@
+"""asyncio TvDB API client.
+
+Requires aiohttp for the default transport.
+
+"""
+
+import asyncio
+
+from collections import OrderedDict
+from timeit import default_timer as timer
+
+from urllib.parse import urljoin
+
+from tvdbpy.errors import APIResponseError
+from tvdbpy.helpers import api_key_required
+from tvdbpy.observers import REQUEST
+from tvdbpy.tvdb import Episode, SearchResult, Series, TvDB
+
+
+class AsyncResponse(object):
+    """Fully read response returned by async transports."""
+
+    def __init__(self, status_code, headers, content):
+        super(AsyncResponse, self).__init__()
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+
+class AsyncHTTPTransport(object):
+    """Pooled aiohttp session used to talk to the TvDB API."""
+
+    def __init__(self, pool_size=100, timeout=10, session=None):
+        super(AsyncHTTPTransport, self).__init__()
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.session = session
+
+    def _get_session(self):
+        if self.session is None:
+            import aiohttp
+            connector = aiohttp.TCPConnector(limit=self.pool_size)
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self.session
+
+    async def get(self, url, params=None, **kwargs):
+        """Do a GET request to the given url using the pooled session."""
+        session = self._get_session()
+        async with session.get(url, params=params, **kwargs) as response:
+            content = await response.read()
+            return AsyncResponse(response.status, response.headers, content)
+
+    async def close(self):
+        """Release pooled connections."""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+
+class AsyncTvDB(object):
+    """asyncio TvDB API client.
+
+    Mirrors the TvDB API, running requests concurrently (bounded by
+    `concurrency`, and by the `rate_limiter` token bucket if set) over a
+    shared connection pool. Responses are parsed by a
+    regular TvDB client, which is also set as the client of the returned
+    items (so their lazy lookups are blocking). If a `client` is given,
+    the `observers` and `language` are set on it.
+
+    """
+
+    def __init__(self, api_key=None, transport=None, concurrency=10,
+                 client=None, observers=None, rate_limiter=None,
+                 language=None):
+        super(AsyncTvDB, self).__init__()
+        self._api_key = api_key
+        self._rate_limiter = rate_limiter
+        if transport is None:
+            transport = AsyncHTTPTransport()
+        self._transport = transport
+        self._concurrency = concurrency
+        # (event loop, semaphore), created in the running loop on first use
+        self._semaphore = None
+        self._flights = {}
+        if client is None:
+            client = TvDB(
+                api_key=api_key, observers=observers, language=language)
+        else:
+            for observer in observers or []:
+                client.add_observer(observer)
+            if language is not None:
+                client.language = language
+        self._client = client
+
+    def add_observer(self, observer):
+        """Call observer with each instrumentation Event."""
+        self._client.add_observer(observer)
+
+    def remove_observer(self, observer):
+        self._client.remove_observer(observer)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        await self._transport.close()
+
+    def _get_semaphore(self):
+        """Return the requests semaphore of the running event loop.
+
+        Semaphores are bound to the loop they are first waited in (before
+        Python 3.10, to the current loop when created), so the client may
+        be built outside of the loop running it.
+
+        """
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore[0] is not loop:
+            self._semaphore = (loop, asyncio.Semaphore(self._concurrency))
+        return self._semaphore[1]
+
+    async def _run_blocking(self, func, *args):
+        """Run func in the default executor, off the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, func, *args)
+
+    async def _get(self, path, content_type, **params):
+        """Do a GET request to the given path; return the payload."""
+        url = urljoin(self._client._base_api_url, path)
+        if self._rate_limiter is not None:
+            delay = self._rate_limiter.reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        async with self._get_semaphore():
+            start = timer()
+            response = await self._transport.get(url, params=params)
+            # responses are read whole, wait/transfer times are unknown
+            self._client._emit(
+                REQUEST, path=path, status=response.status_code,
+                bytes=len(response.content or b''), elapsed=timer() - start,
+                wait=None, transfer=None)
+
+        if not response.ok:
+            raise APIResponseError("Status code: %s" % response.status_code)
+
+        response_content_type = response.headers.get('content-type')
+        if content_type not in response_content_type:
+            raise APIResponseError("Content-type: %s" % response_content_type)
+
+        return response.content
+
+    async def _single_flight(self, key, factory):
+        """Await factory(), sharing in-flight calls with the same key."""
+        future = self._flights.get(key)
+        if future is None:
+            future = asyncio.ensure_future(factory())
+            self._flights[key] = future
+            future.add_done_callback(lambda f: self._flights.pop(key, None))
+        # a cancelled caller must not cancel the shared call
+        return await asyncio.shield(future)
+
+    async def _get_xml_data(self, path, **params):
+        """Do a GET request expecting XML data.
+
+        Concurrent requests for the same path and params share a single
+        request and parse; the returned data must not be modified.
+
+        """
+        async def fetch():
+            content = await self._get(path, 'text/xml', **params)
+            return self._client._parser.fromstring(content)
+        key = (path, tuple(sorted(params.items())))
+        return await self._single_flight(key, fetch)
+
+    async def _get_zipped_xml_data(self, path, filename):
+        """Do a GET request expecting a zipped XML file.
+
+        Concurrent requests share a single request and parse, as in
+        _get_xml_data. The payload is decompressed and parsed in the
+        default executor, so it does not block the event loop.
+
+        """
+        async def fetch():
+            content = await self._get(path, 'application/zip')
+            return await self._run_blocking(
+                self._client._unzip_xml, content, filename, path)
+        return await self._single_flight((path, filename), fetch)
+
+    async def search(self, title, language=None):
+        """Search for series with the specified title."""
+        params = {'seriesname': title}
+        language = language or self._client.language
+        if language:
+            params['language'] = language
+        response = await self._get_xml_data('GetSeries.php', **params)
+        return self._client._parse_multiple_entries(
+            response, SearchResult, './Series')
+
+    @api_key_required
+    async def get_series_by_id(self, series_id, extended=False,
+                               language=None):
+        """Get Series detail by series id."""
+        language = self._client._language(language)
+        path = self._client._series_path(
+            series_id, extended=extended, language=language)
+        if extended:
+            data = await self._get_zipped_xml_data(path, '%s.xml' % language)
+            # building the seasons and episodes blocks too
+            series = await self._run_blocking(
+                self._client._parse_full_series, data)
+        else:
+            response = await self._get_xml_data(path)
+            series = self._client._parse_entry(response, Series, './Series')
+        return series
+
+    @api_key_required
+    async def get_series_languages(self, series_id, languages,
+                                   extended=False):
+        """Get Series details in several languages concurrently.
+
+        Return an OrderedDict mapping each language to its series; each
+        variant is requested apart.
+
+        """
+        languages = list(OrderedDict.fromkeys(languages))
+        results = await asyncio.gather(*[
+            self.get_series_by_id(series_id, extended, language)
+            for language in languages])
+        return OrderedDict(zip(languages, results))
+
+    @api_key_required
+    async def get_episode_by_id(self, episode_id, language=None):
+        """Get Episode details by episode id."""
+        path = self._client._episode_path(episode_id, language)
+        response = await self._get_xml_data(path)
+        return self._client._parse_entry(response, Episode, './Episode')
+
+    @api_key_required
+    async def get_episode(self, series_id, season, number, language=None):
+        """Get Episode details by season/number."""
+        path = self._client._episode_number_path(
+            series_id, season, number, language)
+        response = await self._get_xml_data(path)
+        return self._client._parse_entry(response, Episode, './Episode')
+
+    @api_key_required
+    async def get_series_episodes(self, series_id, keys, language=None):
+        """Get Episode details for several (season, number) pairs."""
+        series = await self.get_series_by_id(
+            series_id, extended=True, language=language)
+        if series is None:
+            return [None for key in keys]
+        return series.get_episodes(keys)
+
+    @api_key_required
+    async def updated(self, timeframe=None):
+        """Get details about updated items in a given timeframe."""
+        if timeframe is None:
+            timeframe = TvDB.DAY
+
+        path = self._client._updates_path(timeframe)
+        data = await self._get_zipped_xml_data(
+            path, 'updates_%s.xml' % timeframe)
+        return await self._run_blocking(self._client._parse_updates, data)
+
+    async def updated_since(self, timestamp, kind=None):
+        """Get updated item ids since a given timestamp."""
+        if kind is None:
+            kind = TvDB.ALL
+
+        path = self._client._updates_since_path(timestamp, kind)
+        response = await self._get_xml_data(path)
+        return self._client._parse_updates_since(response)
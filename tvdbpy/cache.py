@@ -0,0 +1,522 @@
+"""Response caches for the TvDB API client."""
+
+from __future__ import unicode_literals
+
+import fnmatch
+import io
+import mmap
+import os
+import shutil
+import threading
+import time
+
+from collections import OrderedDict
+
+try:
+    from urllib.parse import urlencode
+except ImportError:
+    from urllib import urlencode
+
+
+# (path pattern, seconds) pairs, first match wins
+DEFAULT_TTLS = (
+    ('Updates.php*', 60),
+    ('*/updates/*', 10 * 60),
+    ('GetSeries.php*', 60 * 60),
+    ('*/all/*.zip', 24 * 60 * 60),
+    ('*', 6 * 60 * 60),
+)
+
+
+class MappedFile(io.RawIOBase):
+    """Read-only binary file object over a memory map."""
+
+    def __init__(self, mapped):
+        super(MappedFile, self).__init__()
+        self.mapped = mapped
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            return self.mapped.read()
+        return self.mapped.read(size)
+
+    def readinto(self, buf):
+        data = self.mapped.read(len(buf))
+        buf[:len(data)] = data
+        return len(data)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        self.mapped.seek(offset, whence)
+        return self.mapped.tell()
+
+    def tell(self):
+        return self.mapped.tell()
+
+    def close(self):
+        if not self.closed:
+            self.mapped.close()
+        super(MappedFile, self).close()
+
+
+def open_mapped(path):
+    """Return a read-only, memory mapped file object for path."""
+    with open(path, 'rb') as f:
+        try:
+            return MappedFile(
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        except ValueError:
+            # empty files can not be mapped
+            return io.BytesIO(f.read())
+
+
+class CacheEntry(object):
+    """Cached API response payload.
+
+    The payload is held as bytes (`content`), as a seekable binary file
+    (`file`, such as a spooled response body) or as a file on disk
+    (`path`); `open` reads it without loading it in memory when possible.
+
+    `etag` and `last_modified` hold the response validators, used to
+    revalidate expired entries with a conditional request.
+
+    """
+
+    def __init__(self, content, content_type, expires=None, etag=None,
+                 last_modified=None, file=None, path=None, size=None):
+        super(CacheEntry, self).__init__()
+        self._content = content
+        self.file = file
+        self.path = path
+        # files opened for the payload on disk, see close
+        self._opened = []
+        self._size = size
+        self.content_type = content_type
+        self.expires = expires
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @property
+    def content(self):
+        """Return the payload bytes."""
+        if self._content is not None:
+            return self._content
+        if self.file is not None:
+            return self.open().read()
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    @property
+    def size(self):
+        if self._content is not None:
+            return len(self._content)
+        if self._size is None:
+            if self.file is not None:
+                self.file.seek(0, os.SEEK_END)
+                self._size = self.file.tell()
+            else:
+                self._size = os.path.getsize(self.path)
+        return self._size
+
+    def open(self):
+        """Return a binary file object reading the payload from the start.
+
+        Payloads on disk are memory mapped (and unmapped by close); a
+        file payload is returned itself (so it should not be read
+        concurrently).
+
+        """
+        if self._content is not None:
+            return io.BytesIO(self._content)
+        if self.file is not None:
+            self.file.seek(0)
+            return self.file
+        mapped = open_mapped(self.path)
+        self._opened.append(mapped)
+        return mapped
+
+    def load(self):
+        """Keep the payload in memory, as bytes."""
+        if self._content is None:
+            self._content = self.content
+            self.close()
+            self.path = None
+
+    def close(self):
+        """Close the payload file (eg. a spooled response body), if any.
+
+        The files returned by open for a payload on disk are closed too.
+
+        """
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        while self._opened:
+            self._opened.pop().close()
+
+    @property
+    def has_validators(self):
+        return self.etag is not None or self.last_modified is not None
+
+    def is_fresh(self, now):
+        return self.expires is None or now < self.expires
+
+    def validator_headers(self):
+        """Return the headers to revalidate this entry."""
+        headers = {}
+        if self.etag is not None:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified is not None:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class CacheStats(object):
+    """Hit/miss/eviction counters for a cache."""
+
+    def __init__(self):
+        super(CacheStats, self).__init__()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.revalidations = 0
+
+    def as_dict(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'revalidations': self.revalidations,
+        }
+
+
+class BaseCache(object):
+    """Common interface for response caches.
+
+    Entries are kept in least-recently-used order and evicted once the
+    cache holds more than `max_entries` entries or `max_bytes` bytes of
+    payload (either limit may be None for unbounded).
+
+    The data parsed from the payloads (eg. a series full data) may be kept
+    too, in memory only, for the `max_parsed` most recently used entries;
+    it is not counted in `max_bytes`, as parsed data is several times the
+    size of its payload.
+
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024,
+                 ttls=DEFAULT_TTLS, clock=time.time, max_parsed=8):
+        super(BaseCache, self).__init__()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_parsed = max_parsed
+        self.ttls = ttls
+        self.stats = CacheStats()
+        self._clock = clock
+        self._lock = threading.RLock()
+        self._parsed = OrderedDict()
+
+    @staticmethod
+    def make_key(path, params=None):
+        """Return the cache key for an API path and its query params."""
+        key = path
+        if params:
+            key = '%s?%s' % (path, urlencode(sorted(params.items())))
+        return key
+
+    def ttl_for(self, path):
+        """Return the time to live (in seconds) for the given API path."""
+        for pattern, ttl in self.ttls:
+            if fnmatch.fnmatch(path, pattern):
+                return ttl
+        return None
+
+    def is_fresh(self, entry):
+        return entry.is_fresh(self._clock())
+
+    def get(self, key, stale=False):
+        """Return the fresh entry for key, or None.
+
+        Expired entries holding validators are kept around; if `stale` is
+        True they are returned too, so they can be revalidated.
+
+        """
+        slot = self._slot(key)
+        with self._lock:
+            entry = self._load(slot)
+            fresh = entry is not None and self.is_fresh(entry)
+            if entry is not None and not fresh:
+                if not entry.has_validators:
+                    self._discard(slot)
+                    entry = None
+                elif not stale:
+                    entry = None
+            if fresh:
+                self.stats.hits += 1
+            else:
+                self.stats.misses += 1
+            return entry
+
+    def set(self, key, entry, ttl=None):
+        """Store entry under key for ttl seconds (None for no expiration)."""
+        if ttl is not None:
+            entry.expires = self._clock() + ttl
+        slot = self._slot(key)
+        with self._lock:
+            if self._contains(slot):
+                self._discard(slot)
+            self._store(slot, key, entry)
+            self._evict()
+
+    def refresh(self, key, entry, ttl=None):
+        """Extend the life of a revalidated entry, keeping its payload."""
+        entry.expires = None if ttl is None else self._clock() + ttl
+        slot = self._slot(key)
+        with self._lock:
+            if self._contains(slot):
+                self._update(slot, key, entry)
+            else:
+                self._store(slot, key, entry)
+                self._evict()
+            self.stats.revalidations += 1
+
+    def expire(self, key):
+        """Expire the entry for key, so it is revalidated (or refetched)."""
+        slot = self._slot(key)
+        with self._lock:
+            entry = self._load(slot)
+            if entry is not None:
+                entry.expires = self._clock()
+                self._update(slot, key, entry)
+
+    def delete(self, key):
+        slot = self._slot(key)
+        with self._lock:
+            if self._contains(slot):
+                self._discard(slot)
+
+    @staticmethod
+    def _payload_token(entry):
+        # the payload of an entry loaded again (eg. from disk) is the same
+        # if its size and validators are
+        return entry.size, entry.etag, entry.last_modified
+
+    def get_parsed(self, key, entry):
+        """Return the data parsed from the entry payload for key, or None."""
+        slot = self._slot(key)
+        with self._lock:
+            parsed = self._parsed.pop(slot, None)
+            if parsed is None or parsed[0] != self._payload_token(entry):
+                return None
+            # re-insert as most recently used
+            self._parsed[slot] = parsed
+            return parsed[1]
+
+    def set_parsed(self, key, entry, data):
+        """Keep the data parsed from the entry payload for key."""
+        if not self.max_parsed:
+            return
+        slot = self._slot(key)
+        with self._lock:
+            self._parsed.pop(slot, None)
+            self._parsed[slot] = (self._payload_token(entry), data)
+            while len(self._parsed) > self.max_parsed:
+                self._parsed.popitem(last=False)
+
+    def _discard(self, slot):
+        """Remove an entry and its parsed data."""
+        self._parsed.pop(slot, None)
+        self._remove(slot)
+
+    def _evict(self):
+        while self._entries_over() or self._bytes_over():
+            self._discard(self._oldest())
+            self.stats.evictions += 1
+
+    def _entries_over(self):
+        return self.max_entries is not None and len(self) > self.max_entries
+
+    def _bytes_over(self):
+        return self.max_bytes is not None and self.total_bytes > self.max_bytes
+
+    def __len__(self):
+        raise NotImplementedError
+
+    @property
+    def total_bytes(self):
+        raise NotImplementedError
+
+    def _slot(self, key):
+        """Return the backend storage id for key."""
+        raise NotImplementedError
+
+    def _contains(self, slot):
+        raise NotImplementedError
+
+    def _load(self, slot):
+        raise NotImplementedError
+
+    def _store(self, slot, key, entry):
+        raise NotImplementedError
+
+    def _update(self, slot, key, entry):
+        """Update entry metadata in place."""
+        raise NotImplementedError
+
+    def _remove(self, slot):
+        raise NotImplementedError
+
+    def _oldest(self):
+        raise NotImplementedError
+
+
+class MemoryCache(BaseCache):
+    """In-memory LRU response cache."""
+
+    def __init__(self, **kwargs):
+        super(MemoryCache, self).__init__(**kwargs)
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def total_bytes(self):
+        return self._bytes
+
+    def _slot(self, key):
+        return key
+
+    def _contains(self, slot):
+        return slot in self._entries
+
+    def _load(self, slot):
+        entry = self._entries.pop(slot, None)
+        if entry is not None:
+            # re-insert as most recently used
+            self._entries[slot] = entry
+        return entry
+
+    def _store(self, slot, key, entry):
+        # cached payloads may be read concurrently
+        entry.load()
+        self._entries[slot] = entry
+        self._bytes += entry.size
+
+    def _update(self, slot, key, entry):
+        self._entries[slot] = entry
+
+    def _remove(self, slot):
+        entry = self._entries.pop(slot)
+        self._bytes -= entry.size
+
+    def _oldest(self):
+        return next(iter(self._entries))
+
+
+class DiskCache(BaseCache):
+    """On-disk LRU response cache.
+
+    Each entry is kept as a payload file plus a JSON metadata file in
+    `directory`; recency is tracked through the payload modification time
+    so the LRU order survives restarts. Loaded entries read their payload
+    from its file (memory mapped) instead of keeping it in memory.
+
+    """
+
+    def __init__(self, directory, **kwargs):
+        super(DiskCache, self).__init__(**kwargs)
+        self.directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._index = OrderedDict()
+        self._bytes = 0
+        self._load_index()
+
+    def _load_index(self):
+        found = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.data'):
+                stat = os.stat(os.path.join(self.directory, name))
+                found.append((stat.st_mtime, name[:-len('.data')],
+                              stat.st_size))
+        for _, digest, size in sorted(found):
+            self._index[digest] = size
+            self._bytes += size
+
+    def _slot(self, key):
+        import hashlib
+
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def _paths(self, digest):
+        base = os.path.join(self.directory, digest)
+        return base + '.data', base + '.json'
+
+    def __len__(self):
+        return len(self._index)
+
+    @property
+    def total_bytes(self):
+        return self._bytes
+
+    def _contains(self, digest):
+        return digest in self._index
+
+    def _load(self, digest):
+        if digest not in self._index:
+            return None
+        import json
+
+        data_path, meta_path = self._paths(digest)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            os.utime(data_path, None)
+        except (IOError, OSError, ValueError):
+            self._remove(digest)
+            return None
+        self._index[digest] = size = self._index.pop(digest)
+        return CacheEntry(
+            None, meta['content_type'], expires=meta['expires'],
+            etag=meta.get('etag'), last_modified=meta.get('last_modified'),
+            path=data_path, size=size)
+
+    def _store(self, digest, key, entry):
+        data_path, meta_path = self._paths(digest)
+        if entry.path != data_path:
+            tmp_path = data_path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                shutil.copyfileobj(entry.open(), f)
+            # readers may have the previous payload mapped
+            os.rename(tmp_path, data_path)
+        self._update(digest, key, entry)
+        self._index[digest] = entry.size
+        self._bytes += entry.size
+
+    def _update(self, digest, key, entry):
+        import json
+
+        # keys are not stored, as they hold the API key
+        with open(self._paths(digest)[1], 'w') as f:
+            json.dump({'content_type': entry.content_type,
+                       'expires': entry.expires, 'etag': entry.etag,
+                       'last_modified': entry.last_modified}, f)
+
+    def _remove(self, digest):
+        size = self._index.pop(digest, 0)
+        self._bytes -= size
+        for path in self._paths(digest):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _oldest(self):
+        return next(iter(self._index))
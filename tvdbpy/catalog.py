@@ -0,0 +1,241 @@
+"""Local catalog of series and episodes, kept in sync with the TvDB API."""
+
+from __future__ import unicode_literals
+
+import sqlite3
+import threading
+import time
+
+from tvdbpy.sync import UpdateSync
+from tvdbpy.tvdb import Episode, Series, TvDB
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS series (
+    id TEXT PRIMARY KEY,
+    data BLOB NOT NULL,
+    fetched REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS episodes (
+    id TEXT PRIMARY KEY,
+    series_id TEXT,
+    season INTEGER,
+    number INTEGER,
+    data BLOB NOT NULL,
+    fetched REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS episodes_number
+    ON episodes (series_id, season, number);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class Catalog(object):
+    """Local SQLite catalog of series and their episodes.
+
+    Series are bootstrapped from their full (zipped) data and kept current
+    with `sync`. Lookups are served from the catalog; missing items, and
+    items older than `max_age` seconds (if set), are fetched through the
+    TvDB client first.
+
+    """
+
+    def __init__(self, client, path=':memory:', max_age=None,
+                 clock=time.time):
+        super(Catalog, self).__init__()
+        self._client = client
+        self._parser = client._parser
+        self.max_age = max_age
+        self._clock = clock
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def _is_stale(self, fetched):
+        return (self.max_age is not None and
+                self._clock() - fetched > self.max_age)
+
+    def _query(self, sql, *args):
+        with self._lock:
+            return self._db.execute(sql, args).fetchall()
+
+    def _store_series(self, xml_data, now):
+        self._db.execute(
+            'INSERT OR REPLACE INTO series (id, data, fetched) '
+            'VALUES (?, ?, ?)',
+            (xml_data.findtext('id'), self._parser.tostring(xml_data), now))
+
+    def _store_episode(self, xml_data, now):
+        values = Episode(xml_data)
+        self._db.execute(
+            'INSERT OR REPLACE INTO episodes '
+            '(id, series_id, season, number, data, fetched) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (values.id, values.series_id, values.season, values.number,
+             self._parser.tostring(xml_data), now))
+
+    def add_series(self, series_id):
+        """Fetch the full series data and store it in the catalog."""
+        data = self._client._get_series_full_data(series_id)
+        series = data.find('./Series')
+        if series is None:
+            return False
+        now = self._clock()
+        with self._lock, self._db:
+            self._db.execute(
+                'DELETE FROM episodes WHERE series_id = ?',
+                (series.findtext('id'),))
+            self._store_series(series, now)
+            for xml_data in data.findall('./Episode'):
+                self._store_episode(xml_data, now)
+        return True
+
+    def _refetch_series(self, series_id):
+        """Fetch the full series data again (not from the client cache)."""
+        self._client._expire_cached(
+            self._client._series_path(series_id, extended=True))
+        return self.add_series(series_id)
+
+    def _refresh_series(self, series_id):
+        """Refetch the series details (not its episodes)."""
+        path = self._client._series_path(series_id)
+        self._client._expire_cached(path)
+        data = self._client._get_xml_data(path).find('./Series')
+        if data is not None:
+            with self._lock, self._db:
+                self._store_series(data, self._clock())
+
+    def _refresh_episode(self, episode_id):
+        """Refetch the episode details."""
+        path = self._client._episode_path(episode_id)
+        self._client._expire_cached(path)
+        data = self._client._get_xml_data(path).find('./Episode')
+        if data is not None:
+            with self._lock, self._db:
+                self._store_episode(data, self._clock())
+        return data
+
+    def __contains__(self, series_id):
+        if series_id is None:
+            return False
+        return bool(self._query(
+            'SELECT 1 FROM series WHERE id = ?', str(series_id)))
+
+    def _series_row(self, series_id):
+        rows = self._query(
+            'SELECT data, fetched FROM series WHERE id = ?', str(series_id))
+        if not rows or self._is_stale(rows[0][1]):
+            add = self._refetch_series if rows else self.add_series
+            if not add(series_id):
+                return None
+            rows = self._query(
+                'SELECT data, fetched FROM series WHERE id = ?',
+                str(series_id))
+        return rows[0]
+
+    def get_series_by_id(self, series_id, extended=False):
+        """Get Series detail by series id."""
+        row = self._series_row(series_id)
+        if row is None:
+            return None
+        series = Series(self._parser.fromstring(row[0]), client=self._client)
+        if extended:
+            data = self._parser.element('Data', (
+                self._parser.fromstring(episode) for episode, in self._query(
+                    'SELECT data FROM episodes WHERE series_id = ?',
+                    series.id)))
+            series._load_episodes(data)
+        return series
+
+    def iter_series(self):
+        """Yield all the Series in the catalog (without their episodes)."""
+        for data, in self._query('SELECT data FROM series'):
+            yield Series(self._parser.fromstring(data), client=self._client)
+
+    def get_episode_by_id(self, episode_id):
+        """Get Episode details by episode id."""
+        rows = self._query(
+            'SELECT data, fetched FROM episodes WHERE id = ?', str(episode_id))
+        if rows and not self._is_stale(rows[0][1]):
+            data = self._parser.fromstring(rows[0][0])
+        else:
+            data = self._refresh_episode(episode_id)
+        if data is not None:
+            return Episode(data, client=self._client)
+
+    def get_episode(self, series_id, season, number):
+        """Get Episode details by season/number."""
+        if self._series_row(series_id) is None:
+            return None
+        rows = self._query(
+            'SELECT data FROM episodes '
+            'WHERE series_id = ? AND season = ? AND number = ?',
+            str(series_id), int(season), int(number))
+        if rows:
+            return Episode(
+                self._parser.fromstring(rows[0][0]), client=self._client)
+
+    @property
+    def checkpoint(self):
+        """Return the (unix) time of the last successful sync."""
+        rows = self._query(
+            "SELECT value FROM sync_state WHERE key = 'checkpoint'")
+        return int(rows[0][0]) if rows else None
+
+    @checkpoint.setter
+    def checkpoint(self, value):
+        with self._lock, self._db:
+            self._db.execute(
+                'INSERT OR REPLACE INTO sync_state (key, value) '
+                "VALUES ('checkpoint', ?)", (str(value),))
+
+    def _has_episode(self, episode_id):
+        return bool(self._query(
+            'SELECT 1 FROM episodes WHERE id = ?', episode_id))
+
+    def sync(self):
+        """Refresh the catalog items updated since the last sync.
+
+        Updated series and episodes already in the catalog are refetched,
+        as well as new episodes of series in the catalog (when the updates
+        include the episode series). The first sync only sets the
+        checkpoint. Return the sync stats.
+
+        """
+        return CatalogSync(self).sync()
+
+
+class CatalogSync(UpdateSync):
+    """Updates sync engine for the items in a Catalog."""
+
+    def __init__(self, catalog, **kwargs):
+        super(CatalogSync, self).__init__(
+            catalog._client, clock=catalog._clock, **kwargs)
+        self.catalog = catalog
+
+    def load_checkpoint(self):
+        return self.catalog.checkpoint
+
+    def save_checkpoint(self, value):
+        self.catalog.checkpoint = value
+
+    def accept(self, update):
+        if update.kind == TvDB.SERIES:
+            return update.id in self.catalog
+        return (self.catalog._has_episode(update.id) or
+                getattr(update, 'series', None) in self.catalog)
+
+    def refresh_series(self, series_id):
+        self.catalog._refresh_series(series_id)
+
+    def refresh_series_full(self, series_id):
+        self.catalog._refetch_series(series_id)
+
+    def refresh_episode(self, episode_id):
+        self.catalog._refresh_episode(episode_id)
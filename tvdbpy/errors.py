@@ -13,3 +13,15 @@ class APIKeyRequiredError(TvDBException):
 
 class APIResponseError(TvDBException):
     """Unexpected response from the TvDB API."""
+
+    def __init__(self, message, response=None):
+        super(APIResponseError, self).__init__(message)
+        self.response = response
+
+
+class SnapshotError(TvDBException):
+    """Invalid or unsupported snapshot data."""
+
+
+class ImageTooLargeError(TvDBException):
+    """Image larger than the image cache size limit."""
@@ -4,15 +4,21 @@ try:
     import urllib.parse as urlparse
 except ImportError:
     import urlparse
-import zipfile
+import threading
 
+from collections import OrderedDict
+from datetime import date, datetime
 from functools import wraps
-from io import BytesIO
-
-import requests
-import xml.etree.ElementTree as ET
+from timeit import default_timer as timer
 
+from tvdbpy.cache import CacheEntry
 from tvdbpy.errors import APIKeyRequiredError, APIResponseError
+from tvdbpy.observers import CACHE, PARSE, REQUEST, Event
+from tvdbpy.parsers import ElementTreeParser, Record
+
+
+NOT_MODIFIED = 304
+TOO_MANY_REQUESTS = 429
 
 
 def api_key_required(method):
@@ -26,16 +32,306 @@ def api_key_required(method):
     return _check_api_key
 
 
+class SingleFlight(object):
+    """Share a single call among concurrent callers with the same key.
+
+    While a call for a key is in flight, other callers for that key wait
+    for it and get its result (or exception) instead of calling again.
+
+    """
+
+    class _Call(object):
+
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        super(SingleFlight, self).__init__()
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func, *args, **kwargs):
+        """Return func(*args, **kwargs), sharing in-flight calls by key."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = func(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+class BatchResult(object):
+    """Results of a batch of API calls.
+
+    `results` maps each (deduplicated) key to its result, in input order;
+    keys whose call failed map to None and have their exception in
+    `errors`.
+
+    """
+
+    def __init__(self, keys):
+        super(BatchResult, self).__init__()
+        self.results = OrderedDict((key, None) for key in keys)
+        self.errors = OrderedDict()
+
+    def __iter__(self):
+        return iter(self.results.values())
+
+    def __len__(self):
+        return len(self.results)
+
+    def __getitem__(self, key):
+        return self.results[key]
+
+
+def field_values(xml_data):
+    """Return the element children text by tag (first one wins)."""
+    if isinstance(xml_data, Record):
+        # already mapped by the flat parser (with empty fields as '')
+        return xml_data.fields
+    # reversed, so the first element wins
+    return {child.tag: child.text for child in reversed(xml_data)}
+
+
+def iter_batch(func, keys, max_workers):
+    """Call func for each distinct key over a thread pool.
+
+    Yield (key, result, error) tuples as the calls complete; a failing
+    call yields its exception as error instead of aborting the batch.
+
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    futures = dict(
+        (executor.submit(func, key), key)
+        for key in OrderedDict.fromkeys(keys))
+    try:
+        for future in as_completed(futures):
+            key = futures[future]
+            error = future.exception()
+            result = future.result() if error is None else None
+            yield key, result, error
+    finally:
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+def get_batch(func, keys, max_workers):
+    """Call func for each distinct key; return a BatchResult."""
+    keys = list(OrderedDict.fromkeys(keys))
+    batch = BatchResult(keys)
+    for key, result, error in iter_batch(func, keys, max_workers):
+        if error is None:
+            batch.results[key] = result
+        else:
+            batch.errors[key] = error
+    return batch
+
+
+try:
+    from sys import intern
+except ImportError:
+    intern = None
+
+
+def as_list(value):
+    """Split a pipe separated field value into a list."""
+    # sometimes there are leading/trailing pipes...
+    return value.strip('|').split('|')
+
+
+def as_interned(value):
+    """Return the interned field value, for often repeated values."""
+    return intern(value)
+
+
+def as_interned_list(value):
+    """Split a pipe separated field value into a list of interned values."""
+    return [intern(item) for item in as_list(value)]
+
+
+def memoized(size):
+    """Decorator to memoize a single value parser in a bounded table.
+
+    The table is cleared once it holds `size` values; parsing errors are
+    not memoized.
+
+    """
+    def decorator(func):
+        memo = {}
+
+        @wraps(func)
+        def _parse(value):
+            try:
+                return memo[value]
+            except KeyError:
+                result = func(value)
+                if len(memo) >= size:
+                    memo.clear()
+                memo[value] = result
+                return result
+        _parse.memo = memo
+        return _parse
+    return decorator
+
+
+if intern is None:
+    # Python 2 intern only takes byte strings, share the unicode values
+    # through a bounded table instead
+    @memoized(size=4096)
+    def intern(value):
+        return value
+
+
+# many episodes share air dates, and updates their timestamps
+@memoized(size=4096)
+def as_date(value):
+    """Parse a YYYY-MM-DD field value into a date."""
+    if (len(value) == 10 and value[4] == '-' and value[7] == '-' and
+            value[:4].isdigit() and value[5:7].isdigit() and
+            value[8:].isdigit()):
+        return date(int(value[:4]), int(value[5:7]), int(value[8:]))
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+@memoized(size=4096)
+def as_timestamp(value):
+    """Parse a unix timestamp field value into a (UTC) datetime."""
+    return datetime.utcfromtimestamp(int(value))
+
+
+# numbering, ratings and counts repeat across episodes and language
+# variants of the same series, share their values
+@memoized(size=4096)
+def as_int(value):
+    """Parse an integer field value."""
+    return int(value)
+
+
+@memoized(size=4096)
+def as_float(value):
+    """Parse a decimal field value."""
+    return float(value)
+
+
+class FieldSchema(tuple):
+    """(attribute, element name, cast) specs for fields loaded from XML.
+
+    Fields without a cast are kept apart, so they can be set without
+    further checks.
+
+    """
+
+    def __new__(cls, *fields):
+        schema = super(FieldSchema, cls).__new__(cls, fields)
+        schema.plain = tuple(
+            (attr, elem_name) for attr, elem_name, cast in fields
+            if cast is None)
+        schema.casted = tuple(field for field in fields if field[2])
+        schema.tags = tuple(OrderedDict.fromkeys(
+            elem_name for _, elem_name, _ in fields))
+        casted_tags = set(elem_name for _, elem_name, _ in schema.casted)
+        schema._interned = tuple(tag in casted_tags for tag in schema.tags)
+        return schema
+
+    def __add__(self, other):
+        return FieldSchema(*(tuple(self) + tuple(other)))
+
+    def pack(self, xml_data):
+        """Return the text of the XML data fields in `tags`, as a tuple.
+
+        Packed fields are much smaller than the element (which also keeps
+        its whole tree alive); the text of casted fields, often repeated
+        (numbering, dates, ratings), is interned.
+
+        """
+        get = field_values(xml_data).get
+        values = []
+        for tag, interned in zip(self.tags, self._interned):
+            value = get(tag)
+            if value and interned:
+                value = intern(value)
+            values.append(value)
+        return tuple(values)
+
+    def unpack(self, tag, values):
+        """Return the Record of packed fields, to load them from."""
+        return Record(tag, dict(
+            (name, value or '') for name, value in zip(self.tags, values)
+            if value is not None))
+
+
 class BaseTvDB(object):
     """Base class for TvDB objects using the API."""
 
     _base_api_url = 'http://thetvdb.com/api/'
     _base_image_url = 'http://thetvdb.com/banners/'
 
+    # number of threads used by default for batch calls
+    batch_workers = 8
+    # streamed response bodies larger than this are spooled to disk
+    spool_size = 4 * 1024 * 1024
+    stream_chunk_size = 64 * 1024
+
+    __slots__ = ('_client',)
+
+    # instrumentation observers, called with each Event
+    _observers = ()
+    # request limits (see tvdbpy.limits)
+    _rate_limiter = None
+    _concurrency_limiter = None
+    # XML parser backend (see tvdbpy.parsers)
+    _parser = ElementTreeParser()
+
+    # fields loaded by _load_fields
+    _fields = FieldSchema()
+
     def __init__(self, client=None):
         super(BaseTvDB, self).__init__()
         self._client = client
 
+    def _load_fields(self, xml_data, fields=None):
+        """Set attributes from the XML data children, following _fields.
+
+        The children are read once into a name to text map (keeping the
+        first element for repeated names, as find does); values are then
+        cast as specified, and set to None if missing or not valid.
+
+        """
+        if fields is None:
+            fields = self._fields
+        get = field_values(xml_data).get
+        for attr, elem_name in fields.plain:
+            setattr(self, attr, get(elem_name) or None)
+        for attr, elem_name, cast in fields.casted:
+            value = get(elem_name)
+            if value:
+                try:
+                    value = cast(value)
+                except ValueError:
+                    value = None
+            else:
+                value = None
+            setattr(self, attr, value)
+
     def _elem_value(self, xml_data, elem_name, cast=None):
         elem = xml_data.find(elem_name)
         value = getattr(elem, 'text', None)
@@ -55,47 +351,248 @@ class BaseTvDB(object):
             value = data.split('|')
         return value
 
-    def _get(self, path, content_type, **params):
-        """Do a GET request to the given path with the specified params."""
+    def _get(self, path, content_type, headers=None, stream=False,
+             **params):
+        """Do a GET request to the given path with the specified params.
+
+        If `stream` is True, the response body is not read beforehand.
+
+        """
         url = urlparse.urljoin(self._base_api_url, path)
-        response = requests.get(url, params=params)
+        kwargs = {}
+        if headers:
+            kwargs['headers'] = headers
+        if stream:
+            kwargs['stream'] = True
+        response = self._transport.get(url, params=params, **kwargs)
 
         if not response.ok:
-            raise APIResponseError("Status code: %s" % response.status_code)
+            response.close()
+            raise APIResponseError(
+                "Status code: %s" % response.status_code, response=response)
+
+        if response.status_code == NOT_MODIFIED:
+            return response
 
         # responses from tvdb are expected to be XML, utf-8 encoded
         response_content_type = response.headers.get('content-type')
         if content_type not in response_content_type:
-            raise APIResponseError("Content-type: %s" % response_content_type)
+            response.close()
+            raise APIResponseError(
+                "Content-type: %s" % response_content_type, response=response)
 
         return response
 
+    def _emit(self, kind, **fields):
+        """Send an instrumentation event to the observers."""
+        if self._observers:
+            event = Event(kind, **fields)
+            for observer in self._observers:
+                observer(event)
+
+    def _fetch_entry(self, path, content_type, headers=None, stream=False,
+                     **params):
+        """Do a GET request; return the response and its CacheEntry.
+
+        The entry is None for not modified responses. A request event is
+        emitted, including for failed requests. Requests wait for the
+        rate and concurrency limiters, if set, and report to them (the
+        time until the response headers, as the time to read streamed
+        bodies depends on their size more than on the API load).
+
+        """
+        if self._rate_limiter is not None:
+            self._rate_limiter.acquire()
+        limiter = self._concurrency_limiter
+        if limiter is not None:
+            limiter.acquire()
+        start = timer()
+        response = entry = None
+        try:
+            response = self._get(
+                path, content_type, headers=headers, stream=stream, **params)
+            if response.status_code != NOT_MODIFIED:
+                entry = self._make_entry(response, content_type, stream)
+            return response, entry
+        except APIResponseError as e:
+            response = e.response
+            raise
+        finally:
+            elapsed = timer() - start
+            wait = self._response_wait(response, elapsed)
+            if limiter is not None:
+                limiter.release(wait, failed=self._is_throttled(response))
+            if self._observers:
+                self._emit_request(path, response, entry, elapsed, wait)
+
+    def _is_throttled(self, response):
+        """Return whether the response signals the API is overloaded.
+
+        Throttled responses asking to retry later pause the rate limiter.
+
+        """
+        if response is None:
+            # transport error (connection failure, timeout)
+            return True
+        status = response.status_code
+        if status != TOO_MANY_REQUESTS and status < 500:
+            return False
+        retry_after = response.headers.get('retry-after')
+        if self._rate_limiter is not None and retry_after:
+            try:
+                self._rate_limiter.pause(float(retry_after))
+            except ValueError:
+                # HTTP date, not worth parsing
+                pass
+        return True
+
+    def _response_wait(self, response, elapsed):
+        """Return the time until the response headers were parsed."""
+        wait = getattr(response, 'elapsed', None)
+        # as timed by requests (the whole request time if not available)
+        return min(wait.total_seconds(), elapsed) if wait else elapsed
+
+    def _emit_request(self, path, response, entry, elapsed, wait):
+        self._emit(
+            REQUEST, path=path,
+            status=getattr(response, 'status_code', None),
+            bytes=entry.size if entry is not None else 0,
+            elapsed=elapsed, wait=wait, transfer=elapsed - wait)
+
+    def _spool(self, response):
+        """Copy a streamed response body to a spooled temporary file."""
+        import tempfile
+
+        spooled = tempfile.SpooledTemporaryFile(max_size=self.spool_size)
+        try:
+            for chunk in response.iter_content(self.stream_chunk_size):
+                spooled.write(chunk)
+        except Exception:
+            spooled.close()
+            raise
+        finally:
+            response.close()
+        spooled.seek(0)
+        return spooled
+
+    def _make_entry(self, response, content_type, stream=False):
+        """Return a CacheEntry for the response payload."""
+        content = spooled = None
+        if stream:
+            spooled = self._spool(response)
+        else:
+            content = response.content
+        return CacheEntry(
+            content, content_type, file=spooled,
+            etag=response.headers.get('etag'),
+            last_modified=response.headers.get('last-modified'))
+
+    def _get_entry(self, path, content_type, stream=False, **params):
+        """Return a CacheEntry with the response payload for path.
+
+        When a cache is set, fresh entries are returned as is and expired
+        ones are revalidated with a conditional request. If `stream` is
+        True, the response body is spooled to a temporary file instead of
+        being read in memory.
+
+        """
+        cache = self._cache
+        if cache is None:
+            response, entry = self._fetch_entry(
+                path, content_type, stream=stream, **params)
+            return entry
+
+        key = cache.make_key(path, params)
+        entry = cache.get(key, stale=True)
+        if entry is not None and cache.is_fresh(entry):
+            self._emit(CACHE, path=path, result='hit')
+            return entry
+
+        headers = entry.validator_headers() if entry is not None else None
+        response, fetched = self._fetch_entry(
+            path, content_type, headers=headers, stream=stream, **params)
+        ttl = cache.ttl_for(path)
+        if fetched is None and entry is not None:
+            response.close()
+            cache.refresh(key, entry, ttl=ttl)
+            self._emit(CACHE, path=path, result='revalidated')
+        else:
+            result = 'miss' if entry is None else 'expired'
+            entry = fetched
+            cache.set(key, entry, ttl=ttl)
+            self._emit(CACHE, path=path, result=result)
+        return entry
+
+    def _expire_cached(self, path, **params):
+        """Expire the cached response for path, if a cache is set.
+
+        The next request for path is then revalidated with a conditional
+        request (or made again), instead of served from the cache.
+
+        """
+        cache = self._cache
+        if cache is not None:
+            cache.expire(cache.make_key(path, params))
+
+    def _get_content(self, path, content_type, **params):
+        """Return the response payload for path, using the cache if set."""
+        return self._get_entry(path, content_type, **params).content
+
     def _get_xml_data(self, path, **params):
-        """Do a GET request expecting XML data."""
-        response = self._get(path, 'text/xml', **params)
-        xml_data = ET.fromstring(response.content)
-        return xml_data
+        """Do a GET request expecting XML data.
+
+        Concurrent requests for the same path and params share a single
+        request and parse; the returned data must not be modified.
+
+        """
+        key = (path, tuple(sorted(params.items())))
+        return self._flights.do(key, self._fetch_xml_data, path, params)
+
+    def _fetch_xml_data(self, path, params):
+        content = self._get_content(path, 'text/xml', **params)
+        return self._parser.fromstring(content)
+
+    def _get_compressed_entry(self, path):
+        """Do a GET request expecting a zipped file; return a CacheEntry.
+
+        The (streamed) payload is not read in memory, see _get_entry.
+
+        """
+        return self._get_entry(path, 'application/zip', stream=True)
+
+    def _iter_batch(self, func, keys, max_workers=None):
+        """Call func for each distinct key, see iter_batch."""
+        if max_workers is None:
+            max_workers = self.batch_workers
+        return iter_batch(func, keys, max_workers)
 
-    def _get_compressed_data(self, path):
-        """Do a GET request expecting a zipped file; return a ZipFile."""
-        response = self._get(path, 'application/zip')
+    def _get_batch(self, func, keys, max_workers=None):
+        """Call func for each distinct key; return a BatchResult."""
+        if max_workers is None:
+            max_workers = self.batch_workers
+        return get_batch(func, keys, max_workers)
 
-        compressed_data = BytesIO(response.content)
-        zip_file = zipfile.ZipFile(compressed_data)
-        return zip_file
+    def _emit_parse(self, cls, count, start):
+        # cls may be a model alternative constructor (classmethod)
+        model = getattr(cls, '__self__', cls).__name__
+        self._emit(PARSE, model=model, count=count, elapsed=timer() - start)
 
     def _parse_entry(self, response, cls, key):
         """Parse XML response and return expected cls instance."""
+        start = timer()
         result = None
         data = response.find(key)
         if data is not None:
             result = cls(data, client=self)
+        self._emit_parse(cls, int(result is not None), start)
         return result
 
     def _parse_multiple_entries(self, response, cls, key):
         """Parse XML response and return expected cls instances."""
+        start = timer()
         result = None
         data = response.findall(key)
         if data is not None:
             result = [cls(d, client=self) for d in data]
+        self._emit_parse(cls, len(result or ()), start)
         return result
@@ -0,0 +1,388 @@
+"""Concurrent image downloads into a content-addressed disk cache."""
+
+from __future__ import unicode_literals
+
+import hashlib
+import json
+import os
+import threading
+
+from collections import OrderedDict
+
+from tvdbpy.cache import CacheStats
+from tvdbpy.errors import APIResponseError, ImageTooLargeError
+from tvdbpy.helpers import SingleFlight, get_batch, iter_batch
+from tvdbpy.transport import HTTPTransport
+
+try:
+    string_types = basestring
+except NameError:
+    string_types = str
+
+
+# model attributes holding image urls
+IMAGE_ATTRS = ('banner', 'poster', 'image')
+
+PARTIAL_CONTENT = 206
+RANGE_NOT_SATISFIABLE = 416
+
+
+def image_urls(items):
+    """Return the distinct image urls of models (or urls), in order.
+
+    Series and search results give their banner (and poster), episodes
+    their image and banner updates their banner url.
+
+    """
+    urls = OrderedDict()
+    for item in items:
+        if isinstance(item, string_types):
+            urls[item] = None
+            continue
+        for attr in IMAGE_ATTRS:
+            url = getattr(item, attr, None)
+            if url:
+                urls[url] = None
+    return list(urls)
+
+
+def _range_start(content_range):
+    """Return the first byte position of a Content-Range header."""
+    try:
+        unit, positions = content_range.split(' ', 1)
+        return int(positions.split('-', 1)[0]) if unit == 'bytes' else None
+    except (AttributeError, ValueError):
+        return None
+
+
+class ImageCacheStats(CacheStats):
+    """Image cache counters."""
+
+    def __init__(self):
+        super(ImageCacheStats, self).__init__()
+        self.deduplicated = 0
+        self.resumed = 0
+
+    def as_dict(self):
+        stats = super(ImageCacheStats, self).as_dict()
+        stats.update(deduplicated=self.deduplicated, resumed=self.resumed)
+        return stats
+
+
+class ImageCache(object):
+    """Content-addressed on-disk image cache.
+
+    Images are stored once per content, by SHA-256 digest, and urls map
+    to the digest of their image, so an image served at several urls is
+    kept once. Images are evicted in least-recently-used order (tracked
+    through their modification time, as in DiskCache) once the cache
+    holds more than `max_entries` images or `max_bytes` bytes; images
+    larger than `max_image_bytes` are not stored. Downloads are written
+    to partial files first, so interrupted ones can be resumed.
+
+    """
+
+    def __init__(self, directory, max_entries=None,
+                 max_bytes=256 * 1024 * 1024,
+                 max_image_bytes=16 * 1024 * 1024):
+        super(ImageCache, self).__init__()
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_image_bytes = max_image_bytes
+        self.stats = ImageCacheStats()
+        self._lock = threading.RLock()
+        for name in ('objects', 'urls', 'partial'):
+            path = os.path.join(directory, name)
+            if not os.path.isdir(path):
+                os.makedirs(path)
+        self._index = OrderedDict()
+        self._bytes = 0
+        self._load_index()
+
+    def _load_index(self):
+        found = []
+        objects = os.path.join(self.directory, 'objects')
+        for prefix in os.listdir(objects):
+            for digest in os.listdir(os.path.join(objects, prefix)):
+                stat = os.stat(self._object_path(digest))
+                found.append((stat.st_mtime, digest, stat.st_size))
+        for _, digest, size in sorted(found):
+            self._index[digest] = size
+            self._bytes += size
+
+    def _object_path(self, digest):
+        return os.path.join(self.directory, 'objects', digest[:2], digest)
+
+    def _url_slot(self, url):
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    def _ref_path(self, url):
+        return os.path.join(
+            self.directory, 'urls', self._url_slot(url) + '.json')
+
+    def _partial_paths(self, url):
+        base = os.path.join(self.directory, 'partial', self._url_slot(url))
+        return base + '.data', base + '.json'
+
+    def __len__(self):
+        return len(self._index)
+
+    @property
+    def total_bytes(self):
+        return self._bytes
+
+    def _read_json(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def _write_json(self, path, data):
+        with open(path, 'w') as f:
+            json.dump(data, f)
+
+    def get(self, url):
+        """Return the cached image path for url, or None."""
+        with self._lock:
+            ref = self._read_ref(url)
+            digest = ref and ref.get('digest')
+            if digest not in self._index:
+                self.stats.misses += 1
+                return None
+            path = self._object_path(digest)
+            try:
+                os.utime(path, None)
+            except OSError:
+                self._remove(digest)
+                self.stats.misses += 1
+                return None
+            self._index[digest] = self._index.pop(digest)
+            self.stats.hits += 1
+            return path
+
+    def _read_ref(self, url):
+        ref = self._read_json(self._ref_path(url))
+        if ref is not None and ref.get('url') != url:
+            return None
+        return ref
+
+    def get_partial(self, url):
+        """Return the (size, metadata) of the partial download of url.
+
+        The size is 0 if there is no partial download.
+
+        """
+        data_path, meta_path = self._partial_paths(url)
+        metadata = self._read_json(meta_path)
+        if metadata is None or metadata.get('url') != url:
+            return 0, {}
+        try:
+            return os.path.getsize(data_path), metadata
+        except OSError:
+            return 0, {}
+
+    def start_partial(self, url, metadata, offset=0):
+        """Return the partial download path for url, to write from offset.
+
+        Downloads from the start replace the partial download metadata
+        (eg. the validators used to resume it).
+
+        """
+        data_path, meta_path = self._partial_paths(url)
+        if offset:
+            with self._lock:
+                self.stats.resumed += 1
+        else:
+            metadata = dict(metadata, url=url)
+            self._write_json(meta_path, metadata)
+        return data_path
+
+    def discard_partial(self, url):
+        for path in self._partial_paths(url):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def add(self, url, digest, content_type=None):
+        """Move the completed download of url into the cache.
+
+        Return the cached image path; images already stored (from another
+        url) are kept once.
+
+        """
+        data_path, meta_path = self._partial_paths(url)
+        path = self._object_path(digest)
+        with self._lock:
+            if digest in self._index:
+                os.remove(data_path)
+                os.utime(path, None)
+                self._index[digest] = self._index.pop(digest)
+                self.stats.deduplicated += 1
+            else:
+                size = os.path.getsize(data_path)
+                if not os.path.isdir(os.path.dirname(path)):
+                    os.makedirs(os.path.dirname(path))
+                os.rename(data_path, path)
+                self._index[digest] = size
+                self._bytes += size
+            self._write_json(self._ref_path(url), {
+                'url': url, 'digest': digest, 'content_type': content_type})
+            try:
+                os.remove(meta_path)
+            except OSError:
+                pass
+            self._evict()
+        return path
+
+    def _evict(self):
+        # the most recently used image is kept, as it was just returned
+        while len(self._index) > 1 and (
+                self._entries_over() or self._bytes_over()):
+            self._remove(next(iter(self._index)))
+            self.stats.evictions += 1
+
+    def _entries_over(self):
+        return self.max_entries is not None and len(self) > self.max_entries
+
+    def _bytes_over(self):
+        return self.max_bytes is not None and self.total_bytes > self.max_bytes
+
+    def _remove(self, digest):
+        # urls mapping to a removed image are cleaned up on lookup
+        self._bytes -= self._index.pop(digest, 0)
+        try:
+            os.remove(self._object_path(digest))
+        except OSError:
+            pass
+
+
+class ImageFetcher(object):
+    """Concurrent image downloader, into an ImageCache.
+
+    Images are streamed to the cache over a pooled transport (by default
+    an HTTPTransport with a connection per worker). Concurrent fetches of
+    an url share a single download, and interrupted downloads are resumed
+    with a range request.
+
+    """
+
+    batch_workers = 8
+    chunk_size = 64 * 1024
+
+    def __init__(self, cache, transport=None, max_workers=None):
+        super(ImageFetcher, self).__init__()
+        self.cache = cache
+        if max_workers is not None:
+            self.batch_workers = max_workers
+        if transport is None:
+            transport = HTTPTransport(pool_size=self.batch_workers)
+        self._transport = transport
+        self._flights = SingleFlight()
+
+    def fetch(self, url):
+        """Return the cached image path for url, downloading it if needed."""
+        return self._flights.do(url, self._fetch, url)
+
+    def fetch_many(self, items, max_workers=None):
+        """Fetch the images of models (or urls) concurrently.
+
+        Return a BatchResult of the cached image paths by url, in input
+        order (see image_urls); failed downloads are reported in its
+        errors.
+
+        """
+        return get_batch(self.fetch, image_urls(items),
+                         max_workers or self.batch_workers)
+
+    def iter_many(self, items, max_workers=None):
+        """Yield (url, path, error) as concurrent downloads complete."""
+        return iter_batch(self.fetch, image_urls(items),
+                          max_workers or self.batch_workers)
+
+    def _fetch(self, url):
+        path = self.cache.get(url)
+        if path is None:
+            path = self._download(url)
+        return path
+
+    def _download(self, url):
+        offset, metadata = self.cache.get_partial(url)
+        headers = {}
+        if offset:
+            # resume only if the image did not change, which needs a strong
+            # validator for If-Range (a strong ETag, else Last-Modified);
+            # otherwise download it all again
+            validator = metadata.get('etag')
+            if not validator or validator.startswith('W/'):
+                validator = metadata.get('last_modified')
+            if validator:
+                headers['Range'] = 'bytes=%d-' % offset
+                headers['If-Range'] = validator
+            else:
+                self.cache.discard_partial(url)
+                offset = 0
+        response = self._transport.get(url, headers=headers, stream=True)
+        try:
+            if offset and response.status_code == RANGE_NOT_SATISFIABLE:
+                # the partial download does not match the image anymore
+                response.close()
+                self.cache.discard_partial(url)
+                return self._download(url)
+            if not response.ok:
+                raise APIResponseError(
+                    "Status code: %s" % response.status_code,
+                    response=response)
+            content_type = response.headers.get('content-type') or ''
+            if not content_type.startswith('image/'):
+                raise APIResponseError(
+                    "Content-type: %s" % content_type, response=response)
+            if (response.status_code != PARTIAL_CONTENT or
+                    _range_start(response.headers.get('content-range')) !=
+                    offset):
+                offset = 0
+            length = response.headers.get('content-length')
+            if length is not None and length.isdigit():
+                self._check_size(url, offset + int(length))
+            return self._store(url, response, offset, {
+                'content_type': content_type,
+                'etag': response.headers.get('etag'),
+                'last_modified': response.headers.get('last-modified'),
+            })
+        finally:
+            response.close()
+
+    def _check_size(self, url, size):
+        limit = self.cache.max_image_bytes
+        if limit is not None and size > limit:
+            self.cache.discard_partial(url)
+            raise ImageTooLargeError(
+                "Image size over %d bytes: %s" % (limit, url))
+
+    def _store(self, url, response, offset, metadata):
+        """Stream the response body to the cache, after offset bytes."""
+        path = self.cache.start_partial(url, metadata, offset=offset)
+        digest = hashlib.sha256()
+        if offset:
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(self.chunk_size), b''):
+                    digest.update(chunk)
+        size = offset
+        with open(path, 'ab' if offset else 'wb') as f:
+            for chunk in response.iter_content(self.chunk_size):
+                size += len(chunk)
+                if (self.cache.max_image_bytes is not None and
+                        size > self.cache.max_image_bytes):
+                    break
+                digest.update(chunk)
+                f.write(chunk)
+        # interrupted downloads are kept (to be resumed) on errors
+        self._check_size(url, size)
+        return self.cache.add(
+            url, digest.hexdigest(), metadata.get('content_type'))
+
+    def close(self):
+        """Release pooled connections."""
+        self._transport.close()
@@ -0,0 +1,206 @@
+"""Client-side rate and concurrency limits for the TvDB API client."""
+
+from __future__ import division, unicode_literals
+
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    from time import monotonic
+except ImportError:
+    from time import time as monotonic
+
+
+class TokenBucket(object):
+    """Token bucket rate limiter.
+
+    Allows `rate` requests per second on average, in bursts of up to
+    `burst` requests. Requests are admitted in arrival order: `reserve`
+    takes a token right away (possibly going into debt) and returns how
+    long the caller has to wait before using it.
+
+    """
+
+    def __init__(self, rate, burst=None, clock=monotonic, sleep=time.sleep):
+        super(TokenBucket, self).__init__()
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(rate, 1))
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated = clock()
+
+    def _take(self, tokens, available, updated):
+        """Take tokens from a bucket state; return (delay, state).
+
+        The bucket is refilled since `updated`, which is in the future
+        while the bucket is paused.
+
+        """
+        now = self._clock()
+        if now > updated:
+            available = min(
+                self.burst, available + (now - updated) * self.rate)
+            updated = now
+        available -= tokens
+        delay = updated - now
+        if available < 0:
+            delay -= available / self.rate
+        return delay, (available, updated)
+
+    def reserve(self, tokens=1):
+        """Take tokens; return the seconds to wait before using them."""
+        with self._lock:
+            delay, (self._tokens, self._updated) = self._take(
+                tokens, self._tokens, self._updated)
+            return delay
+
+    def acquire(self, tokens=1):
+        """Take tokens, waiting until they are available."""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            self._sleep(delay)
+
+    def pause(self, seconds):
+        """Stop admitting requests for the given seconds (eg. Retry-After)."""
+        with self._lock:
+            self._tokens = min(self._tokens, 0.0)
+            self._updated = max(self._updated, self._clock() + seconds)
+
+
+class FileTokenBucket(TokenBucket):
+    """Token bucket shared by processes through a locked state file.
+
+    Processes sharing `path` (and using the same rate and burst) are
+    limited together. The clock must be comparable between processes,
+    so wall time is used by default. Needs fcntl (POSIX).
+
+    """
+
+    def __init__(self, path, rate, burst=None, clock=time.time,
+                 sleep=time.sleep):
+        if fcntl is None:
+            raise RuntimeError('FileTokenBucket needs fcntl (POSIX)')
+        super(FileTokenBucket, self).__init__(
+            rate, burst=burst, clock=clock, sleep=sleep)
+        self.path = path
+
+    def _update(self, func):
+        """Call func(available, updated) -> (result, available, updated).
+
+        The state file is locked while func runs.
+
+        """
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            with os.fdopen(os.dup(fd), 'r+') as f:
+                try:
+                    state = json.load(f)
+                    available, updated = state['tokens'], state['updated']
+                except (ValueError, KeyError, TypeError):
+                    available, updated = self.burst, self._clock()
+                result, available, updated = func(available, updated)
+                f.seek(0)
+                f.truncate()
+                json.dump({'tokens': available, 'updated': updated}, f)
+            return result
+        finally:
+            # closing the descriptor releases the lock
+            os.close(fd)
+
+    def reserve(self, tokens=1):
+        def take(available, updated):
+            delay, (available, updated) = self._take(
+                tokens, available, updated)
+            return delay, available, updated
+        return self._update(take)
+
+    def pause(self, seconds):
+        def stop(available, updated):
+            return None, min(available, 0.0), max(
+                updated, self._clock() + seconds)
+        self._update(stop)
+
+
+class AdaptiveConcurrency(object):
+    """Concurrent requests limit, adapted to the API responses.
+
+    The limit grows by about one request per `limit` successful requests
+    (additive increase) and is cut by `backoff` (multiplicative decrease)
+    on failures (throttling, server errors or transport errors) and on
+    latency spikes: requests taking more than `spike_factor` times the
+    smoothed latency. It is cut at most once per `cooldown` seconds, so a
+    burst of failures counts as a single congestion signal.
+
+    """
+
+    def __init__(self, initial=4, min_limit=1, max_limit=32, backoff=0.5,
+                 spike_factor=3.0, cooldown=1.0, smoothing=0.1,
+                 clock=monotonic):
+        super(AdaptiveConcurrency, self).__init__()
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.spike_factor = spike_factor
+        self.cooldown = cooldown
+        self.smoothing = smoothing
+        self._clock = clock
+        self._limit = float(max(min_limit, min(initial, max_limit)))
+        self._active = 0
+        self._latency = None
+        self._last_decrease = None
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self):
+        """Return the current (whole) concurrent requests limit."""
+        return int(self._limit)
+
+    @property
+    def active(self):
+        return self._active
+
+    def acquire(self):
+        """Wait until a request is allowed to start."""
+        with self._condition:
+            while self._active >= self.limit:
+                self._condition.wait()
+            self._active += 1
+
+    def release(self, latency, failed=False):
+        """Record a finished request and adapt the limit."""
+        with self._condition:
+            self._active -= 1
+            spike = (not failed and self._latency is not None and
+                     latency > self._latency * self.spike_factor)
+            if failed or spike:
+                self._decrease()
+            else:
+                self._limit = min(
+                    self.max_limit, self._limit + 1.0 / self._limit)
+            if not failed:
+                # spikes update the average too, so a new normal is learned
+                if self._latency is None:
+                    self._latency = latency
+                else:
+                    self._latency += self.smoothing * (latency - self._latency)
+            self._condition.notify_all()
+
+    def _decrease(self):
+        now = self._clock()
+        if (self._last_decrease is not None and
+                now - self._last_decrease < self.cooldown):
+            return
+        self._last_decrease = now
+        self._limit = max(self.min_limit, self._limit * self.backoff)
@@ -0,0 +1,214 @@
+"""Instrumentation events and observers for the TvDB API client."""
+
+from __future__ import unicode_literals
+
+import threading
+
+from collections import defaultdict
+
+
+# event kinds
+REQUEST = 'request'
+UNZIP = 'unzip'
+PARSE = 'parse'
+CACHE = 'cache'
+
+
+class Event(object):
+    """Instrumentation event.
+
+    `kind` is one of:
+
+    - request: path, status, bytes, elapsed, wait (time until the response
+      headers arrived, including connecting) and transfer (the rest)
+    - unzip: path, member, compressed_bytes, bytes, elapsed (decompressing
+      and parsing the member)
+    - parse: model, count, elapsed
+    - cache: path, result (hit, miss, revalidated or expired)
+
+    Times are in seconds; wait and transfer are None if not available.
+
+    """
+
+    def __init__(self, kind, **fields):
+        super(Event, self).__init__()
+        self.kind = kind
+        self.__dict__.update(fields)
+
+    def as_dict(self):
+        return dict(self.__dict__)
+
+    def __repr__(self):
+        fields = sorted(
+            (k, v) for k, v in self.__dict__.items() if k != 'kind')
+        return 'Event(%s, %s)' % (
+            self.kind, ', '.join('%s=%r' % field for field in fields))
+
+
+class Observer(object):
+    """Base observer, dispatching events to their on_<kind> method."""
+
+    def __call__(self, event):
+        handler = getattr(self, 'on_%s' % event.kind, None)
+        if handler is not None:
+            handler(event)
+
+
+class LoggingObserver(Observer):
+    """Log every event."""
+
+    def __init__(self, logger=None, level=None):
+        import logging
+
+        super(LoggingObserver, self).__init__()
+        if logger is None:
+            logger = logging.getLogger('tvdbpy')
+        if level is None:
+            level = logging.DEBUG
+        self.logger = logger
+        self.level = level
+
+    def __call__(self, event):
+        if self.logger.isEnabledFor(self.level):
+            fields = sorted(
+                (k, v) for k, v in event.as_dict().items() if k != 'kind')
+            self.logger.log(self.level, '%s %s', event.kind, ' '.join(
+                '%s=%s' % field for field in fields))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join(
+        '%s="%s"' % (name, value) for name, value in labels)
+
+
+class Counter(object):
+    """Prometheus-style counter, by label values."""
+
+    type = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        super(Counter, self).__init__()
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = defaultdict(float)
+
+    def inc(self, amount=1, *label_values):
+        self.values[label_values] += amount
+
+    def samples(self):
+        for label_values, value in sorted(self.values.items()):
+            yield self.name, list(zip(self.labels, label_values)), value
+
+
+class Histogram(object):
+    """Prometheus-style histogram, by label values."""
+
+    type = 'histogram'
+
+    buckets = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+               5.0, 10.0)
+
+    def __init__(self, name, help, labels=(), buckets=None):
+        super(Histogram, self).__init__()
+        self.name = name
+        self.help = help
+        self.labels = labels
+        if buckets is not None:
+            self.buckets = tuple(buckets)
+        # label values: [bucket counts, sum, count]
+        self.values = {}
+
+    def observe(self, value, *label_values):
+        data = self.values.get(label_values)
+        if data is None:
+            data = self.values[label_values] = [[0] * len(self.buckets), 0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                data[0][i] += 1
+        data[1] += value
+        data[2] += 1
+
+    def samples(self):
+        for label_values, (counts, total, count) in sorted(
+                self.values.items()):
+            labels = list(zip(self.labels, label_values))
+            for bound, bucket_count in zip(self.buckets, counts):
+                yield (self.name + '_bucket',
+                       labels + [('le', repr(float(bound)))], bucket_count)
+            yield self.name + '_bucket', labels + [('le', '+Inf')], count
+            yield self.name + '_sum', labels, total
+            yield self.name + '_count', labels, count
+
+
+class MetricsObserver(Observer):
+    """Aggregate events in Prometheus-style counters and histograms.
+
+    `render` returns the metrics in the Prometheus text exposition format.
+
+    """
+
+    def __init__(self, prefix='tvdbpy', buckets=None):
+        super(MetricsObserver, self).__init__()
+        self._lock = threading.Lock()
+
+        def name(suffix):
+            return '%s_%s' % (prefix, suffix)
+
+        self.requests = Counter(
+            name('requests_total'), 'API requests, by status.', ('status',))
+        self.request_seconds = Histogram(
+            name('request_seconds'), 'API request duration.',
+            buckets=buckets)
+        self.response_bytes = Counter(
+            name('response_bytes_total'), 'API response payload bytes.')
+        self.unzip_seconds = Histogram(
+            name('unzip_seconds'), 'Zipped payload decompression and parse '
+            'duration.', buckets=buckets)
+        self.parse_seconds = Histogram(
+            name('parse_seconds'), 'Model parse duration, by model.',
+            ('model',), buckets=buckets)
+        self.parsed_objects = Counter(
+            name('parsed_objects_total'), 'Parsed models, by model.',
+            ('model',))
+        self.cache_events = Counter(
+            name('cache_events_total'), 'Cache lookups, by result.',
+            ('result',))
+        self.metrics = (
+            self.requests, self.request_seconds, self.response_bytes,
+            self.unzip_seconds, self.parse_seconds, self.parsed_objects,
+            self.cache_events)
+
+    def __call__(self, event):
+        with self._lock:
+            super(MetricsObserver, self).__call__(event)
+
+    def on_request(self, event):
+        self.requests.inc(1, str(event.status))
+        self.request_seconds.observe(event.elapsed)
+        if event.bytes:
+            self.response_bytes.inc(event.bytes)
+
+    def on_unzip(self, event):
+        self.unzip_seconds.observe(event.elapsed)
+
+    def on_parse(self, event):
+        self.parse_seconds.observe(event.elapsed, event.model)
+        self.parsed_objects.inc(event.count, event.model)
+
+    def on_cache(self, event):
+        self.cache_events.inc(1, event.result)
+
+    def render(self):
+        """Return the metrics in the Prometheus text format."""
+        lines = []
+        with self._lock:
+            for metric in self.metrics:
+                lines.append('# HELP %s %s' % (metric.name, metric.help))
+                lines.append('# TYPE %s %s' % (metric.name, metric.type))
+                for name, labels, value in metric.samples():
+                    lines.append('%s%s %s' % (
+                        name, _format_labels(labels), repr(value)))
+        return '\n'.join(lines) + '\n'
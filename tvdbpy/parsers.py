@@ -0,0 +1,460 @@
+"""XML parser backends for the TvDB API client.
+
+Backends parse API payloads into element trees (or element-like
+records), as used by the client and the models:
+
+- etree: the standard library ElementTree
+- lxml: lxml (C-accelerated), if installed
+- flat: TheTVDB documents are a root holding flat records (Series,
+  Episode, Banner) of text fields; this backend extracts the records
+  fields without building a tree, falling back to ElementTree for any
+  other document shape
+
+ElementTree and lxml are imported on first use.
+
+"""
+
+from __future__ import unicode_literals
+
+import re
+import threading
+
+from operator import itemgetter
+
+try:
+    from importlib.util import find_spec
+except ImportError:
+    find_spec = None
+
+try:
+    unichr
+except NameError:
+    unichr = chr
+
+
+def lxml_installed():
+    """Return whether lxml is installed (without importing it)."""
+    if find_spec is not None:
+        return find_spec('lxml') is not None
+    try:
+        import lxml  # noqa
+    except ImportError:
+        return False
+    return True
+
+
+class ElementTreeParser(object):
+    """Standard library ElementTree backend."""
+
+    name = 'etree'
+
+    @property
+    def etree(self):
+        import xml.etree.ElementTree as ET
+        return ET
+
+    def fromstring(self, content):
+        """Return the root element of the XML content (bytes)."""
+        return self.etree.fromstring(content)
+
+    def parse(self, xml_file):
+        """Return the root element of an XML file object."""
+        return self.etree.parse(xml_file).getroot()
+
+    def iterrecords(self, xml_file):
+        """Yield the root children of an XML file object as parsed.
+
+        Already yielded children are dropped, so memory use does not grow
+        with the file size.
+
+        """
+        depth = 0
+        root = None
+        for event, elem in self.etree.iterparse(xml_file, ('start', 'end')):
+            if event == 'start':
+                depth += 1
+                if root is None:
+                    root = elem
+                continue
+            depth -= 1
+            if depth != 1:
+                continue
+            yield elem
+            root.clear()
+
+    def element(self, tag, children=()):
+        """Return a new element with the given children."""
+        elem = self.etree.Element(tag)
+        elem.extend(children)
+        return elem
+
+    def tostring(self, elem):
+        """Return the element serialized as XML (bytes)."""
+        return self.etree.tostring(elem)
+
+
+class LxmlParser(ElementTreeParser):
+    """lxml backend; external entities and network access are disabled.
+
+    lxml parsers are not shared between threads, each one gets its own.
+    With `fallback`, ElementTree is used if lxml (installed, but eg. a
+    broken build) fails to import on first use.
+
+    """
+
+    name = 'lxml'
+
+    def __init__(self, fallback=False):
+        super(LxmlParser, self).__init__()
+        if not lxml_installed():
+            raise ImportError('lxml is not installed')
+        self.fallback = fallback
+        self._local = threading.local()
+        self._etree = None
+
+    @property
+    def etree(self):
+        if self._etree is None:
+            try:
+                from lxml import etree
+            except ImportError:
+                if not self.fallback:
+                    raise
+                etree = super(LxmlParser, self).etree
+            self._etree = etree
+        return self._etree
+
+    def _fallen_back(self):
+        return self.etree.__name__ != 'lxml.etree'
+
+    @property
+    def parser(self):
+        parser = getattr(self._local, 'parser', None)
+        if parser is None:
+            parser = self._local.parser = self.etree.XMLParser(
+                resolve_entities=False, no_network=True, huge_tree=True)
+        return parser
+
+    def fromstring(self, content):
+        if self._fallen_back():
+            return super(LxmlParser, self).fromstring(content)
+        return self.etree.fromstring(content, self.parser)
+
+    def parse(self, xml_file):
+        if self._fallen_back():
+            return super(LxmlParser, self).parse(xml_file)
+        return self.etree.parse(xml_file, self.parser).getroot()
+
+    def iterrecords(self, xml_file):
+        if self._fallen_back():
+            for elem in super(LxmlParser, self).iterrecords(xml_file):
+                yield elem
+            return
+        for event, elem in self.etree.iterparse(
+                xml_file, ('end',), resolve_entities=False, no_network=True,
+                huge_tree=True):
+            parent = elem.getparent()
+            if parent is None or parent.getparent() is not None:
+                continue
+            yield elem
+            # drop already processed items
+            elem.clear()
+            while elem.getprevious() is not None:
+                del parent[0]
+
+
+class Field(object):
+    """Flat record field, as a (leaf) element."""
+
+    __slots__ = ('tag', 'text')
+
+    def __init__(self, tag, text):
+        self.tag = tag
+        self.text = text
+
+    def __len__(self):
+        return 0
+
+    def __iter__(self):
+        return iter(())
+
+
+def _path_tag(path):
+    """Return the child tag for a find path ('' for any child)."""
+    tag = path[2:] if path.startswith('./') else path
+    if tag and not tag.replace('_', '').isalnum():
+        raise ValueError('Unsupported path: %s' % path)
+    return tag
+
+
+class Record(tuple):
+    """Flat record: an element with text fields only.
+
+    `fields` maps field tags to their text (first one for repeated tags,
+    an empty string for empty fields). Records have no attributes.
+
+    """
+
+    __slots__ = ()
+
+    # (tag, fields, text) tuple, as it is cheaper to build than an object
+    def __new__(cls, tag, fields, text=None):
+        return tuple.__new__(cls, (tag, fields, text))
+
+    tag = property(itemgetter(0))
+    fields = property(itemgetter(1))
+    text = property(itemgetter(2))
+    attrib = property(lambda self: {})
+
+    def __repr__(self):
+        return '<Record %s>' % self.tag
+
+    def __len__(self):
+        return len(self.fields)
+
+    def __iter__(self):
+        # fields are kept in reverse document order; repeated fields are
+        # iterated once, at their last position
+        return iter([Field(tag, text or None)
+                     for tag, text in reversed(list(self.fields.items()))])
+
+    def get(self, key, default=None):
+        return self.attrib.get(key, default)
+
+    def find(self, path):
+        tag = _path_tag(path)
+        if tag in self.fields:
+            return Field(tag, self.fields[tag] or None)
+
+    def findall(self, path):
+        tag = _path_tag(path)
+        return [field for field in self if not tag or field.tag == tag]
+
+    def findtext(self, path, default=None):
+        tag = _path_tag(path)
+        return self.fields.get(tag, default)
+
+
+class Document(object):
+    """Flat document root, holding records."""
+
+    __slots__ = ('tag', 'text', 'attrib', 'children')
+
+    def __init__(self, tag, children=(), attrib=None):
+        self.tag = tag
+        self.text = None
+        self.attrib = attrib or {}
+        self.children = list(children)
+
+    def __len__(self):
+        return len(self.children)
+
+    def __iter__(self):
+        return iter(self.children)
+
+    def __getitem__(self, index):
+        return self.children[index]
+
+    def get(self, key, default=None):
+        return self.attrib.get(key, default)
+
+    def find(self, path):
+        tag = _path_tag(path)
+        for child in self.children:
+            if not tag or child.tag == tag:
+                return child
+
+    def findall(self, path):
+        tag = _path_tag(path)
+        if not tag:
+            return list(self.children)
+        return [child for child in self.children if child.tag == tag]
+
+    def findtext(self, path, default=None):
+        child = self.find(path)
+        if child is None:
+            return default
+        return child.text or ''
+
+    def extend(self, children):
+        self.children.extend(children)
+
+    def clear(self):
+        del self.children[:]
+        self.attrib = {}
+
+
+class NotFlat(ValueError):
+    """Document not in the flat records shape."""
+
+
+ENCODING = re.compile(br'^<\?xml[^>]*encoding=["\']([\w.-]+)["\']')
+ROOT = re.compile(r'\s*(?:<\?xml[^>]*\?>)?\s*<(\w+)((?:\s+\w+="[^"]*")*)\s*>')
+ATTRIBUTE = re.compile(r'(\w+)="([^"]*)"')
+ENTITY = re.compile(r'&(#x[0-9a-fA-F]+|#[0-9]+|\w+);')
+XML_ENTITIES = {'amp': '&', 'lt': '<', 'gt': '>', 'quot': '"', 'apos': "'"}
+
+
+def _entity(match):
+    name = match.group(1)
+    if name.startswith('#x'):
+        return unichr(int(name[2:], 16))
+    if name.startswith('#'):
+        return unichr(int(name[1:]))
+    if name in XML_ENTITIES:
+        return XML_ENTITIES[name]
+    raise NotFlat('Unknown entity: %s' % name)
+
+
+def unescape(text):
+    """Replace the character and entity references in text."""
+    return ENTITY.sub(_entity, text)
+
+
+def escape(text):
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace(
+        '>', '&gt;')
+
+
+class FlatParser(ElementTreeParser):
+    """TheTVDB flat records backend.
+
+    Documents whose root children are `record_tags` elements holding text
+    fields only are parsed into a Document of Records, with two regular
+    expression passes instead of building a tree; other documents are
+    parsed with `fallback` (ElementTree by default). Streaming
+    (iterrecords) uses the fallback too.
+
+    """
+
+    name = 'flat'
+
+    record_tags = ('Series', 'Episode', 'Banner')
+
+    # text field, followed by its closing tag
+    field = re.compile(r'<(\w+)>([^<]*)</')
+
+    def __init__(self, record_tags=None, fallback=None):
+        super(FlatParser, self).__init__()
+        if record_tags is not None:
+            self.record_tags = tuple(record_tags)
+        self.fallback = fallback or ElementTreeParser()
+        # unlike fields (eg. an Episode Series), records start with a field
+        self._record_start = re.compile(r'<(%s)>(?=\s*<\w)' % '|'.join(
+            re.escape(tag) for tag in self.record_tags))
+
+    def fromstring(self, content):
+        try:
+            return self._parse_flat(content)
+        except NotFlat:
+            return self.fallback.fromstring(content)
+
+    def parse(self, xml_file):
+        return self.fromstring(xml_file.read())
+
+    def iterrecords(self, xml_file):
+        return self.fallback.iterrecords(xml_file)
+
+    def element(self, tag, children=()):
+        return Document(tag, children)
+
+    def tostring(self, elem):
+        if isinstance(elem, Record):
+            return ('<%s>%s</%s>' % (elem.tag, ''.join(
+                '<%s>%s</%s>' % (field.tag, escape(field.text or ''),
+                                 field.tag)
+                for field in elem), elem.tag)).encode('utf-8')
+        if isinstance(elem, (Document, Field)):
+            raise TypeError('Only records can be serialized')
+        return self.fallback.tostring(elem)
+
+    def _decode(self, content):
+        if not isinstance(content, bytes):
+            return content
+        match = ENCODING.match(content)
+        text = content.decode(
+            match.group(1).decode('ascii') if match else 'utf-8')
+        return text.lstrip('\ufeff')
+
+    def _parse_flat(self, content):
+        text = self._decode(content)
+        if '\r' in text:
+            # XML line ends normalization
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
+        match = ROOT.match(text)
+        if match is None:
+            raise NotFlat('Unexpected document start')
+        tag = match.group(1)
+        close = '</%s>' % tag
+        end = text.rfind(close)
+        if end < match.end() or text[end:].strip() != close:
+            raise NotFlat('Unexpected document end')
+        body = text[match.end():end]
+        attrib = dict(
+            (name, unescape(value))
+            for name, value in ATTRIBUTE.findall(match.group(2)))
+
+        if tag in self.record_tags:
+            # a single record document (eg. a stored record)
+            if attrib:
+                raise NotFlat('Unexpected record attributes')
+            return self._records([tag, body + close])[0]
+        parts = self._record_start.split(body)
+        if parts[0].strip():
+            raise NotFlat('Unexpected content before records')
+        return Document(tag, self._records(parts[1:]), attrib)
+
+    def _records(self, parts):
+        """Return the Records for the (tag, chunk) parts.
+
+        Chunks hold the record fields and closing tag; comments, CDATA
+        sections, nested elements or attributes make the counts of tags
+        and fields differ.
+
+        """
+        findall = self.field.findall
+        make_record = tuple.__new__
+        records = []
+        append = records.append
+        for i in range(0, len(parts), 2):
+            tag, chunk = parts[i], parts[i + 1]
+            end = chunk.rfind('</')
+            if chunk[end + 2:].rstrip() != tag + '>':
+                raise NotFlat('Unexpected %s record end' % tag)
+            pairs = findall(chunk)
+            # empty element fields (<tag/>) are left out, as missing fields
+            if chunk.count('<') != 2 * len(pairs) + 1 + chunk.count('/>'):
+                raise NotFlat('Unexpected %s record content' % tag)
+            text = None if pairs else chunk[:end] or None
+            if '&' in chunk:
+                pairs = [(name, unescape(value)) for name, value in pairs]
+                if text is not None:
+                    text = unescape(text)
+            append(make_record(Record, (tag, dict(reversed(pairs)), text)))
+        return records
+
+
+PARSERS = {
+    'etree': ElementTreeParser,
+    'lxml': LxmlParser,
+    'flat': FlatParser,
+}
+
+
+def get_parser(parser=None):
+    """Return a parser backend, by name or instance.
+
+    By default lxml is used if installed, ElementTree otherwise (or if
+    lxml fails to import, on first use).
+
+    """
+    if parser is None:
+        if lxml_installed():
+            return LxmlParser(fallback=True)
+        parser = 'etree'
+    if isinstance(parser, ElementTreeParser):
+        return parser
+    try:
+        return PARSERS[parser]()
+    except KeyError:
+        raise ValueError('Unknown parser: %s' % parser)
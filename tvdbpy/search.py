@@ -0,0 +1,238 @@
+"""Local series title search index."""
+
+from __future__ import unicode_literals
+
+import bisect
+import heapq
+import itertools
+import math
+import re
+import threading
+import unicodedata
+
+from collections import Counter, defaultdict
+
+
+NON_ALNUM = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def normalize(title):
+    """Return the title lowercased, without accents nor punctuation."""
+    title = unicodedata.normalize('NFKD', title)
+    title = ''.join(c for c in title if not unicodedata.combining(c))
+    return NON_ALNUM.sub(' ', title.lower()).strip()
+
+
+def ngrams(text, n=3):
+    """Return the set of n-grams for the (normalized) text."""
+    text = ' %s ' % text
+    return set(text[i:i + n] for i in range(len(text) - n + 1))
+
+
+class SearchIndex(object):
+    """In-process series title search index.
+
+    Titles (and aliases, where available) of series and search results
+    are indexed by their normalized words, for prefix matching, and by
+    their n-grams, for fuzzy matching. Searches missing the index fall
+    back to the TvDB client search, if one is set, warming the index with
+    its results.
+
+    """
+
+    # min n-gram similarity (Dice coefficient) for fuzzy matches
+    min_similarity = 0.4
+    # max prefix matches ranked per search
+    max_candidates = 1000
+
+    def __init__(self, client=None, n=3):
+        super(SearchIndex, self).__init__()
+        self._client = client
+        self._n = n
+        self._items = {}
+        self._names = {}
+        # name indexes by series id
+        self._indexes = {}
+        self._next_index = 0
+        # (normalized name suffix, name index) keys, sorted on search;
+        # keys of removed names are dropped once they are half the keys
+        self._keys = []
+        self._dead_keys = 0
+        self._sorted = True
+        # name indexes by (name n-grams count, n-gram)
+        self._grams = defaultdict(set)
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, series_id):
+        return series_id in self._items
+
+    def add(self, item):
+        """Index a Series or SearchResult (replacing it if already there).
+
+        The names of a replaced item are indexed again if they changed
+        (eg. a renamed series).
+
+        """
+        names = [item.name] + list(getattr(item, 'aliases', None) or [])
+        names = [normalize(name) for name in names if name]
+        with self._lock:
+            self._items[item.id] = item
+            indexes = self._indexes.get(item.id)
+            if indexes is not None:
+                if [self._names[index][0] for index in indexes] == names:
+                    return
+                self._remove_names(item.id)
+            self._indexes[item.id] = [
+                self._add_name(name, item.id) for name in names]
+
+    def _add_name(self, name, series_id):
+        grams = ngrams(name, self._n)
+        index = self._next_index
+        self._next_index += 1
+        self._names[index] = (name, series_id, len(grams))
+        words = name.split()
+        for i in range(len(words)):
+            self._keys.append((' '.join(words[i:]), index))
+        self._sorted = False
+        for gram in grams:
+            self._grams[len(grams), gram].add(index)
+        return index
+
+    def _remove_names(self, series_id):
+        for index in self._indexes.pop(series_id):
+            name, _, count = self._names.pop(index)
+            for gram in ngrams(name, self._n):
+                postings = self._grams[count, gram]
+                postings.discard(index)
+                if not postings:
+                    del self._grams[count, gram]
+            self._dead_keys += len(name.split())
+        if self._dead_keys * 2 > len(self._keys):
+            self._keys = [key for key in self._keys if key[1] in self._names]
+            self._dead_keys = 0
+
+    def warm(self, results):
+        """Index the given search results."""
+        for item in results:
+            self.add(item)
+
+    def build_from_catalog(self, catalog):
+        """Index all the series in a local Catalog."""
+        for series in catalog.iter_series():
+            self.add(series)
+
+    def _prefix_matches(self, query):
+        """Yield (name index, starts with query) for matching names.
+
+        Names match when any of their words starts with the query.
+
+        """
+        if not self._sorted:
+            self._keys.sort()
+            self._sorted = True
+        start = bisect.bisect_left(self._keys, (query,))
+        end = min(start + self.max_candidates, len(self._keys))
+        for key, index in self._keys[start:end]:
+            if not key.startswith(query):
+                break
+            if index in self._names:
+                yield index, key == self._names[index][0]
+
+    def _fuzzy_matches(self, query, limit):
+        """Return (name index, similarity) for the names similar to query.
+
+        Only the best names of (at least) the `limit` most similar series
+        are returned. Names are looked up by their n-grams count, starting
+        with the counts allowing the highest similarities, and for each
+        count only the names in the rarest query n-grams are candidates:
+        those needed to reach the similarity of the limit-th best series
+        found so far (as in CPMerge, Okazaki and Tsujii, 2010).
+
+        """
+        grams = ngrams(query, self._n)
+        size = len(grams)
+        threshold = self.min_similarity
+
+        def max_similarity(count):
+            return 2.0 * min(size, count) / (size + count)
+
+        counts = sorted(range(1, int(2 * size / threshold) + 1),
+                        key=max_similarity, reverse=True)
+        best = {}
+        for count in counts:
+            if max_similarity(count) < threshold:
+                break
+            # min common n-grams reaching the threshold
+            needed = int(math.ceil(threshold * (size + count) / 2 - 1e-9))
+            postings = [self._grams[count, gram] for gram in grams
+                        if (count, gram) in self._grams]
+            if len(postings) < needed:
+                continue
+            postings.sort(key=len)
+            # names in none of the rarest postings can not reach needed
+            split = len(postings) - needed + 1
+            common = Counter(itertools.chain(*postings[:split]))
+            candidates = set(common)
+            common.update(itertools.chain(*[
+                posting & candidates for posting in postings[split:]]))
+            found = False
+            for index, matched in common.items():
+                similarity = 2.0 * matched / (size + count)
+                if matched < needed or similarity < threshold:
+                    continue
+                series_id = self._names[index][1]
+                if similarity > best.get(series_id, (0,))[0]:
+                    best[series_id] = (similarity, index)
+                    found = True
+            if found and len(best) >= limit:
+                threshold = max(threshold, heapq.nlargest(
+                    limit, best.values())[-1][0])
+                best = dict((series_id, match)
+                            for series_id, match in best.items()
+                            if match[0] >= threshold)
+        return [(index, similarity) for similarity, index in best.values()]
+
+    def lookup(self, title, limit=10):
+        """Return the indexed items best matching title, best first.
+
+        Exact matches rank first, then titles starting with the query,
+        then titles with a word starting with it (shorter titles first
+        in each group) and finally fuzzy matches by similarity.
+
+        """
+        query = normalize(title)
+        if not query:
+            return []
+        ranked = {}
+        with self._lock:
+            for index, full in self._prefix_matches(query):
+                name, series_id, _ = self._names[index]
+                group = 0 if name == query else (1 if full else 2)
+                rank = (group, len(name), name)
+                if series_id not in ranked or rank < ranked[series_id]:
+                    ranked[series_id] = rank
+            if len(ranked) < limit:
+                for index, similarity in self._fuzzy_matches(query, limit):
+                    name, series_id, _ = self._names[index]
+                    rank = (3, -similarity, name)
+                    if series_id not in ranked or rank < ranked[series_id]:
+                        ranked[series_id] = rank
+            best = sorted(ranked, key=ranked.get)[:limit]
+            return [self._items[series_id] for series_id in best]
+
+    def search(self, title, limit=10):
+        """Search for series with the specified title.
+
+        Return the local matches, or the (indexed) TvDB client search
+        results if there are none.
+
+        """
+        results = self.lookup(title, limit=limit)
+        if not results and self._client is not None:
+            results = self._client.search(title) or []
+            self.warm(results)
+            results = results[:limit]
+        return results
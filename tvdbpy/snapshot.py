@@ -0,0 +1,361 @@
+"""Compact binary snapshots of parsed Series and their episodes.
+
+A snapshot holds a Series fields and (if loaded) its episodes, so they
+can be reloaded without the XML payloads. Layout (little-endian):
+
+- header: magic, format version, flags, string and episode counts and
+  the string indexes of the series and episode schemas
+- string table: offsets (count + 1) and the UTF-8 encoded strings; all
+  the string values (and the schemas) are stored once
+- series record
+- episode index: (season, number) pairs, sorted
+- episode records, in index order
+
+Schemas are `attr:kind` lists; records are fixed size, a mask of None
+fields followed by a value per field (string index, int, float or date
+ordinal), so a single episode can be decoded from its index position.
+
+"""
+
+from __future__ import unicode_literals
+
+import bisect
+import struct
+
+from collections import defaultdict
+from datetime import date
+
+from tvdbpy.errors import SnapshotError
+from tvdbpy.helpers import (
+    as_date,
+    as_float,
+    as_int,
+    as_interned,
+    as_interned_list,
+    as_list,
+    intern,
+    memoized,
+)
+from tvdbpy.tvdb import Episode, Season, Series
+
+
+MAGIC = b'TVDBSNAP'
+VERSION = 1
+
+# flags
+EPISODES_LOADED = 1
+
+HEADER = struct.Struct('<8sHHIIII')
+OFFSET = struct.Struct('<I')
+INDEX_ENTRY = struct.Struct('<ii')
+
+# index value for missing (not valid) season or episode numbers
+MISSING_NUMBER = -2 ** 31
+
+# field kind by cast, and kind struct format
+KINDS = {
+    None: 's',
+    as_interned: 'S',
+    as_list: 'l',
+    as_interned_list: 'L',
+    int: 'i',
+    as_int: 'i',
+    float: 'f',
+    as_float: 'f',
+    as_date: 'd',
+}
+FORMATS = {'s': 'I', 'S': 'I', 'l': 'I', 'L': 'I', 'i': 'q', 'f': 'd',
+           'd': 'i'}
+
+
+def _schema(cls):
+    """Return the (attr, kind) pairs for a model fields."""
+    try:
+        return [(attr, KINDS[cast]) for attr, _, cast in cls._fields]
+    except KeyError as e:
+        raise SnapshotError('Unsupported field cast: %r' % (e.args[0],))
+
+
+def _record_struct(kinds):
+    """Return the record struct: the None fields mask and the values."""
+    if len(kinds) > 64:
+        raise SnapshotError('Too many fields: %d' % len(kinds))
+    return struct.Struct('<Q' + ''.join(FORMATS[kind] for kind in kinds))
+
+
+def _number_key(value):
+    return MISSING_NUMBER if value is None else value
+
+
+class _StringTable(object):
+    """Strings to encode, by first use."""
+
+    def __init__(self):
+        super(_StringTable, self).__init__()
+        self.indexes = {}
+
+    def add(self, value):
+        index = self.indexes.get(value)
+        if index is None:
+            index = self.indexes[value] = len(self.indexes)
+        return index
+
+    def encode(self):
+        strings = sorted(self.indexes, key=self.indexes.get)
+        encoded = [value.encode('utf-8') for value in strings]
+        offsets = [0]
+        for value in encoded:
+            offsets.append(offsets[-1] + len(value))
+        return (struct.pack('<%dI' % len(offsets), *offsets) +
+                b''.join(encoded))
+
+
+def _encode_record(record, schema, item, strings):
+    mask = 0
+    values = []
+    for i, (attr, kind) in enumerate(schema):
+        value = getattr(item, attr, None)
+        if value is None:
+            mask |= 1 << i
+            value = 0
+        elif kind in 'sS':
+            value = strings.add(value)
+        elif kind in 'lL':
+            value = strings.add('|'.join(value))
+        elif kind == 'd':
+            value = value.toordinal()
+        values.append(value)
+    return record.pack(mask, *values)
+
+
+def dumps(series):
+    """Return the snapshot bytes for a Series (and its loaded episodes)."""
+    strings = _StringTable()
+    series_schema = _schema(Series)
+    episode_schema = _schema(Episode)
+    schemas = [
+        strings.add(';'.join('%s:%s' % field for field in schema))
+        for schema in (series_schema, episode_schema)]
+
+    flags = 0
+    entries = []
+    if series._seasons is not None:
+        flags |= EPISODES_LOADED
+        for season_number, season in series._seasons.items():
+            for number, item in season._items.items():
+                if not isinstance(item, Episode):
+                    item = season._build_episode(item)
+                entries.append(
+                    (_number_key(season_number), _number_key(number), item))
+        entries.sort(key=lambda entry: entry[:2])
+
+    series_record = _encode_record(
+        _record_struct([kind for _, kind in series_schema]), series_schema,
+        series, strings)
+    episode_struct = _record_struct([kind for _, kind in episode_schema])
+    episode_records = [
+        _encode_record(episode_struct, episode_schema, episode, strings)
+        for _, _, episode in entries]
+    index = [INDEX_ENTRY.pack(season, number)
+             for season, number, _ in entries]
+
+    header = HEADER.pack(
+        MAGIC, VERSION, flags, len(strings.indexes), len(entries), *schemas)
+    return b''.join(
+        [header, strings.encode(), series_record] + index + episode_records)
+
+
+def loads(data, client=None):
+    """Return the Series from snapshot bytes (episodes decoded lazily)."""
+    return Snapshot(data, client=client).series
+
+
+def dump(series, f):
+    """Write the snapshot for a Series to a binary file."""
+    f.write(dumps(series))
+
+
+def load(f, client=None):
+    """Return the Series from a snapshot binary file."""
+    return loads(f.read(), client=client)
+
+
+@memoized(size=4096)
+def _date_from_ordinal(value):
+    return date.fromordinal(value)
+
+
+class _IndexKeys(object):
+    """Sequence of the (season, number) episode index entries."""
+
+    def __init__(self, data, offset, count):
+        super(_IndexKeys, self).__init__()
+        self.data = data
+        self.offset = offset
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        return INDEX_ENTRY.unpack_from(
+            self.data, self.offset + i * INDEX_ENTRY.size)
+
+
+class SnapshotSeason(Season):
+    """Season with its episodes decoded from a snapshot when accessed."""
+
+    def __init__(self, series, snapshot):
+        super(SnapshotSeason, self).__init__(series)
+        self._snapshot = snapshot
+
+    def _build_episode(self, item):
+        return self._snapshot._decode_episode(item, series=self._series)
+
+
+class Snapshot(object):
+    """Decoder for snapshot data.
+
+    `data` may be any buffer (eg. bytes or a mmap); only the header is
+    read up front, strings and episodes are decoded as needed.
+
+    """
+
+    def __init__(self, data, client=None):
+        super(Snapshot, self).__init__()
+        self._data = data
+        self._client = client
+        if len(data) < HEADER.size or bytes(data[:len(MAGIC)]) != MAGIC:
+            raise SnapshotError('Not a snapshot')
+        (_, version, self.flags, string_count, self.episode_count,
+         series_schema, episode_schema) = HEADER.unpack_from(data)
+        if version > VERSION:
+            raise SnapshotError('Unsupported snapshot version: %d' % version)
+
+        self._strings = [None] * string_count
+        self._strings_offset = HEADER.size
+        self._blob_offset = HEADER.size + OFFSET.size * (string_count + 1)
+        if len(data) < self._blob_offset:
+            raise SnapshotError('Truncated snapshot')
+        blob_size = self._offset(string_count)
+        if len(data) < self._blob_offset + blob_size:
+            raise SnapshotError('Truncated snapshot')
+
+        self._series_fields = self._decoders(series_schema, Series)
+        self._series_struct = _record_struct(
+            [kind for _, kind, _ in self._series_fields])
+        self._series_offset = self._blob_offset + blob_size
+        self._episode_fields = self._decoders(episode_schema, Episode)
+        self._episode_struct = _record_struct(
+            [kind for _, kind, _ in self._episode_fields])
+        self._index = _IndexKeys(
+            data, self._series_offset + self._series_struct.size,
+            self.episode_count)
+        self._episodes_offset = (
+            self._index.offset + INDEX_ENTRY.size * self.episode_count)
+        self._series = None
+
+        end = (self._episodes_offset +
+               self._episode_struct.size * self.episode_count)
+        if len(data) < end:
+            raise SnapshotError('Truncated snapshot')
+
+    def _offset(self, index):
+        return OFFSET.unpack_from(
+            self._data, self._strings_offset + OFFSET.size * index)[0]
+
+    def _string(self, index):
+        value = self._strings[index]
+        if value is None:
+            start, end = self._offset(index), self._offset(index + 1)
+            value = bytes(self._data[
+                self._blob_offset + start:self._blob_offset + end])
+            value = self._strings[index] = value.decode('utf-8')
+        return value
+
+    def _decoders(self, schema_index, cls):
+        """Return (attr, kind, decode) for a stored schema.
+
+        Fields unknown to the model are skipped, so snapshots can still
+        be read after model fields are removed.
+
+        """
+        attrs = set(attr for attr, _, _ in cls._fields)
+        decoders = {
+            's': self._string,
+            'S': lambda value: intern(self._string(value)),
+            'l': lambda value: self._string(value).split('|'),
+            'L': lambda value: [
+                intern(item) for item in self._string(value).split('|')],
+            'i': None,
+            'f': None,
+            'd': _date_from_ordinal,
+        }
+        fields = []
+        for field in self._string(schema_index).split(';'):
+            attr, kind = field.split(':')
+            if kind not in FORMATS:
+                raise SnapshotError('Unknown field kind: %s' % kind)
+            fields.append(
+                (attr if attr in attrs else None, kind, decoders[kind]))
+        return fields
+
+    def _decode_record(self, cls, fields, record, offset, item):
+        values = record.unpack_from(self._data, offset)
+        mask = values[0]
+        # fields missing from the snapshot are left as None
+        for attr, _, _ in cls._fields:
+            setattr(item, attr, None)
+        for i, (attr, _, decode) in enumerate(fields):
+            if attr is None or mask & (1 << i):
+                continue
+            value = values[i + 1]
+            setattr(item, attr, value if decode is None else decode(value))
+        return item
+
+    def _decode_episode(self, position, series=None):
+        episode = Episode.__new__(Episode)
+        episode._client = self._client
+        episode._series = series
+        return self._decode_record(
+            Episode, self._episode_fields, self._episode_struct,
+            self._episodes_offset + position * self._episode_struct.size,
+            episode)
+
+    @property
+    def series(self):
+        """Return the Series, with its (lazily decoded) episodes."""
+        if self._series is None:
+            series = Series.__new__(Series)
+            series._client = self._client
+            series._episode_requests = 0
+            series._seasons = None
+            self._decode_record(
+                Series, self._series_fields, self._series_struct,
+                self._series_offset, series)
+            if self.flags & EPISODES_LOADED:
+                series._seasons = self._load_seasons(series)
+            self._series = series
+        return self._series
+
+    def _load_seasons(self, series):
+        seasons = defaultdict(lambda: SnapshotSeason(series, self))
+        for position in range(self.episode_count):
+            season, number = self._index[position]
+            if season == MISSING_NUMBER:
+                season = None
+            if number == MISSING_NUMBER:
+                number = None
+            seasons[season]._add_xml_data(number, position)
+        return seasons
+
+    def get_episode(self, season, number):
+        """Return a single episode (or None), without decoding the others.
+
+        The episode is bound to the series if it was already decoded.
+
+        """
+        key = (_number_key(season), _number_key(number))
+        position = bisect.bisect_left(self._index, key)
+        if position < self.episode_count and self._index[position] == key:
+            return self._decode_episode(position, series=self._series)
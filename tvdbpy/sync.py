@@ -0,0 +1,220 @@
+"""Incremental sync engine for the TvDB updates feeds."""
+
+from __future__ import unicode_literals
+
+import calendar
+import json
+import os
+import time
+
+from collections import OrderedDict, defaultdict
+
+from tvdbpy.tvdb import TvDB
+
+
+# updates timeframes, by the max age (in seconds) they cover
+TIMEFRAMES = (
+    (24 * 60 * 60, TvDB.DAY),
+    (7 * 24 * 60 * 60, TvDB.WEEK),
+    (30 * 24 * 60 * 60, TvDB.MONTH),
+)
+
+SERIES = 'series'
+SERIES_FULL = 'series_full'
+EPISODE = 'episode'
+
+
+def update_time(update):
+    """Return the update unix timestamp (0 if not available)."""
+    timestamp = getattr(update, 'timestamp', None)
+    if timestamp is None:
+        return 0
+    return calendar.timegm(timestamp.utctimetuple())
+
+
+class SyncStats(object):
+    """Sync run counters."""
+
+    def __init__(self):
+        super(SyncStats, self).__init__()
+        self.updates = 0
+        self.refreshed = 0
+        self.elapsed = 0.0
+
+    @property
+    def items_per_second(self):
+        """Return the feed updates processed per second."""
+        if not self.elapsed:
+            return 0.0
+        return self.updates / self.elapsed
+
+    def as_dict(self):
+        return {
+            'updates': self.updates,
+            'refreshed': self.refreshed,
+            'elapsed': self.elapsed,
+            'items_per_second': self.items_per_second,
+        }
+
+
+class UpdateSync(object):
+    """Apply the TvDB updates feed, refreshing the updated items.
+
+    Updates are coalesced by (kind, id) to the latest one and episode
+    updates are grouped under their series; a series with at least
+    `zip_threshold` updated episodes is refreshed with a single full
+    series fetch instead. Refreshed items are passed to the `on_series`
+    and `on_episode` callbacks.
+
+    The time of the last complete sync is kept as checkpoint (in a JSON
+    file, if `checkpoint_path` is set). It is also advanced while a run
+    progresses, so an interrupted sync resumes where it stopped.
+
+    """
+
+    zip_threshold = 3
+    checkpoint_every = 100
+
+    def __init__(self, client, checkpoint_path=None, on_series=None,
+                 on_episode=None, zip_threshold=None, clock=time.time):
+        super(UpdateSync, self).__init__()
+        self.client = client
+        self.checkpoint_path = checkpoint_path
+        self.on_series = on_series
+        self.on_episode = on_episode
+        if zip_threshold is not None:
+            self.zip_threshold = zip_threshold
+        self._clock = clock
+        self._checkpoint = None
+
+    def load_checkpoint(self):
+        """Return the stored checkpoint, or None."""
+        if self.checkpoint_path is None:
+            return self._checkpoint
+        try:
+            with open(self.checkpoint_path) as f:
+                return json.load(f)['checkpoint']
+        except (IOError, OSError, ValueError, KeyError):
+            return None
+
+    def save_checkpoint(self, value):
+        """Store the checkpoint."""
+        self._checkpoint = value
+        if self.checkpoint_path is not None:
+            tmp_path = self.checkpoint_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump({'checkpoint': value}, f)
+            os.rename(tmp_path, self.checkpoint_path)
+
+    @property
+    def checkpoint(self):
+        return self.load_checkpoint()
+
+    def accept(self, update):
+        """Return whether the update should be applied."""
+        return True
+
+    def coalesce(self, updates):
+        """Return the latest series/episode update for each item."""
+        latest = OrderedDict()
+        for update in updates:
+            if update.kind not in (TvDB.SERIES, TvDB.EPISODE):
+                continue
+            if not self.accept(update):
+                continue
+            key = (update.kind, update.id)
+            current = latest.get(key)
+            if current is None or update_time(update) >= update_time(current):
+                latest[key] = update
+        return list(latest.values())
+
+    def plan(self, updates):
+        """Return the (timestamp, action, item id) tasks, oldest first."""
+        series = OrderedDict()
+        episodes = defaultdict(list)
+        for update in self.coalesce(updates):
+            if update.kind == TvDB.SERIES:
+                series[update.id] = update
+            else:
+                episodes[getattr(update, 'series', None)].append(update)
+
+        tasks = []
+        for series_id, grouped in episodes.items():
+            if series_id is not None and len(grouped) >= self.zip_threshold:
+                if series_id in series:
+                    grouped.append(series.pop(series_id))
+                timestamp = max(update_time(u) for u in grouped)
+                tasks.append((timestamp, SERIES_FULL, series_id))
+            else:
+                tasks.extend(
+                    (update_time(u), EPISODE, u.id) for u in grouped)
+        tasks.extend((update_time(u), SERIES, u.id) for u in series.values())
+        tasks.sort(key=lambda task: task[0])
+        return tasks
+
+    # refreshes expire the client cached responses first, so the updated
+    # items are not served from the cache
+
+    def refresh_series(self, series_id):
+        self.client._expire_cached(self.client._series_path(series_id))
+        self._notify(self.on_series, self.client.get_series_by_id(series_id))
+
+    def refresh_series_full(self, series_id):
+        self.client._expire_cached(
+            self.client._series_path(series_id, extended=True))
+        self._notify(self.on_series, self.client.get_series_by_id(
+            series_id, extended=True))
+
+    def refresh_episode(self, episode_id):
+        self.client._expire_cached(self.client._episode_path(episode_id))
+        self._notify(
+            self.on_episode, self.client.get_episode_by_id(episode_id))
+
+    def _notify(self, callback, item):
+        if callback is not None and item is not None:
+            callback(item)
+
+    def run(self, updates, until=None):
+        """Apply the updates; set the checkpoint to `until` when done."""
+        stats = SyncStats()
+        start = self._clock()
+
+        def counted(updates):
+            for update in updates:
+                stats.updates += 1
+                yield update
+
+        actions = {
+            SERIES: self.refresh_series,
+            SERIES_FULL: self.refresh_series_full,
+            EPISODE: self.refresh_episode,
+        }
+        for timestamp, action, item_id in self.plan(counted(updates)):
+            actions[action](item_id)
+            stats.refreshed += 1
+            if timestamp and stats.refreshed % self.checkpoint_every == 0:
+                self.save_checkpoint(timestamp)
+        if until is not None:
+            self.save_checkpoint(until)
+        stats.elapsed = self._clock() - start
+        return stats
+
+    def updates_since(self, since, now):
+        """Return the updates feed covering the time since `since`."""
+        for max_age, timeframe in TIMEFRAMES:
+            if now - since <= max_age:
+                return self.client.iter_updated(timeframe, since=since)
+        return self.client.updated_since(since)
+
+    def sync(self):
+        """Apply the updates since the checkpoint; return a SyncStats.
+
+        The first sync only sets the checkpoint.
+
+        """
+        now = int(self._clock())
+        since = self.checkpoint
+        if since is None:
+            self.save_checkpoint(now)
+            return SyncStats()
+        return self.run(self.updates_since(since, now), until=now)
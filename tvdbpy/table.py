@@ -0,0 +1,278 @@
+"""Columnar view of a series episodes, for analytics.
+
+EpisodeTable holds the episodes fields as typed columns, built straight
+from the series XML data without creating Episode objects:
+
+- id: episode ids
+- season, number, rating_count: integers (MISSING if not valid)
+- rating: floats (NaN if not valid)
+- first_aired: date ordinals (MISSING if not valid)
+
+Columns are NumPy arrays if NumPy is installed, `array` arrays (and a
+list for ids) otherwise. Tables are filtered, sorted and grouped into new
+tables; Episode objects are only built for the rows asked for.
+
+"""
+
+from __future__ import division, unicode_literals
+
+import math
+import operator
+
+from array import array
+from collections import OrderedDict
+
+from tvdbpy.helpers import field_values
+from tvdbpy.tvdb import Episode
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# missing value of the integer columns (NaN for floats)
+MISSING = -1
+
+# column name, Episode attribute and typecode
+COLUMNS = (
+    ('id', 'id', None),
+    ('season', 'season', 'l'),
+    ('number', 'number', 'l'),
+    ('rating', 'rating', 'd'),
+    ('rating_count', 'rating_count', 'l'),
+    ('first_aired', '_first_aired', 'l'),
+)
+TYPECODES = dict((name, typecode) for name, _, typecode in COLUMNS)
+
+OPERATORS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+
+def _missing(typecode):
+    if typecode is None:
+        return None
+    return float('nan') if typecode == 'd' else MISSING
+
+
+def _is_missing(value):
+    return value is None or value == MISSING or value != value
+
+
+def _make_column(typecode, values):
+    if numpy is not None:
+        if typecode is None:
+            column = numpy.empty(len(values), dtype=object)
+            column[:] = values
+            return column
+        return numpy.array(values, dtype='d' if typecode == 'd' else 'i8')
+    if typecode is None:
+        return list(values)
+    return array(typecode, values)
+
+
+class _Source(object):
+    """Episodes XML data of a table and its filtered tables."""
+
+    def __init__(self, items, series=None, client=None):
+        super(_Source, self).__init__()
+        self.items = items
+        self.episodes = [None] * len(items)
+        self.series = series
+        self.client = client
+
+    def episode(self, row):
+        episode = self.episodes[row]
+        if episode is None:
+            episode = self.episodes[row] = Episode(
+                self.items[row], series=self.series, client=self.client)
+        return episode
+
+
+class EpisodeTable(object):
+    """Episodes as typed columns, see the module documentation."""
+
+    def __init__(self, columns, rows, source):
+        super(EpisodeTable, self).__init__()
+        self._columns = columns
+        # rows in the source, for the episodes
+        self._rows = rows
+        self._source = source
+
+    @classmethod
+    def from_xml(cls, data, series=None, client=None):
+        """Return the table of the episodes in the series XML data."""
+        items = data.findall('./Episode')
+        fields = dict((attr, (elem_name, cast))
+                      for attr, elem_name, cast in Episode._fields)
+        values = dict((name, []) for name, _, _ in COLUMNS)
+        specs = [(values[name].append, fields[attr], _missing(typecode))
+                 for name, attr, typecode in COLUMNS]
+        for xml_data in items:
+            get = field_values(xml_data).get
+            for append, (elem_name, cast), missing in specs:
+                value = get(elem_name)
+                try:
+                    value = cast(value) if value else missing
+                except ValueError:
+                    value = missing
+                append(value)
+        values['first_aired'] = [
+            value if value == MISSING else value.toordinal()
+            for value in values['first_aired']]
+        columns = dict((name, _make_column(TYPECODES[name], column))
+                       for name, column in values.items())
+        rows = _make_column('l', range(len(items)))
+        return cls(columns, rows, _Source(items, series, client))
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __getitem__(self, name):
+        """Return a column by name."""
+        return self._columns[name]
+
+    def __repr__(self):
+        return '<EpisodeTable: %d episodes>' % len(self)
+
+    @property
+    def columns(self):
+        return [name for name, _, _ in COLUMNS]
+
+    def episode(self, row):
+        """Return the Episode at row (built once, on first access)."""
+        return self._source.episode(self._rows[row])
+
+    def episodes(self):
+        """Yield the Episodes, in row order."""
+        for row in range(len(self)):
+            yield self.episode(row)
+
+    def take(self, indexes):
+        """Return a table with the rows at the given positions."""
+        if numpy is not None:
+            indexes = numpy.asarray(indexes, dtype='i8')
+            columns = dict((name, column[indexes])
+                           for name, column in self._columns.items())
+            return EpisodeTable(columns, self._rows[indexes], self._source)
+        columns = dict(
+            (name, _make_column(TYPECODES[name], [column[i] for i in indexes]))
+            for name, column in self._columns.items())
+        rows = _make_column('l', [self._rows[i] for i in indexes])
+        return EpisodeTable(columns, rows, self._source)
+
+    def mask(self, name, op, value):
+        """Return the rows mask of `column op value` (eg. 'season', '==', 1).
+
+        Rows with a missing value never match.
+
+        """
+        compare = OPERATORS[op]
+        column = self._columns[name]
+        if numpy is not None and name != 'id':
+            valid = (~numpy.isnan(column) if TYPECODES[name] == 'd'
+                     else column != MISSING)
+            return valid & compare(column, value)
+        return [not _is_missing(item) and compare(item, value)
+                for item in column]
+
+    def filter(self, *masks):
+        """Return a table with the rows matching all the masks."""
+        if not masks:
+            return self
+        for mask in masks:
+            if len(mask) != len(self):
+                raise ValueError('Mask length does not match the table')
+        if numpy is not None:
+            selected = numpy.logical_and.reduce(
+                [numpy.asarray(mask, dtype=bool) for mask in masks])
+            return self.take(numpy.flatnonzero(selected))
+        return self.take([i for i, selected in enumerate(zip(*masks))
+                          if all(selected)])
+
+    def sort(self, *names, **kwargs):
+        """Return a table sorted by the given columns (stable).
+
+        Missing integers sort first, missing floats last (as NumPy does);
+        `reverse=True` reverses the whole order.
+
+        """
+        reverse = kwargs.pop('reverse', False)
+        if kwargs:
+            raise TypeError('Unexpected arguments: %s' % ', '.join(kwargs))
+        if numpy is not None:
+            order = numpy.lexsort(
+                [self._columns[name] for name in reversed(names)])
+            if reverse:
+                order = order[::-1]
+            return self.take(order)
+
+        keys = []
+        for name in names:
+            column = self._columns[name]
+            if TYPECODES[name] == 'd':
+                keys.append([(math.isnan(v), v) for v in column])
+            else:
+                keys.append(column)
+        order = sorted(range(len(self)),
+                       key=lambda i: tuple(key[i] for key in keys))
+        if reverse:
+            order.reverse()
+        return self.take(order)
+
+    def group_by_season(self):
+        """Return the season tables by season number (None if missing)."""
+        column = self._columns['season']
+        groups = OrderedDict()
+        if numpy is not None:
+            order = numpy.argsort(column, kind='stable')
+            seasons, starts = numpy.unique(column[order], return_index=True)
+            for season, indexes in zip(
+                    seasons, numpy.split(order, starts[1:])):
+                groups[None if season == MISSING else int(season)] = (
+                    self.take(indexes))
+            return groups
+
+        positions = {}
+        for i, season in enumerate(column):
+            positions.setdefault(season, []).append(i)
+        for season in sorted(positions):
+            groups[None if season == MISSING else season] = self.take(
+                positions[season])
+        return groups
+
+    def _valid_values(self, name):
+        column = self._columns[name]
+        if numpy is not None:
+            if TYPECODES[name] == 'd':
+                return column[~numpy.isnan(column)]
+            return column[column != MISSING]
+        return [value for value in column if not _is_missing(value)]
+
+    def mean(self, name):
+        """Return the mean of a numeric column (None if all missing)."""
+        values = self._valid_values(name)
+        if not len(values):
+            return None
+        if numpy is not None:
+            return float(values.mean())
+        return sum(values) / len(values)
+
+    def diff(self, name):
+        """Return the differences between consecutive values of a column.
+
+        Missing values are skipped; eg. the air date gaps (in days) are
+        `table.sort('first_aired').diff('first_aired')`.
+
+        """
+        values = self._valid_values(name)
+        if numpy is not None:
+            return numpy.diff(values)
+        return _make_column(TYPECODES[name], [
+            b - a for a, b in zip(values, values[1:])])
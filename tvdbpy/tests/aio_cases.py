@@ -0,0 +1,314 @@
+from __future__ import unicode_literals
+
+import asyncio
+import os
+import threading
+import unittest
+
+import mock
+
+from tvdbpy.aio import AsyncResponse, AsyncTvDB
+from tvdbpy.errors import APIKeyRequiredError, APIResponseError
+from tvdbpy.limits import TokenBucket
+from tvdbpy.tests.test_tvdb import TESTS_DIR
+from tvdbpy.tvdb import Episode, SearchResult, Series, TvDB, Update
+
+
+class FakeAsyncTransport(object):
+    """Async transport stand-in serving test data files."""
+
+    def __init__(self):
+        self.calls = []
+        self.responses = {}
+        self.active = 0
+        self.max_active = 0
+
+    def add(self, url, filename=None, content_type='text/xml',
+            status_code=200):
+        content = b''
+        if filename is not None:
+            with open(os.path.join(TESTS_DIR, 'testdata', filename),
+                      'rb') as f:
+                content = f.read()
+        self.responses[url] = AsyncResponse(
+            status_code, {'content-type': content_type}, content)
+
+    async def get(self, url, params=None):
+        self.calls.append((url, params))
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(0)
+        self.active -= 1
+        return self.responses[url]
+
+    async def close(self):
+        pass
+
+
+class AsyncTvDBTestCase(unittest.IsolatedAsyncioTestCase):
+    """asyncio TvDB client test case."""
+
+    base_url = 'http://thetvdb.com/api/123456789/'
+
+    def setUp(self):
+        super(AsyncTvDBTestCase, self).setUp()
+        self.transport = FakeAsyncTransport()
+        self.tvdb = AsyncTvDB(api_key='123456789', transport=self.transport)
+
+    async def test_search(self):
+        self.transport.add(
+            'http://thetvdb.com/api/GetSeries.php', 'getseries.xml')
+        results = await self.tvdb.search('chuck')
+
+        self.assertEqual(len(results), 7)
+        self.assertIsInstance(results[0], SearchResult)
+        self.assertEqual(
+            self.transport.calls,
+            [('http://thetvdb.com/api/GetSeries.php',
+              {'seriesname': 'chuck'})])
+
+    async def test_get_series_by_id(self):
+        self.transport.add(self.base_url + 'series/80348/en.xml', 'series.xml')
+        result = await self.tvdb.get_series_by_id(80348)
+
+        self.assertIsInstance(result, Series)
+        self.assertEqual(result.name, 'Chuck')
+        # items are bound to a (sync) TvDB client
+        self.assertIsInstance(result._client, TvDB)
+
+    async def test_get_series_by_id_extended(self):
+        self.transport.add(
+            self.base_url + 'series/80348/all/en.zip', '80348.zip',
+            content_type='application/zip')
+        result = await self.tvdb.get_series_by_id(80348, extended=True)
+
+        self.assertEqual(len(result.seasons), 6)
+        self.assertEqual(len(result.seasons[1]), 13)
+
+    async def test_unzip_off_the_event_loop(self):
+        self.transport.add(
+            self.base_url + 'series/80348/all/en.zip', '80348.zip',
+            content_type='application/zip')
+        client = self.tvdb._client
+        unzip, parse = client._unzip_xml, client._parse_full_series
+        threads = []
+
+        def _unzip_xml(*args):
+            threads.append(threading.current_thread())
+            return unzip(*args)
+
+        def _parse_full_series(*args):
+            threads.append(threading.current_thread())
+            return parse(*args)
+        with mock.patch.multiple(client, _unzip_xml=_unzip_xml,
+                                 _parse_full_series=_parse_full_series):
+            result = await self.tvdb.get_series_by_id(80348, extended=True)
+
+        self.assertEqual(len(result.seasons), 6)
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(threading.current_thread(), threads)
+
+    async def test_get_series_episodes(self):
+        self.transport.add(
+            self.base_url + 'series/80348/all/en.zip', '80348.zip',
+            content_type='application/zip')
+        result = await self.tvdb.get_series_episodes(
+            80348, [(1, 1), (1, 2), (99, 1)])
+
+        self.assertEqual(
+            [(e.season, e.number) for e in result[:2]], [(1, 1), (1, 2)])
+        self.assertIsNone(result[2])
+        self.assertEqual(len(self.transport.calls), 1)
+
+    async def test_language(self):
+        tvdb = AsyncTvDB(
+            api_key='123456789', transport=self.transport, language='de')
+        self.transport.add(
+            'http://thetvdb.com/api/GetSeries.php', 'getseries.xml')
+        self.transport.add(
+            self.base_url + 'episodes/332179/de.xml', 'episode.xml')
+        await tvdb.search('chuck')
+        await tvdb.get_episode_by_id(332179)
+
+        self.assertEqual(self.transport.calls, [
+            ('http://thetvdb.com/api/GetSeries.php',
+             {'seriesname': 'chuck', 'language': 'de'}),
+            (self.base_url + 'episodes/332179/de.xml', {})])
+
+    async def test_given_client(self):
+        events = []
+        client = TvDB(api_key='123456789')
+        tvdb = AsyncTvDB(
+            api_key='123456789', transport=self.transport, client=client,
+            observers=[events.append], language='de')
+        self.transport.add(
+            self.base_url + 'episodes/332179/de.xml', 'episode.xml')
+        await tvdb.get_episode_by_id(332179)
+
+        self.assertEqual(client.language, 'de')
+        self.assertEqual(
+            self.transport.calls, [(self.base_url + 'episodes/332179/de.xml',
+                                    {})])
+        self.assertEqual(events[0].kind, 'request')
+
+    async def test_get_series_languages(self):
+        self.transport.add(
+            self.base_url + 'series/80348/all/en.zip', '80348.zip',
+            content_type='application/zip')
+        self.transport.add(
+            self.base_url + 'series/80348/all/de.zip', '80348_de.zip',
+            content_type='application/zip')
+        result = await self.tvdb.get_series_languages(
+            80348, ['de', 'en', 'de'], extended=True)
+
+        self.assertEqual(list(result), ['de', 'en'])
+        self.assertEqual(result['de'].language, 'de')
+        self.assertEqual(
+            result['de'].seasons[1][1].name, 'Chuck gegen den Intersect')
+        self.assertEqual(
+            result['en'].seasons[1][1].name, 'Chuck Versus the Intersect')
+        self.assertEqual(self.transport.max_active, 2)
+
+    async def test_get_episode_by_id(self):
+        self.transport.add(
+            self.base_url + 'episodes/332179/en.xml', 'episode.xml')
+        result = await self.tvdb.get_episode_by_id(332179)
+
+        self.assertIsInstance(result, Episode)
+        self.assertEqual(result.name, 'Chuck Versus the Intersect')
+
+    async def test_get_episode(self):
+        self.transport.add(
+            self.base_url + 'series/80348/default/1/1/en.xml', 'empty.xml')
+        result = await self.tvdb.get_episode(80348, 1, 1)
+
+        self.assertIsNone(result)
+
+    async def test_updated(self):
+        self.transport.add(
+            self.base_url + 'updates/updates_day.zip', 'updates_day.zip',
+            content_type='application/zip')
+        results = await self.tvdb.updated()
+
+        self.assertEqual(len(results), 3)
+        for result in results:
+            self.assertIsInstance(result, Update)
+
+    async def test_updated_since(self):
+        self.transport.add(
+            'http://thetvdb.com/api/Updates.php?type=all&time=1234567890',
+            'updates_since.xml')
+        results = await self.tvdb.updated_since(1234567890)
+
+        self.assertEqual([(r.kind, r.id) for r in results],
+                         [(TvDB.SERIES, '80348'), (TvDB.EPISODE, '332179')])
+
+    async def test_response_error(self):
+        self.transport.add(
+            self.base_url + 'series/1/en.xml', status_code=404)
+
+        with self.assertRaises(APIResponseError):
+            await self.tvdb.get_series_by_id(1)
+
+    async def test_requires_api_key(self):
+        tvdb = AsyncTvDB(transport=self.transport)
+
+        with self.assertRaises(APIKeyRequiredError):
+            await tvdb.get_series_by_id(1)
+
+    async def test_concurrency_limit(self):
+        tvdb = AsyncTvDB(
+            api_key='123456789', transport=self.transport, concurrency=2)
+        for i in range(10):
+            self.transport.add(
+                self.base_url + 'series/%d/en.xml' % i, 'series.xml')
+
+        results = await asyncio.gather(
+            *[tvdb.get_series_by_id(i) for i in range(10)])
+
+        self.assertEqual(len(results), 10)
+        self.assertEqual(self.transport.max_active, 2)
+
+    async def test_single_flight(self):
+        self.transport.add(self.base_url + 'series/80348/en.xml', 'series.xml')
+
+        results = await asyncio.gather(
+            *[self.tvdb.get_series_by_id(80348) for i in range(5)])
+
+        self.assertEqual(len(self.transport.calls), 1)
+        self.assertEqual(len(set(id(r) for r in results)), 5)
+        self.assertEqual(set(r.name for r in results), set(['Chuck']))
+        self.assertEqual(self.tvdb._flights, {})
+
+    async def test_single_flight_error(self):
+        self.transport.add(self.base_url + 'series/1/en.xml', status_code=500)
+
+        results = await asyncio.gather(
+            *[self.tvdb.get_series_by_id(1) for i in range(3)],
+            return_exceptions=True)
+
+        self.assertEqual(len(self.transport.calls), 1)
+        for result in results:
+            self.assertIsInstance(result, APIResponseError)
+
+    async def test_single_flight_cancelled_caller(self):
+        self.transport.add(self.base_url + 'series/80348/en.xml', 'series.xml')
+
+        first = asyncio.ensure_future(self.tvdb.get_series_by_id(80348))
+        second = asyncio.ensure_future(self.tvdb.get_series_by_id(80348))
+        await asyncio.sleep(0)
+        first.cancel()
+        result = await second
+
+        self.assertEqual(result.name, 'Chuck')
+        self.assertEqual(len(self.transport.calls), 1)
+
+    async def test_observers(self):
+        events = []
+        self.tvdb.add_observer(events.append)
+        self.transport.add(
+            self.base_url + 'series/80348/all/en.zip', '80348.zip',
+            content_type='application/zip')
+        await self.tvdb.get_series_by_id(80348, extended=True)
+
+        self.assertEqual(
+            [e.kind for e in events], ['request', 'unzip', 'parse'])
+        self.assertEqual(events[0].status, 200)
+        self.assertEqual(events[0].path, '123456789/series/80348/all/en.zip')
+        self.assertIsNone(events[0].wait)
+
+    async def test_rate_limiter(self):
+        clock = mock.Mock(return_value=0)
+        limiter = TokenBucket(100, burst=1, clock=clock)
+        self.tvdb._rate_limiter = limiter
+        self.transport.add(self.base_url + 'series/80348/en.xml', 'series.xml')
+        self.transport.add(self.base_url + 'series/1/en.xml', 'series.xml')
+
+        with mock.patch('asyncio.sleep', wraps=asyncio.sleep) as sleep:
+            await asyncio.gather(self.tvdb.get_series_by_id(80348),
+                                 self.tvdb.get_series_by_id(1))
+
+        self.assertEqual(len(self.transport.calls), 2)
+        # the second request was spaced by the bucket
+        sleep.assert_any_call(0.01)
+
+
+class AsyncTvDBLoopTestCase(unittest.TestCase):
+    """asyncio TvDB client event loops test case."""
+
+    def test_built_outside_the_loop(self):
+        transport = FakeAsyncTransport()
+        transport.add('http://thetvdb.com/api/GetSeries.php', 'getseries.xml')
+        tvdb = AsyncTvDB(transport=transport, concurrency=1)
+
+        async def search():
+            return await asyncio.gather(
+                *[tvdb.search('chuck %d' % i) for i in range(3)])
+
+        # requests wait for the semaphore, in a loop run after building
+        # the client, and in another loop
+        for _ in range(2):
+            results = asyncio.run(search())
+            self.assertEqual([len(r) for r in results], [7, 7, 7])
+        self.assertEqual(transport.max_active, 1)
+        self.assertEqual(len(transport.calls), 6)
@@ -0,0 +1,12 @@
+from __future__ import unicode_literals
+
+import sys
+
+
+# the cases use async syntax and IsolatedAsyncioTestCase, so they can not
+# even be imported before Python 3.8
+if sys.version_info >= (3, 8):
+    from tvdbpy.tests.aio_cases import (  # noqa: F401
+        AsyncTvDBLoopTestCase,
+        AsyncTvDBTestCase,
+    )
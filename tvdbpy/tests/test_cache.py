@@ -0,0 +1,298 @@
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from io import BytesIO
+
+from tvdbpy.cache import CacheEntry, DiskCache, MappedFile, MemoryCache
+
+
+class CacheEntryTestCase(unittest.TestCase):
+    """Cache entry payloads test case."""
+
+    def test_content_payload(self):
+        entry = CacheEntry(b'data', 'text/xml')
+
+        self.assertEqual(entry.size, 4)
+        self.assertEqual(entry.open().read(), b'data')
+
+    def test_file_payload(self):
+        entry = CacheEntry(None, 'application/zip', file=BytesIO(b'data'))
+
+        self.assertEqual(entry.size, 4)
+        self.assertEqual(entry.content, b'data')
+        # always read from the start
+        self.assertEqual(entry.open().read(), b'data')
+        self.assertEqual(entry.open().read(), b'data')
+
+    def test_path_payload(self):
+        with tempfile.NamedTemporaryFile(delete=False) as f:
+            f.write(b'data')
+        self.addCleanup(os.remove, f.name)
+        entry = CacheEntry(None, 'application/zip', path=f.name)
+
+        self.assertEqual(entry.size, 4)
+        self.assertEqual(entry.content, b'data')
+        self.assertIsInstance(entry.open(), MappedFile)
+        self.assertEqual(entry.open().read(), b'data')
+
+    def test_load(self):
+        payload = BytesIO(b'data')
+        entry = CacheEntry(None, 'application/zip', file=payload)
+        entry.load()
+
+        self.assertIsNone(entry.file)
+        self.assertTrue(payload.closed)
+        self.assertEqual(entry.content, b'data')
+
+    def test_close(self):
+        payload = BytesIO(b'data')
+        entry = CacheEntry(None, 'application/zip', file=payload)
+        entry.close()
+
+        self.assertIsNone(entry.file)
+        self.assertTrue(payload.closed)
+        # nothing to close
+        CacheEntry(b'data', 'text/xml').close()
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CacheTestMixin(object):
+    """Shared tests for the cache backends."""
+
+    def make_cache(self, **kwargs):
+        raise NotImplementedError
+
+    def setUp(self):
+        super(CacheTestMixin, self).setUp()
+        self.clock = FakeClock()
+
+    def test_make_key(self):
+        cache = self.make_cache()
+        self.assertEqual(cache.make_key('GetSeries.php', {}), 'GetSeries.php')
+        self.assertEqual(
+            cache.make_key('GetSeries.php', {'seriesname': 'chuck', 'a': 1}),
+            'GetSeries.php?a=1&seriesname=chuck')
+
+    def test_ttl_for(self):
+        cache = self.make_cache()
+        self.assertEqual(cache.ttl_for('Updates.php?type=all&time=1'), 60)
+        self.assertEqual(
+            cache.ttl_for('123/series/80348/all/en.zip'), 24 * 60 * 60)
+        self.assertEqual(cache.ttl_for('123/series/80348/en.xml'), 6 * 60 * 60)
+
+    def test_get_set(self):
+        cache = self.make_cache()
+        self.assertIsNone(cache.get('key'))
+
+        cache.set('key', CacheEntry(b'data', 'text/xml'))
+        entry = cache.get('key')
+
+        self.assertEqual(entry.content, b'data')
+        self.assertEqual(entry.content_type, 'text/xml')
+        self.assertEqual(
+            cache.stats.as_dict(),
+            {'hits': 1, 'misses': 1, 'evictions': 0, 'revalidations': 0})
+
+    def test_expiration(self):
+        cache = self.make_cache()
+        cache.set('key', CacheEntry(b'data', 'text/xml'), ttl=10)
+
+        self.clock.now += 9
+        self.assertIsNotNone(cache.get('key'))
+        self.clock.now += 1
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(len(cache), 0)
+
+    def test_expired_with_validators(self):
+        cache = self.make_cache()
+        entry = CacheEntry(b'data', 'application/zip', etag='"abc"')
+        cache.set('key', entry, ttl=10)
+
+        self.clock.now += 10
+        self.assertIsNone(cache.get('key'))
+        stale = cache.get('key', stale=True)
+
+        self.assertEqual(stale.content, b'data')
+        self.assertFalse(cache.is_fresh(stale))
+        self.assertEqual(stale.validator_headers(), {'If-None-Match': '"abc"'})
+
+    def test_refresh(self):
+        cache = self.make_cache()
+        cache.set('key', CacheEntry(
+            b'data', 'application/zip',
+            last_modified='Mon, 01 Jul 2013 17:25:00 GMT'), ttl=10)
+
+        self.clock.now += 10
+        entry = cache.get('key', stale=True)
+        cache.refresh('key', entry, ttl=10)
+
+        entry = cache.get('key')
+        self.assertEqual(entry.content, b'data')
+        self.assertEqual(
+            entry.validator_headers(),
+            {'If-Modified-Since': 'Mon, 01 Jul 2013 17:25:00 GMT'})
+        self.assertEqual(cache.stats.revalidations, 1)
+        self.assertEqual(len(cache), 1)
+
+    def test_evict_by_entries(self):
+        cache = self.make_cache(max_entries=2)
+        cache.set('a', CacheEntry(b'a', 'text/xml'))
+        cache.set('b', CacheEntry(b'b', 'text/xml'))
+        # touch a, so b is the least recently used
+        cache.get('a')
+        cache.set('c', CacheEntry(b'c', 'text/xml'))
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('c'))
+        self.assertEqual(cache.stats.evictions, 1)
+
+    def test_evict_by_bytes(self):
+        cache = self.make_cache(max_bytes=10)
+        cache.set('a', CacheEntry(b'x' * 6, 'text/xml'))
+        cache.set('b', CacheEntry(b'y' * 6, 'text/xml'))
+
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.total_bytes, 6)
+        self.assertIsNone(cache.get('a'))
+
+    def test_replace_entry(self):
+        cache = self.make_cache()
+        cache.set('a', CacheEntry(b'old', 'text/xml'))
+        cache.set('a', CacheEntry(b'newer', 'text/xml'))
+
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.total_bytes, 5)
+        self.assertEqual(cache.get('a').content, b'newer')
+
+    def test_delete(self):
+        cache = self.make_cache()
+        cache.set('a', CacheEntry(b'data', 'text/xml'))
+        cache.delete('a')
+        cache.delete('missing')
+
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.total_bytes, 0)
+
+    def test_expire(self):
+        cache = self.make_cache()
+        cache.set('a', CacheEntry(b'a', 'text/xml', etag='"v1"'), ttl=10)
+        cache.set('b', CacheEntry(b'b', 'text/xml'), ttl=10)
+        cache.expire('a')
+        cache.expire('b')
+        cache.expire('missing')
+
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('a', stale=True).content, b'a')
+        self.assertIsNone(cache.get('b', stale=True))
+
+    def test_parsed_data(self):
+        cache = self.make_cache()
+        cache.set('a', CacheEntry(b'data', 'text/xml', etag='"v1"'))
+        cache.set_parsed('a', cache.get('a'), ['parsed'])
+
+        # kept while the payload is the same, including once reloaded
+        self.assertEqual(cache.get_parsed('a', cache.get('a')), ['parsed'])
+        self.assertIsNone(cache.get_parsed(
+            'a', CacheEntry(b'data', 'text/xml', etag='"v2"')))
+        cache.set('a', CacheEntry(b'data', 'text/xml', etag='"v1"'))
+        self.assertIsNone(cache.get_parsed('a', cache.get('a')))
+
+    def test_parsed_data_bounded(self):
+        cache = self.make_cache(max_parsed=2)
+        for key in 'abc':
+            cache.set(key, CacheEntry(b'data', 'text/xml'))
+            cache.set_parsed(key, cache.get(key), key)
+
+        self.assertIsNone(cache.get_parsed('a', cache.get('a')))
+        self.assertEqual(cache.get_parsed('c', cache.get('c')), 'c')
+        cache.delete('c')
+        cache.set('c', CacheEntry(b'data', 'text/xml'))
+        self.assertIsNone(cache.get_parsed('c', cache.get('c')))
+
+
+class MemoryCacheTestCase(CacheTestMixin, unittest.TestCase):
+    """In-memory cache test case."""
+
+    def make_cache(self, **kwargs):
+        return MemoryCache(clock=self.clock, **kwargs)
+
+    def test_file_payloads_kept_in_memory(self):
+        cache = self.make_cache()
+        cache.set('a', CacheEntry(
+            None, 'application/zip', file=BytesIO(b'data')))
+
+        entry = cache.get('a')
+        self.assertIsNone(entry.file)
+        self.assertEqual(entry.content, b'data')
+        self.assertEqual(cache.total_bytes, 4)
+
+
+class DiskCacheTestCase(CacheTestMixin, unittest.TestCase):
+    """On-disk cache test case."""
+
+    def setUp(self):
+        super(DiskCacheTestCase, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def make_cache(self, **kwargs):
+        return DiskCache(self.directory, clock=self.clock, **kwargs)
+
+    def test_persistent(self):
+        cache = self.make_cache()
+        cache.set('a', CacheEntry(b'data', 'application/zip'), ttl=10)
+
+        other = self.make_cache()
+        entry = other.get('a')
+
+        self.assertEqual(len(other), 1)
+        self.assertEqual(entry.content, b'data')
+        self.assertEqual(entry.content_type, 'application/zip')
+        self.assertEqual(entry.expires, self.clock.now + 10)
+
+    def test_key_not_stored(self):
+        cache = self.make_cache()
+        cache.set('api/123456789/series/1/en.xml', CacheEntry(
+            b'data', 'text/xml'))
+
+        for name in os.listdir(self.directory):
+            with open(os.path.join(self.directory, name), 'rb') as f:
+                self.assertNotIn(b'123456789', f.read())
+
+    def test_payloads_read_from_disk(self):
+        cache = self.make_cache()
+        cache.set('a', CacheEntry(
+            None, 'application/zip', file=BytesIO(b'data')))
+
+        entry = cache.get('a')
+
+        self.assertEqual(entry.path, os.path.join(
+            self.directory, cache._slot('a') + '.data'))
+        self.assertIsInstance(entry.open(), MappedFile)
+        self.assertEqual(entry.open().read(), b'data')
+        self.assertEqual(entry.size, 4)
+        self.assertEqual(cache.total_bytes, 4)
+
+    def test_mapped_payload_survives_replace(self):
+        cache = self.make_cache()
+        cache.set('a', CacheEntry(b'old', 'application/zip'))
+        mapped = cache.get('a').open()
+
+        cache.set('a', CacheEntry(b'newer', 'application/zip'))
+
+        self.assertEqual(mapped.read(), b'old')
+        self.assertEqual(cache.get('a').content, b'newer')
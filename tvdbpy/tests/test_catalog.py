@@ -0,0 +1,201 @@
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+
+import mock
+
+from tvdbpy import TvDB
+from tvdbpy.cache import MemoryCache
+from tvdbpy.catalog import Catalog
+from tvdbpy.tests.test_tvdb import BaseTestCase
+from tvdbpy.tvdb import Episode, Series
+
+
+BASE_URL = 'http://thetvdb.com/api/123456789/'
+RESPONSES = {
+    BASE_URL + 'series/80348/all/en.zip': {
+        'filename': '80348.zip', 'content_type': 'application/zip'},
+    BASE_URL + 'series/80348/en.xml': {'filename': 'series.xml'},
+    BASE_URL + 'episodes/332179/en.xml': {'filename': 'episode.xml'},
+    BASE_URL + 'updates/updates_day.zip': {
+        'filename': 'updates_day.zip', 'content_type': 'application/zip'},
+    'http://thetvdb.com/api/Updates.php?type=all&time=1234500000': {
+        'filename': 'updates_since.xml'},
+}
+
+
+class CatalogTestCase(BaseTestCase):
+    """Local catalog test case."""
+
+    def setUp(self):
+        super(CatalogTestCase, self).setUp()
+        self.responses(RESPONSES)
+        self.clock = mock.Mock(return_value=1234567890)
+        self.tvdb = TvDB(api_key='123456789')
+        self.catalog = Catalog(self.tvdb, clock=self.clock)
+        self.addCleanup(self.catalog.close)
+
+    def test_add_series(self):
+        self.assertTrue(self.catalog.add_series(80348))
+
+        self.assertIn(80348, self.catalog)
+        self.assertIn('80348', self.catalog)
+        self.assertNotIn('1', self.catalog)
+        self.transport.get.assert_called_once_with(
+            BASE_URL + 'series/80348/all/en.zip', params={}, stream=True)
+
+    def test_get_series_by_id(self):
+        self.catalog.add_series(80348)
+
+        result = self.catalog.get_series_by_id(80348)
+
+        self.assertIsInstance(result, Series)
+        self.assertEqual(result.name, 'Chuck')
+        self.assertIs(result._client, self.tvdb)
+        self.assertEqual(self.transport.get.call_count, 1)
+
+    def test_get_series_by_id_extended(self):
+        self.catalog.add_series(80348)
+
+        result = self.catalog.get_series_by_id(80348, extended=True)
+
+        self.assertEqual(len(result.seasons), 6)
+        self.assertEqual(len(result.seasons[1]), 13)
+        self.assertEqual(
+            result.seasons[1][1].name, 'Chuck Versus the Intersect')
+        self.assertEqual(self.transport.get.call_count, 1)
+
+    def test_get_series_by_id_missing_bootstraps(self):
+        result = self.catalog.get_series_by_id(80348)
+
+        self.assertEqual(result.name, 'Chuck')
+        self.transport.get.assert_called_once_with(
+            BASE_URL + 'series/80348/all/en.zip', params={}, stream=True)
+
+    def test_iter_series(self):
+        self.catalog.add_series(80348)
+
+        results = list(self.catalog.iter_series())
+
+        self.assertEqual([s.name for s in results], ['Chuck'])
+
+    def test_get_episode(self):
+        result = self.catalog.get_episode(80348, 1, 1)
+
+        self.assertIsInstance(result, Episode)
+        self.assertEqual(result.name, 'Chuck Versus the Intersect')
+        self.assertIsNone(self.catalog.get_episode(80348, 99, 1))
+        self.assertEqual(self.transport.get.call_count, 1)
+
+    def test_get_episode_by_id(self):
+        self.catalog.add_series(80348)
+
+        result = self.catalog.get_episode_by_id(332179)
+
+        self.assertEqual(result.name, 'Chuck Versus the Intersect')
+        self.assertEqual(self.transport.get.call_count, 1)
+
+    def test_get_episode_by_id_missing(self):
+        result = self.catalog.get_episode_by_id(332179)
+
+        self.assertEqual(result.name, 'Chuck Versus the Intersect')
+        self.transport.get.assert_called_once_with(
+            BASE_URL + 'episodes/332179/en.xml', params={})
+        # now served locally
+        self.catalog.get_episode_by_id(332179)
+        self.assertEqual(self.transport.get.call_count, 1)
+
+    def test_max_age(self):
+        self.catalog.max_age = 60
+        self.catalog.add_series(80348)
+
+        self.clock.return_value += 60
+        self.catalog.get_series_by_id(80348)
+        self.assertEqual(self.transport.get.call_count, 1)
+
+        self.clock.return_value += 1
+        self.catalog.get_series_by_id(80348)
+        self.assertEqual(self.transport.get.call_count, 2)
+
+    def test_first_sync_sets_checkpoint(self):
+        self.assertIsNone(self.catalog.checkpoint)
+
+        self.assertEqual(self.catalog.sync().refreshed, 0)
+
+        self.assertEqual(self.catalog.checkpoint, 1234567890)
+        self.assertFalse(self.transport.get.called)
+
+    def test_sync_from_updates(self):
+        self.catalog.add_series(80348)
+        self.catalog.checkpoint = 1234567000
+
+        self.clock.return_value = 1234568000
+        stats = self.catalog.sync()
+
+        self.assertEqual(stats.refreshed, 2)
+        self.assertEqual(self.catalog.checkpoint, 1234568000)
+        self.assertEqual(
+            sorted(c[0][0] for c in self.transport.get.call_args_list[1:]),
+            [BASE_URL + 'episodes/332179/en.xml',
+             BASE_URL + 'series/80348/en.xml',
+             BASE_URL + 'updates/updates_day.zip'])
+
+    def test_sync_with_cached_responses(self):
+        self.tvdb._cache = MemoryCache()
+        self.catalog.add_series(80348)
+        self.catalog._refresh_episode('332179')
+        self.catalog.checkpoint = 1234567000
+
+        self.clock.return_value = 1234568000
+        stats = self.catalog.sync()
+
+        # updated items are fetched again, not served from the cache
+        self.assertEqual(stats.refreshed, 2)
+        self.assertEqual(
+            [c[0][0] for c in self.transport.get.call_args_list].count(
+                BASE_URL + 'episodes/332179/en.xml'), 2)
+
+    def test_sync_skips_unknown_items(self):
+        self.catalog.checkpoint = 1234567000
+
+        self.assertEqual(self.catalog.sync().refreshed, 0)
+        self.assertEqual(self.transport.get.call_count, 1)
+
+    def test_sync_since_older_checkpoint(self):
+        self.catalog.add_series(80348)
+        self.catalog.checkpoint = 1234500000
+
+        self.clock.return_value = 1234500000 + 31 * 24 * 60 * 60
+        stats = self.catalog.sync()
+
+        self.assertEqual(stats.refreshed, 2)
+        self.assertEqual(
+            self.transport.get.call_args_list[1][0][0],
+            'http://thetvdb.com/api/Updates.php?type=all&time=1234500000')
+
+
+class PersistentCatalogTestCase(BaseTestCase):
+    """On-disk catalog test case."""
+
+    def setUp(self):
+        super(PersistentCatalogTestCase, self).setUp()
+        self.responses(RESPONSES)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'catalog.db')
+        self.tvdb = TvDB(api_key='123456789')
+
+    def test_persistent(self):
+        catalog = Catalog(self.tvdb, path=self.path)
+        catalog.add_series(80348)
+        catalog.checkpoint = 1234567890
+        catalog.close()
+
+        catalog = Catalog(self.tvdb, path=self.path)
+        self.addCleanup(catalog.close)
+
+        self.assertEqual(catalog.checkpoint, 1234567890)
+        self.assertEqual(catalog.get_episode(80348, 1, 1).id, '332179')
+        self.assertEqual(self.transport.get.call_count, 1)
@@ -0,0 +1,280 @@
+from __future__ import unicode_literals
+
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+
+import mock
+import requests
+
+from tvdbpy.errors import APIResponseError, ImageTooLargeError
+from tvdbpy.images import ImageCache, ImageFetcher, image_urls
+from tvdbpy.tests.test_tvdb import RequestsBytesIO
+from tvdbpy.tvdb import Episode, Series, Update
+
+
+BANNERS_URL = 'http://thetvdb.com/banners/'
+
+
+class InterruptedBytesIO(RequestsBytesIO):
+    """Response body failing after `limit` bytes."""
+
+    def __init__(self, data, limit):
+        super(InterruptedBytesIO, self).__init__(data)
+        self.limit = limit
+
+    def read(self, chunk_size, *args, **kwargs):
+        if self.tell() >= self.limit:
+            raise requests.ConnectionError('Connection reset')
+        return super(InterruptedBytesIO, self).read(
+            min(chunk_size, self.limit - self.tell()))
+
+
+def image_response(data=b'', status_code=200, content_type='image/jpeg',
+                   headers=None, raw=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers['content-type'] = content_type
+    response.headers['content-length'] = str(len(data))
+    if headers is not None:
+        response.headers.update(headers)
+    response.raw = raw if raw is not None else RequestsBytesIO(data)
+    return response
+
+
+class ImageUrlsTestCase(unittest.TestCase):
+    """Model image urls test case."""
+
+    def test_image_urls(self):
+        series = Series(ET.fromstring(
+            '<Series><id>1</id><banner>graphical/1-g.jpg</banner>'
+            '<poster>posters/1-1.jpg</poster></Series>'))
+        episode = Episode(ET.fromstring(
+            '<Episode><id>2</id><filename>episodes/1/2.jpg</filename>'
+            '</Episode>'))
+        no_image = Episode(ET.fromstring('<Episode><id>3</id></Episode>'))
+        banner = Update(ET.fromstring(
+            '<Banner><Series>1</Series><path>posters/1-1.jpg</path>'
+            '</Banner>'))
+        update = Update(ET.fromstring('<Series><id>1</id></Series>'))
+
+        urls = image_urls([series, episode, no_image, banner, update,
+                           BANNERS_URL + 'other.jpg'])
+
+        self.assertEqual(urls, [
+            BANNERS_URL + 'graphical/1-g.jpg',
+            BANNERS_URL + 'posters/1-1.jpg',
+            BANNERS_URL + 'episodes/1/2.jpg',
+            BANNERS_URL + 'other.jpg',
+        ])
+
+
+class ImageFetcherTestCase(unittest.TestCase):
+    """Image fetcher and cache test case."""
+
+    def setUp(self):
+        super(ImageFetcherTestCase, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.cache = ImageCache(self.directory)
+        self.transport = mock.Mock()
+        self.images = {}
+        self.transport.get.side_effect = self.get
+        self.fetcher = ImageFetcher(self.cache, transport=self.transport)
+
+    def get(self, url, headers=None, stream=False):
+        response = self.images[url]
+        if callable(response):
+            return response(headers)
+        return image_response(response)
+
+    def read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_fetch(self):
+        self.images['http://a/1.jpg'] = b'image 1'
+        path = self.fetcher.fetch('http://a/1.jpg')
+
+        self.assertEqual(self.read(path), b'image 1')
+        self.assertEqual(os.path.basename(path),
+                         hashlib.sha256(b'image 1').hexdigest())
+        self.transport.get.assert_called_once_with(
+            'http://a/1.jpg', headers={}, stream=True)
+        # cached
+        self.assertEqual(self.fetcher.fetch('http://a/1.jpg'), path)
+        self.assertEqual(self.transport.get.call_count, 1)
+        self.assertEqual(self.cache.stats.hits, 1)
+
+    def test_same_image_stored_once(self):
+        self.images['http://a/1.jpg'] = b'image'
+        self.images['http://a/2.jpg'] = b'image'
+
+        path = self.fetcher.fetch('http://a/1.jpg')
+        self.assertEqual(self.fetcher.fetch('http://a/2.jpg'), path)
+        self.assertEqual(len(self.cache), 1)
+        self.assertEqual(self.cache.total_bytes, 5)
+        self.assertEqual(self.cache.stats.deduplicated, 1)
+
+    def test_fetch_many(self):
+        for i in range(10):
+            self.images['http://a/%d.jpg' % i] = b'image %d' % i
+        urls = ['http://a/%d.jpg' % i for i in range(10)]
+        urls.append('http://a/3.jpg')
+        urls.append('http://a/missing.jpg')
+        self.images['http://a/missing.jpg'] = (
+            lambda headers: image_response(status_code=404))
+
+        result = self.fetcher.fetch_many(urls, max_workers=4)
+
+        self.assertEqual(len(result), 11)
+        self.assertEqual(self.transport.get.call_count, 11)
+        self.assertEqual(self.read(result['http://a/3.jpg']), b'image 3')
+        self.assertIsNone(result['http://a/missing.jpg'])
+        self.assertIsInstance(
+            result.errors['http://a/missing.jpg'], APIResponseError)
+
+    def test_iter_many(self):
+        self.images['http://a/1.jpg'] = b'image 1'
+        results = list(self.fetcher.iter_many(['http://a/1.jpg']))
+
+        self.assertEqual(len(results), 1)
+        url, path, error = results[0]
+        self.assertEqual(self.read(path), b'image 1')
+        self.assertIsNone(error)
+
+    def test_not_an_image(self):
+        self.images['http://a/1.jpg'] = lambda headers: image_response(
+            b'<html/>', content_type='text/html')
+        self.assertRaises(
+            APIResponseError, self.fetcher.fetch, 'http://a/1.jpg')
+
+    def test_lru_eviction(self):
+        self.cache.max_bytes = 20
+        for i in range(3):
+            self.images['http://a/%d.jpg' % i] = b'%d' % i * 8
+        path = self.fetcher.fetch('http://a/0.jpg')
+        self.fetcher.fetch('http://a/1.jpg')
+        # 0 is now the most recently used
+        self.fetcher.fetch('http://a/0.jpg')
+        self.fetcher.fetch('http://a/2.jpg')
+
+        self.assertEqual(len(self.cache), 2)
+        self.assertEqual(self.cache.stats.evictions, 1)
+        self.assertTrue(os.path.exists(path))
+        self.assertIsNone(self.cache.get('http://a/1.jpg'))
+
+    def test_cache_persisted(self):
+        self.images['http://a/1.jpg'] = b'image 1'
+        path = self.fetcher.fetch('http://a/1.jpg')
+
+        cache = ImageCache(self.directory)
+        self.assertEqual(cache.get('http://a/1.jpg'), path)
+        self.assertEqual(cache.total_bytes, 7)
+
+    def test_image_too_large(self):
+        self.cache.max_image_bytes = 4
+        self.images['http://a/1.jpg'] = b'image 1'
+        self.assertRaises(
+            ImageTooLargeError, self.fetcher.fetch, 'http://a/1.jpg')
+
+        # without a content length, the download is stopped
+        self.images['http://a/1.jpg'] = lambda headers: image_response(
+            b'image 1', headers={'content-length': None})
+        self.assertRaises(
+            ImageTooLargeError, self.fetcher.fetch, 'http://a/1.jpg')
+        self.assertEqual(self.cache.get_partial('http://a/1.jpg'), (0, {}))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_resume_download(self):
+        data = b'0123456789' * 10
+        self.images['http://a/1.jpg'] = lambda headers: image_response(
+            data, headers={'etag': '"v1"'},
+            raw=InterruptedBytesIO(data, 40))
+        self.assertRaises(
+            requests.ConnectionError, self.fetcher.fetch, 'http://a/1.jpg')
+        self.assertEqual(self.cache.get_partial('http://a/1.jpg')[0], 40)
+
+        def resumed(headers):
+            self.assertEqual(headers, {'Range': 'bytes=40-',
+                                       'If-Range': '"v1"'})
+            return image_response(data[40:], status_code=206, headers={
+                'content-range': 'bytes 40-99/100'})
+        self.images['http://a/1.jpg'] = resumed
+        path = self.fetcher.fetch('http://a/1.jpg')
+
+        self.assertEqual(self.read(path), data)
+        self.assertEqual(os.path.basename(path),
+                         hashlib.sha256(data).hexdigest())
+        self.assertEqual(self.cache.stats.resumed, 1)
+        self.assertEqual(self.cache.get_partial('http://a/1.jpg'), (0, {}))
+
+    def test_resume_weak_etag(self):
+        data = b'0123456789' * 10
+        modified = 'Wed, 21 Oct 2015 07:28:00 GMT'
+        self.images['http://a/1.jpg'] = lambda headers: image_response(
+            data, headers={'etag': 'W/"v1"', 'last-modified': modified},
+            raw=InterruptedBytesIO(data, 40))
+        self.assertRaises(
+            requests.ConnectionError, self.fetcher.fetch, 'http://a/1.jpg')
+
+        def resumed(headers):
+            # weak ETags cannot be used with If-Range, Last-Modified can
+            self.assertEqual(headers, {'Range': 'bytes=40-',
+                                       'If-Range': modified})
+            return image_response(data[40:], status_code=206, headers={
+                'content-range': 'bytes 40-99/100'})
+        self.images['http://a/1.jpg'] = resumed
+        path = self.fetcher.fetch('http://a/1.jpg')
+
+        self.assertEqual(self.read(path), data)
+        self.assertEqual(self.cache.stats.resumed, 1)
+
+    def test_resume_refused(self):
+        data = b'0123456789' * 10
+        self.images['http://a/1.jpg'] = lambda headers: image_response(
+            data, headers={'etag': '"v1"'},
+            raw=InterruptedBytesIO(data, 40))
+        self.assertRaises(
+            requests.ConnectionError, self.fetcher.fetch, 'http://a/1.jpg')
+
+        # the image changed, it is sent whole
+        self.images['http://a/1.jpg'] = b'new image'
+        path = self.fetcher.fetch('http://a/1.jpg')
+        self.assertEqual(self.read(path), b'new image')
+        self.assertEqual(self.cache.stats.resumed, 0)
+
+    def test_resume_without_validators(self):
+        data = b'0123456789' * 10
+        for i, headers in enumerate(({}, {'etag': 'W/"v1"'})):
+            url = 'http://a/%d.jpg' % i
+            self.images[url] = lambda _: image_response(
+                data, headers=headers, raw=InterruptedBytesIO(data, 40))
+            self.assertRaises(
+                requests.ConnectionError, self.fetcher.fetch, url)
+
+            # without If-Range, the image could have changed
+            self.images[url] = b'new image %d' % i
+            path = self.fetcher.fetch(url)
+            self.transport.get.assert_called_with(
+                url, headers={}, stream=True)
+            self.assertEqual(self.read(path), b'new image %d' % i)
+        self.assertEqual(self.cache.stats.resumed, 0)
+
+    def test_range_not_satisfiable(self):
+        data = b'0123456789'
+        self.images['http://a/1.jpg'] = lambda headers: image_response(
+            data, headers={'etag': '"v1"'}, raw=InterruptedBytesIO(data, 5))
+        self.assertRaises(
+            requests.ConnectionError, self.fetcher.fetch, 'http://a/1.jpg')
+
+        def get(headers):
+            if headers:
+                return image_response(status_code=416)
+            return image_response(b'short')
+        self.images['http://a/1.jpg'] = get
+        path = self.fetcher.fetch('http://a/1.jpg')
+        self.assertEqual(self.read(path), b'short')
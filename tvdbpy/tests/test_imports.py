@@ -0,0 +1,89 @@
+from __future__ import unicode_literals
+
+import subprocess
+import sys
+import unittest
+
+
+# modules only needed on first network or parse use
+DEFERRED = (
+    'requests',
+    'urllib3',
+    'zipfile',
+    'tempfile',
+    'concurrent.futures',
+    'xml.etree.ElementTree',
+    'lxml.etree',
+)
+
+# time budget for the dependencies imported by `import tvdbpy` (seconds)
+DEPENDENCIES_IMPORT_BUDGET = 0.02
+
+
+def import_times(statement):
+    """Run statement in a new interpreter with -X importtime.
+
+    Return the (module, self seconds) pairs of the imported modules.
+
+    """
+    process = subprocess.Popen(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    _, stderr = process.communicate()
+    if process.returncode != 0:
+        raise AssertionError(stderr.decode('utf-8', 'replace'))
+    times = []
+    for line in stderr.decode('utf-8').splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_time, _, name = line[len('import time:'):].split('|')
+        times.append((name.strip(), int(self_time) / 1e6))
+    return times
+
+
+@unittest.skipIf(sys.version_info < (3, 7), '-X importtime needs Python 3.7')
+class ImportTimeTestCase(unittest.TestCase):
+    """Import time test case."""
+
+    @classmethod
+    def setUpClass(cls):
+        # modules already imported at interpreter startup (eg. by site)
+        cls.startup = set(name for name, _ in import_times('pass'))
+
+    def imported(self, statement):
+        return [(name, seconds) for name, seconds in import_times(statement)
+                if name not in self.startup]
+
+    def assertDeferred(self, statement, modules=DEFERRED):
+        names = set(name for name, _ in self.imported(statement))
+        self.assertEqual(sorted(names.intersection(modules)), [])
+
+    def test_import_defers_dependencies(self):
+        self.assertDeferred('import tvdbpy')
+
+    def test_models_without_http_stack(self):
+        self.assertDeferred(
+            'from tvdbpy.tvdb import Episode, Series, Update; '
+            'from tvdbpy import snapshot',
+            modules=('requests', 'urllib3'))
+
+    def test_client_construction_defers_dependencies(self):
+        self.assertDeferred(
+            'from tvdbpy import TvDB; TvDB(api_key="123456789")')
+
+    def test_dependencies_loaded_on_first_use(self):
+        names = set(name for name, _ in self.imported(
+            'from tvdbpy import TvDB; from tvdbpy.parsers import '
+            'ElementTreeParser; TvDB(api_key="123456789")._transport.session;'
+            'ElementTreeParser().fromstring(b"<Data/>")'))
+        self.assertIn('requests', names)
+        self.assertIn('xml.etree.ElementTree', names)
+
+    def test_dependencies_import_time(self):
+        # tvdbpy modules themselves are left out, as their bytecode may
+        # need to be compiled
+        elapsed = min(
+            sum(seconds for name, seconds in self.imported('import tvdbpy')
+                if name.split('.')[0] != 'tvdbpy')
+            for _ in range(3))
+        self.assertLess(elapsed, DEPENDENCIES_IMPORT_BUDGET)
@@ -0,0 +1,162 @@
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from tvdbpy.limits import AdaptiveConcurrency, FileTokenBucket, TokenBucket
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TokenBucketTestCase(unittest.TestCase):
+    """Token bucket rate limiter test case."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def make_bucket(self, rate=2, burst=2):
+        return TokenBucket(
+            rate, burst=burst, clock=self.clock, sleep=self.clock.sleep)
+
+    def test_burst(self):
+        bucket = self.make_bucket()
+
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 0)
+        # then requests are spaced at the rate, in order
+        self.assertEqual(bucket.reserve(), 0.5)
+        self.assertEqual(bucket.reserve(), 1.0)
+
+    def test_refill(self):
+        bucket = self.make_bucket()
+        bucket.reserve()
+        bucket.reserve()
+
+        self.clock.now += 10
+        # refilled up to the burst size only
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 0.5)
+
+    def test_acquire_waits(self):
+        bucket = self.make_bucket(burst=1)
+
+        for _ in range(3):
+            bucket.acquire()
+
+        self.assertEqual(self.clock.sleeps, [0.5, 0.5])
+
+    def test_pause(self):
+        bucket = self.make_bucket()
+        bucket.pause(5)
+
+        self.assertEqual(bucket.reserve(), 5.5)
+        self.clock.now += 5.5
+        self.assertEqual(bucket.reserve(), 0.5)
+
+    def test_invalid_rate(self):
+        with self.assertRaises(ValueError):
+            TokenBucket(0)
+
+
+class FileTokenBucketTestCase(TokenBucketTestCase):
+    """Cross-process token bucket test case."""
+
+    def setUp(self):
+        super(FileTokenBucketTestCase, self).setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'bucket')
+
+    def make_bucket(self, rate=2, burst=2):
+        return FileTokenBucket(
+            self.path, rate, burst=burst, clock=self.clock,
+            sleep=self.clock.sleep)
+
+    def test_shared(self):
+        first = self.make_bucket()
+        second = self.make_bucket()
+
+        self.assertEqual(first.reserve(), 0)
+        self.assertEqual(second.reserve(), 0)
+        self.assertEqual(first.reserve(), 0.5)
+        self.assertEqual(second.reserve(), 1.0)
+
+
+class AdaptiveConcurrencyTestCase(unittest.TestCase):
+    """Adaptive concurrency limit test case."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.limiter = AdaptiveConcurrency(
+            initial=4, max_limit=8, clock=self.clock)
+
+    def request(self, latency=0.1, failed=False):
+        self.limiter.acquire()
+        self.limiter.release(latency, failed=failed)
+
+    def test_additive_increase(self):
+        for _ in range(4):
+            self.request()
+        self.assertEqual(self.limiter.limit, 4)
+        self.request()
+        self.assertEqual(self.limiter.limit, 5)
+
+        for _ in range(100):
+            self.request()
+        self.assertEqual(self.limiter.limit, 8)
+
+    def test_decrease_on_failure(self):
+        self.request(failed=True)
+        self.assertEqual(self.limiter.limit, 2)
+
+        # within the cooldown, failures count once
+        self.request(failed=True)
+        self.assertEqual(self.limiter.limit, 2)
+
+        self.clock.now += 1
+        self.request(failed=True)
+        self.assertEqual(self.limiter.limit, 1)
+        self.clock.now += 1
+        self.request(failed=True)
+        self.assertEqual(self.limiter.limit, 1)
+
+    def test_decrease_on_latency_spike(self):
+        self.request(latency=0.1)
+        self.request(latency=0.2)
+        self.assertEqual(self.limiter.limit, 4)
+
+        self.request(latency=1.0)
+        self.assertEqual(self.limiter.limit, 2)
+
+    def test_acquire_blocks_at_limit(self):
+        limiter = AdaptiveConcurrency(initial=1)
+        limiter.acquire()
+        acquired = threading.Event()
+
+        def worker():
+            limiter.acquire()
+            acquired.set()
+        thread = threading.Thread(target=worker)
+        thread.start()
+
+        self.assertFalse(acquired.wait(0.05))
+        limiter.release(0.1)
+        self.assertTrue(acquired.wait(5))
+        thread.join()
+        self.assertEqual(limiter.active, 1)
@@ -0,0 +1,98 @@
+from __future__ import unicode_literals
+
+import logging
+import unittest
+
+from tvdbpy.observers import (
+    Event,
+    LoggingObserver,
+    MetricsObserver,
+    Observer,
+)
+
+
+class EventTestCase(unittest.TestCase):
+    """Instrumentation event test case."""
+
+    def test_fields(self):
+        event = Event('parse', model='Episode', count=3, elapsed=0.5)
+
+        self.assertEqual(event.kind, 'parse')
+        self.assertEqual(event.count, 3)
+        self.assertEqual(event.as_dict(), {
+            'kind': 'parse', 'model': 'Episode', 'count': 3, 'elapsed': 0.5})
+
+
+class ObserverTestCase(unittest.TestCase):
+    """Observers test case."""
+
+    def test_dispatch(self):
+        class Parses(Observer):
+            def __init__(self):
+                self.events = []
+
+            def on_parse(self, event):
+                self.events.append(event)
+
+        observer = Parses()
+        parse = Event('parse', model='Episode', count=1, elapsed=0.1)
+        observer(parse)
+        observer(Event('cache', path='x', result='hit'))
+
+        self.assertEqual(observer.events, [parse])
+
+    def test_logging(self):
+        logger = logging.getLogger('tvdbpy.tests')
+        observer = LoggingObserver(logger, level=logging.INFO)
+
+        with self.assertLogs(logger, logging.INFO) as logs:
+            observer(Event('cache', path='GetSeries.php', result='miss'))
+
+        self.assertEqual(
+            logs.output,
+            ['INFO:tvdbpy.tests:cache path=GetSeries.php result=miss'])
+
+
+class MetricsObserverTestCase(unittest.TestCase):
+    """Prometheus-style metrics test case."""
+
+    def setUp(self):
+        self.metrics = MetricsObserver(buckets=(0.1, 1))
+
+    def request(self, status=200, elapsed=0.05, bytes=10):
+        self.metrics(Event(
+            'request', path='a', status=status, bytes=bytes, elapsed=elapsed,
+            wait=elapsed, transfer=0.0))
+
+    def test_requests(self):
+        self.request()
+        self.request(elapsed=0.5)
+        self.request(status=404, bytes=0)
+
+        output = self.metrics.render()
+
+        self.assertIn('tvdbpy_requests_total{status="200"} 2.0\n', output)
+        self.assertIn('tvdbpy_requests_total{status="404"} 1.0\n', output)
+        self.assertIn('tvdbpy_request_seconds_bucket{le="0.1"} 2\n', output)
+        self.assertIn('tvdbpy_request_seconds_bucket{le="1.0"} 3\n', output)
+        self.assertIn('tvdbpy_request_seconds_bucket{le="+Inf"} 3\n', output)
+        self.assertIn('tvdbpy_request_seconds_count 3\n', output)
+        self.assertIn('tvdbpy_response_bytes_total 20.0\n', output)
+        self.assertIn('# TYPE tvdbpy_request_seconds histogram\n', output)
+
+    def test_parse_and_cache(self):
+        self.metrics(Event('parse', model='Episode', count=13, elapsed=0.2))
+        self.metrics(Event('cache', path='a', result='hit'))
+        self.metrics(Event('unzip', path='a', member='en.xml',
+                           compressed_bytes=1, bytes=2, elapsed=2))
+
+        output = self.metrics.render()
+
+        self.assertIn(
+            'tvdbpy_parsed_objects_total{model="Episode"} 13.0\n', output)
+        self.assertIn(
+            'tvdbpy_parse_seconds_bucket{model="Episode",le="1.0"} 1\n',
+            output)
+        self.assertIn('tvdbpy_cache_events_total{result="hit"} 1.0\n', output)
+        self.assertIn('tvdbpy_unzip_seconds_bucket{le="1.0"} 0\n', output)
+        self.assertIn('tvdbpy_unzip_seconds_sum 2\n', output)
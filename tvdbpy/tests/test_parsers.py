@@ -0,0 +1,245 @@
+from __future__ import unicode_literals
+
+import os
+import sys
+import unittest
+import xml.etree.ElementTree as ET
+import zipfile
+
+from io import BytesIO
+
+import mock
+
+from tvdbpy import TvDB
+from tvdbpy.parsers import (
+    Document,
+    ElementTreeParser,
+    FlatParser,
+    LxmlParser,
+    NotFlat,
+    Record,
+    get_parser,
+    lxml_installed,
+)
+from tvdbpy.tests.test_tvdb import TESTS_DIR, BaseTestCase
+from tvdbpy.tvdb import Episode, Series, Update
+
+
+def read_testdata(filename, member=None):
+    path = os.path.join(TESTS_DIR, 'testdata', filename)
+    if member is not None:
+        with zipfile.ZipFile(path) as f:
+            return f.read(member)
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def model_values(parser, content, cls, path):
+    return [
+        [getattr(item, attr) for attr, _, _ in cls._fields]
+        for item in [cls(xml_data) for xml_data in
+                     parser.fromstring(content).findall(path)]]
+
+
+class GetParserTestCase(unittest.TestCase):
+    """Parser backend selection test case."""
+
+    def test_default(self):
+        parser = get_parser()
+        expected = LxmlParser if lxml_installed() else ElementTreeParser
+        self.assertIsInstance(parser, expected)
+
+    def test_by_name(self):
+        self.assertIsInstance(get_parser('etree'), ElementTreeParser)
+        self.assertIsInstance(get_parser('flat'), FlatParser)
+
+    def test_instance(self):
+        parser = FlatParser()
+        self.assertIs(get_parser(parser), parser)
+
+    def test_unknown(self):
+        self.assertRaises(ValueError, get_parser, 'html5')
+
+    @mock.patch('tvdbpy.parsers.lxml_installed', return_value=True)
+    def test_default_lxml_import_error(self, installed):
+        parser = get_parser()
+        explicit = get_parser('lxml')
+        content = b'<Data><Series><id>1</id></Series><Series/></Data>'
+
+        # a broken lxml build: found, but failing to import
+        with mock.patch.dict(sys.modules, {'lxml': None, 'lxml.etree': None}):
+            self.assertEqual(parser.fromstring(content)[0].findtext('id'), '1')
+            self.assertEqual(parser.parse(BytesIO(content)).tag, 'Data')
+            self.assertEqual(
+                len(list(parser.iterrecords(BytesIO(content)))), 2)
+            self.assertRaises(ImportError, explicit.fromstring, content)
+        self.assertIs(parser.etree, ET)
+
+    def test_client_parser(self):
+        self.assertIsInstance(TvDB(parser='flat')._parser, FlatParser)
+
+
+class FlatParserTestCase(unittest.TestCase):
+    """Flat records parser test case."""
+
+    def setUp(self):
+        super(FlatParserTestCase, self).setUp()
+        self.parser = FlatParser()
+        self.etree = ElementTreeParser()
+
+    def assertSameModels(self, content, cls, path):
+        # the flat path is taken, not the fallback
+        self.assertIsInstance(self.parser._parse_flat(content), Document)
+        self.assertEqual(model_values(self.parser, content, cls, path),
+                         model_values(self.etree, content, cls, path))
+
+    def test_series_same_as_etree(self):
+        self.assertSameModels(read_testdata('series.xml'), Series, './Series')
+
+    def test_full_series_same_as_etree(self):
+        content = read_testdata('80348.zip', 'en.xml')
+        self.assertSameModels(content, Series, './Series')
+        self.assertSameModels(content, Episode, './Episode')
+
+    def test_updates_same_as_etree(self):
+        content = read_testdata('updates_month.zip', 'updates_month.xml')
+        self.assertSameModels(content, Update, './')
+
+    def test_records(self):
+        root = self.parser.fromstring(
+            b'<Data a="1"><Series><id>1</id><Name>A &amp; B &#233;</Name>'
+            b'<Overview></Overview><id>2</id><Empty/></Series></Data>')
+
+        self.assertIsInstance(root, Document)
+        self.assertEqual(root.get('a'), '1')
+        record = root.find('./Series')
+        self.assertIsInstance(record, Record)
+        # first one wins for repeated fields, as with find
+        self.assertEqual(record.findtext('id'), '1')
+        self.assertEqual(record.findtext('Name'), 'A & B \xe9')
+        self.assertEqual(record.findtext('Overview'), '')
+        self.assertIsNone(record.find('Overview').text)
+        self.assertIsNone(record.find('Empty'))
+        self.assertEqual([field.tag for field in record],
+                         ['Name', 'Overview', 'id'])
+
+    def test_single_record(self):
+        record = self.parser.fromstring(b'<Series><id>1</id></Series>')
+
+        self.assertIsInstance(record, Record)
+        self.assertEqual(record.findtext('id'), '1')
+
+    def test_line_ends_normalized(self):
+        root = self.parser.fromstring(
+            b'<Data><Series><Overview>a\r\nb\rc</Overview></Series></Data>')
+        self.assertEqual(root[0].findtext('Overview'), 'a\nb\nc')
+
+    def test_declared_encoding(self):
+        content = ('<?xml version="1.0" encoding="ISO-8859-1"?>'
+                   '<Data><Series><Name>\xe9</Name></Series></Data>')
+        root = self.parser.fromstring(content.encode('latin-1'))
+
+        self.assertIsInstance(root, Document)
+        self.assertEqual(root[0].findtext('Name'), '\xe9')
+
+    def test_byte_order_mark(self):
+        root = self.parser.fromstring(
+            '\ufeff<Data><Series><id>1</id></Series></Data>'.encode('utf-8'))
+        self.assertEqual(root[0].findtext('id'), '1')
+
+    def test_not_flat_fallback(self):
+        documents = [
+            read_testdata('updates_since.xml'),
+            b'<Data><Series><id>1</id><!-- comment --></Series></Data>',
+            b'<Data><Series><id><![CDATA[1]]></id></Series></Data>',
+            b'<Data><Series><id>1</id><a><b>2</b></a></Series></Data>',
+            b'<Data><Series id="1"><id>1</id></Series></Data>',
+            b'<Data>text<Series><id>1</id></Series></Data>',
+        ]
+        for content in documents:
+            self.assertRaises(NotFlat, self.parser._parse_flat, content)
+            root = self.parser.fromstring(content)
+            self.assertNotIsInstance(root, (Document, Record))
+            self.assertEqual(root.tag, ET.fromstring(content).tag)
+
+    def test_unknown_entity_fallback(self):
+        content = (b'<!DOCTYPE Data [<!ENTITY e "x">]>'
+                   b'<Data><Series><id>&e;</id></Series></Data>')
+        self.assertRaises(NotFlat, self.parser._parse_flat, content)
+        self.assertRaises(
+            NotFlat, self.parser._parse_flat,
+            b'<Data><Series><id>&e;</id></Series></Data>')
+
+    def test_tostring(self):
+        content = b'<Series><id>1</id><Name>A &lt;&amp;&gt; B</Name></Series>'
+        record = self.parser.fromstring(content)
+
+        self.assertEqual(self.parser.tostring(record), content)
+        self.assertEqual(
+            self.parser.fromstring(self.parser.tostring(record)), record)
+        self.assertRaises(
+            TypeError, self.parser.tostring, self.parser.element('Data'))
+        # fallback elements are serialized by the fallback
+        self.assertEqual(
+            self.parser.tostring(ET.fromstring(b'<a><b/></a>')),
+            b'<a><b /></a>')
+
+    def test_iterrecords(self):
+        xml_file = BytesIO(read_testdata('updates_since.xml'))
+        tags = [elem.tag for elem in self.parser.iterrecords(xml_file)]
+        self.assertEqual(tags, ['Time', 'Series', 'Episode'])
+
+
+@unittest.skipIf(not lxml_installed(), 'lxml is not installed')
+class LxmlParserTestCase(unittest.TestCase):
+    """lxml parser test case."""
+
+    def setUp(self):
+        super(LxmlParserTestCase, self).setUp()
+        self.parser = LxmlParser()
+
+    def test_same_as_etree(self):
+        content = read_testdata('80348.zip', 'en.xml')
+        self.assertEqual(
+            model_values(self.parser, content, Episode, './Episode'),
+            model_values(ElementTreeParser(), content, Episode, './Episode'))
+
+    def test_entities_not_resolved(self):
+        content = (b'<!DOCTYPE Data [<!ENTITY e SYSTEM "file:///etc/passwd">]>'
+                   b'<Data><Series><id>&e;</id></Series></Data>')
+        root = self.parser.fromstring(content)
+        self.assertFalse(root.find('./Series').findtext('id'))
+
+    def test_iterrecords(self):
+        xml_file = BytesIO(read_testdata('updates_since.xml'))
+        tags = [elem.tag for elem in self.parser.iterrecords(xml_file)]
+        self.assertEqual(tags, ['Time', 'Series', 'Episode'])
+
+
+class FlatClientTestCase(BaseTestCase):
+    """Client using the flat parser test case."""
+
+    def setUp(self):
+        super(FlatClientTestCase, self).setUp()
+        self.tvdb = TvDB(api_key='123456789', parser='flat')
+
+    def test_get_series(self):
+        self.response(filename='series.xml')
+        series = self.tvdb.get_series_by_id(80348)
+
+        self.assertEqual(series.name, 'Chuck')
+
+    def test_get_series_episodes(self):
+        self.response(filename='80348.zip', content_type='application/zip')
+        series = self.tvdb.get_series_by_id(80348, extended=True)
+
+        self.assertEqual(series.seasons[1][1].name,
+                         'Chuck Versus the Intersect')
+
+    def test_iter_updated(self):
+        self.response(
+            filename='updates_day.zip', content_type='application/zip')
+        results = list(self.tvdb.iter_updated())
+
+        self.assertEqual([r.kind for r in results],
+                         [TvDB.SERIES, TvDB.EPISODE, TvDB.BANNER])
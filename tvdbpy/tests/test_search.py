@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import unittest
+import xml.etree.ElementTree as ET
+
+import mock
+
+from tvdbpy.search import SearchIndex, ngrams, normalize
+from tvdbpy.tvdb import SearchResult
+
+
+def result(series_id, name, aliases=None):
+    xml = '<Series><id>%s</id><SeriesName>%s</SeriesName>' % (
+        series_id, name)
+    if aliases is not None:
+        xml += '<AliasNames>%s</AliasNames>' % aliases
+    return SearchResult(ET.fromstring(xml + '</Series>'))
+
+
+class NormalizeTestCase(unittest.TestCase):
+    """Title normalization test case."""
+
+    def test_normalize(self):
+        self.assertEqual(normalize('  Chuck Norris: Karate Kommandos '),
+                         'chuck norris karate kommandos')
+        self.assertEqual(normalize('Amélie & Friends'), 'amelie friends')
+
+    def test_ngrams(self):
+        self.assertEqual(ngrams('abc'), set([' ab', 'abc', 'bc ']))
+
+
+class SearchIndexTestCase(unittest.TestCase):
+    """Search index test case."""
+
+    def setUp(self):
+        super(SearchIndexTestCase, self).setUp()
+        self.client = mock.Mock()
+        self.index = SearchIndex(client=self.client)
+        self.index.warm([
+            result('1', 'Chuck Norris: Karate Kommandos'),
+            result('2', 'Chuck'),
+            result('3', 'The Chuck Jones Show'),
+            result('4', 'Chuck Finn'),
+            result('5', 'Breaking Bad'),
+            result('6', 'Star Trek: The Next Generation', 'TNG|Star Trek TNG'),
+        ])
+
+    def ids(self, results):
+        return [r.id for r in results]
+
+    def test_lookup_ranking(self):
+        results = self.index.lookup('chuck')
+
+        self.assertEqual(self.ids(results), ['2', '4', '1', '3'])
+
+    def test_lookup_word_prefix(self):
+        self.assertEqual(self.ids(self.index.lookup('jon')), ['3'])
+        self.assertEqual(self.ids(self.index.lookup('BREAK')), ['5'])
+
+    def test_lookup_aliases(self):
+        self.assertEqual(self.ids(self.index.lookup('tng')), ['6'])
+
+    def test_lookup_fuzzy(self):
+        self.assertEqual(self.ids(self.index.lookup('braking bad')), ['5'])
+        self.assertEqual(self.index.lookup('xyz'), [])
+
+    def test_lookup_fuzzy_limit(self):
+        self.index.warm([
+            result('7', 'Breaking Bad Reunion'),
+            result('8', 'Breaking'),
+            result('9', 'Baking Bad', 'Breaking Bread'),
+        ])
+
+        self.assertEqual(self.ids(self.index.lookup('braking bad')),
+                         ['9', '5', '7', '8'])
+        self.assertEqual(self.ids(self.index.lookup('braking bad', limit=2)),
+                         ['9', '5'])
+
+    def test_lookup_limit(self):
+        self.assertEqual(self.ids(self.index.lookup('chuck', limit=2)),
+                         ['2', '4'])
+
+    def test_lookup_empty(self):
+        self.assertEqual(self.index.lookup('  :: '), [])
+
+    def test_search_local(self):
+        results = self.index.search('chu')
+
+        self.assertEqual(len(results), 4)
+        self.assertFalse(self.client.search.called)
+
+    def test_search_fallback(self):
+        found = result('7', 'Lost')
+        self.client.search.return_value = [found]
+
+        self.assertEqual(self.index.search('lost'), [found])
+        self.client.search.assert_called_once_with('lost')
+        # now indexed
+        self.assertIn('7', self.index)
+        self.assertEqual(self.index.search('lost'), [found])
+        self.assertEqual(self.client.search.call_count, 1)
+
+    def test_search_without_client(self):
+        index = SearchIndex()
+        self.assertEqual(index.search('anything'), [])
+
+    def test_add_replaces(self):
+        other = result('2', 'Chuck')
+        self.index.add(other)
+
+        self.assertEqual(len(self.index), 6)
+        self.assertIs(self.index.lookup('chuck')[0], other)
+
+    def test_add_renamed(self):
+        renamed = result('5', 'Breaking Good')
+        self.index.add(renamed)
+        # renames drop the keys of removed names once they are half the keys
+        for i in range(6):
+            self.index.add(result('6', 'Star Trek %s' % i))
+
+        self.assertEqual(len(self.index), 6)
+        self.assertEqual(self.index.lookup('breaking good'), [renamed])
+        self.assertEqual(self.index.lookup('bad'), [])
+        self.assertEqual(self.index.lookup('braking bad'), [renamed])
+        self.assertEqual(self.ids(self.index.lookup('star trek')), ['6'])
+        self.assertEqual(self.index.lookup('tng'), [])
+        self.assertEqual(self.index.lookup('generation'), [])
+
+    def test_build_from_catalog(self):
+        catalog = mock.Mock()
+        catalog.iter_series.return_value = [result('8', 'Fringe')]
+        index = SearchIndex()
+
+        index.build_from_catalog(catalog)
+
+        self.assertEqual(self.ids(index.lookup('fringe')), ['8'])
@@ -0,0 +1,194 @@
+from __future__ import unicode_literals
+
+import mmap
+import os
+import struct
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+import zipfile
+
+from datetime import date
+from io import BytesIO
+
+import mock
+
+from tvdbpy import snapshot
+from tvdbpy.errors import SnapshotError
+from tvdbpy.snapshot import Snapshot, dumps, loads
+from tvdbpy.tests.test_tvdb import TESTS_DIR
+from tvdbpy.tvdb import Episode, Series
+
+
+def load_series(episodes=True, client=None):
+    path = os.path.join(TESTS_DIR, 'testdata', '80348.zip')
+    with zipfile.ZipFile(path) as f:
+        data = ET.fromstring(f.read('en.xml'))
+    series = Series(data.find('./Series'), client=client)
+    if episodes:
+        series._load_episodes(data)
+    return series
+
+
+def field_values(item):
+    return dict((attr, getattr(item, attr)) for attr, _, _ in item._fields)
+
+
+class SnapshotTestCase(unittest.TestCase):
+    """Series snapshots test case."""
+
+    def setUp(self):
+        super(SnapshotTestCase, self).setUp()
+        self.series = load_series()
+        self.data = dumps(self.series)
+
+    def test_series_round_trip(self):
+        result = loads(self.data)
+
+        self.assertIsInstance(result, Series)
+        self.assertEqual(field_values(result), field_values(self.series))
+        self.assertEqual(result.first_aired, date(2007, 9, 24))
+        self.assertEqual(result.rating, 8.8)
+        self.assertIsNone(result._client)
+
+    def test_episodes_round_trip(self):
+        result = loads(self.data)
+
+        self.assertEqual(sorted(result.seasons), sorted(self.series.seasons))
+        for number, season in self.series.seasons.items():
+            self.assertEqual(sorted(result.seasons[number]), sorted(season))
+            for key, episode in season.items():
+                loaded = result.seasons[number][key]
+                self.assertIsInstance(loaded, Episode)
+                self.assertEqual(field_values(loaded), field_values(episode))
+                self.assertIs(loaded.series, result)
+        # missing seasons are empty, as when loaded from XML
+        self.assertEqual(len(result.seasons[99]), 0)
+
+    def test_episodes_decoded_lazily(self):
+        result = loads(self.data)
+        season = result.seasons[1]
+
+        self.assertNotIsInstance(season._items[1], Episode)
+        self.assertEqual(season[1].name, 'Chuck Versus the Intersect')
+        self.assertIs(season[1], season[1])
+
+    def test_episodes_not_loaded(self):
+        series = load_series(episodes=False, client=mock.Mock())
+        result = loads(dumps(series), client=series._client)
+
+        self.assertEqual(result.name, 'Chuck')
+        self.assertIsNone(result._seasons)
+        # episodes are fetched by the client, as usual
+        series._client._get_series_full_data.return_value = ET.Element('Data')
+        self.assertEqual(len(result.seasons), 0)
+        series._client._get_series_full_data.assert_called_once_with(
+            '80348', language='en')
+
+    def test_client_set(self):
+        client = mock.Mock()
+        result = loads(self.data, client=client)
+
+        self.assertIs(result._client, client)
+        self.assertIs(result.seasons[1][1]._client, client)
+
+    def test_repeated_strings_stored_once(self):
+        director = self.series.seasons[1][1].director
+
+        self.assertEqual(self.data.count(director.encode('utf-8')), 1)
+        result = loads(self.data)
+        self.assertIs(
+            result.seasons[1][1].language, result.seasons[1][2].language)
+
+    def test_get_episode(self):
+        decoded = Snapshot(self.data)
+        episode = decoded.get_episode(2, 3)
+
+        self.assertEqual(
+            field_values(episode), field_values(self.series.seasons[2][3]))
+        self.assertIsNone(episode._series)
+        self.assertIsNone(decoded.get_episode(2, 99))
+        self.assertIsNone(decoded.get_episode(99, 1))
+        # only the episode strings were decoded
+        self.assertLess(
+            len([s for s in decoded._strings if s is not None]), 30)
+
+    def test_get_episode_bound_to_decoded_series(self):
+        decoded = Snapshot(self.data)
+        series = decoded.series
+
+        self.assertIs(decoded.get_episode(1, 1).series, series)
+
+    def test_missing_numbers(self):
+        xml = """
+            <Data>
+                <Series><id>1</id><SeriesName>Test</SeriesName></Series>
+                <Episode><id>10</id><EpisodeName>Special</EpisodeName>
+                </Episode>
+                <Episode><id>11</id><SeasonNumber>1</SeasonNumber>
+                <EpisodeNumber>1</EpisodeNumber></Episode>
+            </Data>"""
+        data = ET.fromstring(xml)
+        series = Series(data.find('./Series'))
+        series._load_episodes(data)
+        result = loads(dumps(series))
+
+        self.assertEqual(result.seasons[None][None].name, 'Special')
+        self.assertIsNone(result.seasons[None][None].number)
+        self.assertEqual(result.seasons[1][1].id, '11')
+        self.assertEqual(Snapshot(dumps(series)).get_episode(None, None).id,
+                         '10')
+
+    def test_dump_load_file(self):
+        output = BytesIO()
+        snapshot.dump(self.series, output)
+        output.seek(0)
+
+        self.assertEqual(snapshot.load(output).name, 'Chuck')
+
+    def test_mapped_file(self):
+        with tempfile.NamedTemporaryFile(delete=False) as f:
+            f.write(self.data)
+        self.addCleanup(os.remove, f.name)
+        with open(f.name, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.addCleanup(mapped.close)
+
+        decoded = Snapshot(mapped)
+        self.assertEqual(decoded.get_episode(1, 1).name,
+                         'Chuck Versus the Intersect')
+        self.assertEqual(decoded.series.name, 'Chuck')
+
+    def test_invalid_data(self):
+        self.assertRaises(SnapshotError, Snapshot, b'')
+        self.assertRaises(SnapshotError, Snapshot, b'not a snapshot' * 4)
+        self.assertRaises(SnapshotError, Snapshot, self.data[:100])
+        self.assertRaises(SnapshotError, Snapshot, self.data[:-1])
+
+    def test_newer_version(self):
+        data = (self.data[:8] + struct.pack('<H', snapshot.VERSION + 1) +
+                self.data[10:])
+        self.assertRaises(SnapshotError, Snapshot, data)
+
+    def test_schema_changes(self):
+        fields = Episode._fields
+        older = type(fields)(*[f for f in fields if f[0] != 'director'])
+        with mock.patch.object(Episode, '_fields', older):
+            data = dumps(self.series)
+        episode = Snapshot(data).get_episode(1, 1)
+
+        # fields missing from the snapshot are None
+        self.assertIsNone(episode.director)
+        self.assertEqual(episode.name, 'Chuck Versus the Intersect')
+
+        schema = snapshot._schema
+
+        def newer(cls):
+            return schema(cls) + [('extra', 's')]
+        with mock.patch('tvdbpy.snapshot._schema', newer):
+            data = dumps(self.series)
+        episode = Snapshot(data).get_episode(1, 1)
+
+        # fields unknown to the model are skipped
+        self.assertFalse(hasattr(episode, 'extra'))
+        self.assertEqual(episode.director, 'McG')
@@ -0,0 +1,197 @@
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+
+import mock
+
+from tvdbpy.cache import MemoryCache
+from tvdbpy.sync import UpdateSync
+from tvdbpy.tests.test_tvdb import BaseTestCase
+from tvdbpy.tvdb import TvDB, Update
+
+
+def update(kind, item_id, timestamp=None, series=None):
+    xml = '<%s><id>%s</id>' % (kind, item_id)
+    if series is not None:
+        xml += '<Series>%s</Series>' % series
+    if timestamp is not None:
+        xml += '<time>%s</time>' % timestamp
+    xml += '</%s>' % kind
+    return Update(ET.fromstring(xml))
+
+
+class UpdateSyncTestCase(unittest.TestCase):
+    """Updates sync engine test case."""
+
+    def setUp(self):
+        super(UpdateSyncTestCase, self).setUp()
+        self.client = mock.Mock()
+        self.clock = mock.Mock(return_value=1000)
+        self.series = []
+        self.episodes = []
+        self.sync = UpdateSync(
+            self.client, on_series=self.series.append,
+            on_episode=self.episodes.append, clock=self.clock)
+
+    def test_coalesce(self):
+        updates = [
+            update('Series', '1', 10),
+            update('Series', '1', 30),
+            update('Series', '1', 20),
+            update('Episode', '5', 10, series='1'),
+            update('Banner', '', 10, series='1'),
+        ]
+
+        result = self.sync.coalesce(updates)
+
+        self.assertEqual([(u.kind, u.id, u.timestamp.second) for u in result],
+                         [('series', '1', 30), ('episode', '5', 10)])
+
+    def test_plan(self):
+        updates = [
+            update('Series', '1', 40),
+            update('Episode', '11', 10, series='1'),
+            update('Episode', '12', 20, series='1'),
+            update('Episode', '13', 30, series='1'),
+            update('Episode', '21', 5, series='2'),
+            update('Series', '3', 15),
+        ]
+
+        self.assertEqual(self.sync.plan(updates), [
+            (5, 'episode', '21'),
+            (15, 'series', '3'),
+            (40, 'series_full', '1'),
+        ])
+
+    def test_plan_id_only_updates(self):
+        updates = [
+            Update.id_only(ET.fromstring('<Series>1</Series>')),
+            Update.id_only(ET.fromstring('<Episode>11</Episode>')),
+            Update.id_only(ET.fromstring('<Episode>11</Episode>')),
+        ]
+
+        self.assertEqual(self.sync.plan(updates), [
+            (0, 'episode', '11'),
+            (0, 'series', '1'),
+        ])
+
+    def test_run(self):
+        updates = [
+            update('Series', '1', 40),
+            update('Series', '1', 50),
+            update('Episode', '21', 5, series='2'),
+        ]
+        self.client.get_episode_by_id.return_value = None
+
+        stats = self.sync.run(updates, until=900)
+
+        self.client.get_series_by_id.assert_called_once_with('1')
+        self.client.get_episode_by_id.assert_called_once_with('21')
+        self.assertEqual(self.series, [self.client.get_series_by_id()])
+        # missing items are not notified
+        self.assertEqual(self.episodes, [])
+        self.assertEqual(stats.updates, 3)
+        self.assertEqual(stats.refreshed, 2)
+        self.assertEqual(self.sync.checkpoint, 900)
+
+    def test_run_full_series(self):
+        updates = [update('Episode', str(i), i, series='1')
+                   for i in range(3)]
+
+        self.sync.run(updates)
+
+        self.client.get_series_by_id.assert_called_once_with(
+            '1', extended=True)
+        self.assertFalse(self.client.get_episode_by_id.called)
+
+    def test_run_checkpoint_progress(self):
+        self.sync.checkpoint_every = 2
+        self.client.get_series_by_id.side_effect = [
+            None, None, None, ValueError()]
+        updates = [update('Series', str(i), i * 10) for i in range(1, 5)]
+
+        with self.assertRaises(ValueError):
+            self.sync.run(updates, until=900)
+
+        # resume from the last checkpointed update
+        self.assertEqual(self.sync.checkpoint, 20)
+
+    def test_items_per_second(self):
+        self.clock.side_effect = [1000, 1002]
+        updates = [update('Series', '1', i) for i in range(10)]
+
+        stats = self.sync.run(updates)
+
+        self.assertEqual(stats.elapsed, 2)
+        self.assertEqual(stats.items_per_second, 5)
+        self.assertEqual(stats.as_dict()['updates'], 10)
+
+    def test_first_sync(self):
+        stats = self.sync.sync()
+
+        self.assertEqual(stats.updates, 0)
+        self.assertEqual(self.sync.checkpoint, 1000)
+        self.assertFalse(self.client.iter_updated.called)
+
+    def test_sync_feeds(self):
+        self.client.iter_updated.return_value = []
+        self.client.updated_since.return_value = []
+
+        self.sync.save_checkpoint(1000 - 24 * 60 * 60)
+        self.sync.sync()
+        self.client.iter_updated.assert_called_with(
+            'day', since=1000 - 24 * 60 * 60)
+
+        self.sync.save_checkpoint(1000 - 24 * 60 * 60 - 1)
+        self.sync.sync()
+        self.client.iter_updated.assert_called_with(
+            'week', since=1000 - 24 * 60 * 60 - 1)
+
+        self.sync.save_checkpoint(1)
+        self.clock.return_value = 31 * 24 * 60 * 60
+        self.sync.sync()
+        self.client.updated_since.assert_called_once_with(1)
+        self.assertEqual(self.sync.checkpoint, 31 * 24 * 60 * 60)
+
+
+class CheckpointFileTestCase(unittest.TestCase):
+    """Sync checkpoint file test case."""
+
+    def setUp(self):
+        super(CheckpointFileTestCase, self).setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'checkpoint.json')
+
+    def test_checkpoint_file(self):
+        sync = UpdateSync(mock.Mock(), checkpoint_path=self.path)
+        self.assertIsNone(sync.checkpoint)
+
+        sync.save_checkpoint(1234567890)
+
+        other = UpdateSync(mock.Mock(), checkpoint_path=self.path)
+        self.assertEqual(other.checkpoint, 1234567890)
+
+
+class CachedUpdateSyncTestCase(BaseTestCase):
+    """Updates sync with a caching client test case."""
+
+    def test_refresh_not_served_from_cache(self):
+        tvdb = TvDB(api_key='123456789', cache=MemoryCache())
+        self.response(filename='series.xml', headers={'ETag': '"v1"'})
+        tvdb.get_series_by_id(80348)
+        series = []
+
+        UpdateSync(tvdb, on_series=series.append).run(
+            [update('Series', '80348', 10)])
+
+        self.assertEqual(len(series), 1)
+        self.assertEqual(self.transport.get.call_count, 2)
+        # the cached response is revalidated
+        self.transport.get.assert_called_with(
+            'http://thetvdb.com/api/123456789/series/80348/en.xml',
+            params={}, headers={'If-None-Match': '"v1"'})
@@ -0,0 +1,196 @@
+from __future__ import unicode_literals
+
+import math
+import os
+import unittest
+import xml.etree.ElementTree as ET
+import zipfile
+
+from datetime import date
+
+import mock
+
+from tvdbpy import TvDB, table
+from tvdbpy.parsers import FlatParser
+from tvdbpy.table import MISSING, EpisodeTable
+from tvdbpy.tests.test_tvdb import TESTS_DIR, BaseTestCase
+from tvdbpy.tvdb import Episode, Series
+
+
+def load_data():
+    path = os.path.join(TESTS_DIR, 'testdata', '80348.zip')
+    with zipfile.ZipFile(path) as f:
+        return f.read('en.xml')
+
+
+class EpisodeTableTestMixin(object):
+    """Shared tests for the table backends."""
+
+    def setUp(self):
+        super(EpisodeTableTestMixin, self).setUp()
+        self.data = ET.fromstring(load_data())
+        self.table = EpisodeTable.from_xml(self.data)
+        self.episodes = [Episode(xml_data)
+                         for xml_data in self.data.findall('./Episode')]
+
+    def assertSameValues(self, values, expected):
+        self.assertEqual(len(values), len(expected))
+        for value, other in zip(values, expected):
+            if isinstance(other, float) and math.isnan(other):
+                self.assertTrue(math.isnan(value))
+            else:
+                self.assertEqual(value, other)
+
+    def test_columns(self):
+        self.assertEqual(len(self.table), len(self.episodes))
+
+        def column(attr, missing=MISSING):
+            return [missing if getattr(e, attr) is None else getattr(e, attr)
+                    for e in self.episodes]
+        self.assertEqual(list(self.table['id']), column('id', None))
+        self.assertSameValues(self.table['season'], column('season'))
+        self.assertSameValues(self.table['number'], column('number'))
+        self.assertSameValues(
+            self.table['rating'], column('rating', float('nan')))
+        self.assertSameValues(
+            self.table['rating_count'], column('rating_count'))
+        self.assertSameValues(self.table['first_aired'], [
+            MISSING if e.first_aired is None else e.first_aired.toordinal()
+            for e in self.episodes])
+
+    def test_missing_values(self):
+        data = ET.fromstring(
+            '<Data><Episode><id>1</id><SeasonNumber>x</SeasonNumber>'
+            '<Rating></Rating><FirstAired>2010-02-30</FirstAired>'
+            '</Episode></Data>')
+        result = EpisodeTable.from_xml(data)
+
+        self.assertEqual(result['season'][0], MISSING)
+        self.assertEqual(result['number'][0], MISSING)
+        self.assertTrue(math.isnan(result['rating'][0]))
+        self.assertEqual(result['first_aired'][0], MISSING)
+        self.assertIsNone(result.mean('rating'))
+        self.assertEqual(len(result.filter(result.mask('season', '>', -5))),
+                         0)
+
+    def test_episode_by_row(self):
+        episode = self.table.episode(3)
+
+        self.assertIsInstance(episode, Episode)
+        self.assertEqual(episode.id, self.table['id'][3])
+        self.assertIs(self.table.episode(3), episode)
+        self.assertEqual([e.id for e in self.table.episodes()],
+                         list(self.table['id']))
+
+    def test_episodes_built_lazily(self):
+        with mock.patch('tvdbpy.table.Episode', side_effect=Episode,
+                        _fields=Episode._fields) as episode_cls:
+            result = EpisodeTable.from_xml(self.data)
+            result.filter(result.mask('season', '==', 1)).sort('rating')
+            self.assertFalse(episode_cls.called)
+            result.episode(0)
+            self.assertEqual(episode_cls.call_count, 1)
+
+    def test_filter(self):
+        result = self.table.filter(
+            self.table.mask('season', '==', 2),
+            self.table.mask('rating', '>=', 8.0))
+
+        expected = [e.id for e in self.episodes
+                    if e.season == 2 and e.rating is not None and
+                    e.rating >= 8.0]
+        self.assertTrue(expected)
+        self.assertEqual(list(result['id']), expected)
+        # episodes are shared with the filtered tables
+        self.assertIs(result.episode(0), self.table.episode(
+            list(self.table['id']).index(expected[0])))
+        self.assertRaises(ValueError, self.table.filter, [True])
+
+    def test_filter_by_id(self):
+        result = self.table.filter(self.table.mask('id', '==', '332179'))
+        self.assertEqual(result.episode(0).name, 'Chuck Versus the Intersect')
+
+    def test_sort(self):
+        result = self.table.sort('season', 'number')
+        keys = [(e.season, e.number) for e in self.episodes]
+        self.assertEqual(list(zip(result['season'], result['number'])),
+                         sorted(keys))
+
+        result = self.table.sort('rating', reverse=True)
+        ratings = [r for r in result['rating'] if not math.isnan(r)]
+        self.assertEqual(ratings, sorted(ratings, reverse=True))
+        self.assertRaises(TypeError, self.table.sort, 'rating', order=1)
+
+    def test_group_by_season(self):
+        groups = self.table.group_by_season()
+
+        seasons = sorted(set(e.season for e in self.episodes))
+        self.assertEqual(list(groups), seasons)
+        for season, group in groups.items():
+            self.assertEqual(
+                sorted(group['id']),
+                sorted(e.id for e in self.episodes if e.season == season))
+
+    def test_mean(self):
+        ratings = [e.rating for e in self.episodes if e.rating is not None]
+        self.assertAlmostEqual(
+            self.table.mean('rating'), sum(ratings) / len(ratings))
+
+        season_means = dict(
+            (season, group.mean('rating'))
+            for season, group in self.table.group_by_season().items())
+        season_ratings = [e.rating for e in self.episodes
+                          if e.season == 1 and e.rating is not None]
+        self.assertAlmostEqual(
+            season_means[1], sum(season_ratings) / len(season_ratings))
+
+    def test_air_date_gaps(self):
+        season = self.table.filter(self.table.mask('season', '==', 1))
+        gaps = season.sort('first_aired').diff('first_aired')
+
+        dates = sorted(e.first_aired for e in self.episodes
+                       if e.season == 1 and e.first_aired is not None)
+        self.assertEqual(list(gaps), [
+            (b - a).days for a, b in zip(dates, dates[1:])])
+        self.assertEqual(date.fromordinal(season['first_aired'][0]),
+                         season.episode(0).first_aired)
+
+    def test_flat_parser_data(self):
+        data = FlatParser().fromstring(load_data())
+        result = EpisodeTable.from_xml(data)
+
+        self.assertEqual(list(result['id']), list(self.table['id']))
+        self.assertSameValues(result['rating'], self.table['rating'])
+
+
+class ArrayEpisodeTableTestCase(EpisodeTableTestMixin, unittest.TestCase):
+    """Episode table (array backend) test case."""
+
+    def setUp(self):
+        patcher = mock.patch('tvdbpy.table.numpy', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        super(ArrayEpisodeTableTestCase, self).setUp()
+
+
+@unittest.skipIf(table.numpy is None, 'NumPy is not installed')
+class NumpyEpisodeTableTestCase(EpisodeTableTestMixin, unittest.TestCase):
+    """Episode table (NumPy backend) test case."""
+
+
+class ClientEpisodeTableTestCase(BaseTestCase):
+    """Client episode table test case."""
+
+    def test_get_episode_table(self):
+        self.response(filename='80348.zip', content_type='application/zip')
+        tvdb = TvDB(api_key='123456789')
+        result = tvdb.get_episode_table(80348)
+
+        self.assertIsInstance(result, EpisodeTable)
+        episode = result.episode(0)
+        self.assertIsInstance(episode.series, Series)
+        self.assertEqual(episode.series.name, 'Chuck')
+        self.assertIs(episode._client, tvdb)
+        self.transport.get.assert_called_once_with(
+            'http://thetvdb.com/api/123456789/series/80348/all/en.zip',
+            params={}, stream=True)
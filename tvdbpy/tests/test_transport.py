@@ -0,0 +1,48 @@
+from __future__ import unicode_literals
+
+import unittest
+
+import mock
+
+from tvdbpy.transport import HTTPTransport
+
+
+class HTTPTransportTestCase(unittest.TestCase):
+    """HTTP transport test case."""
+
+    def test_pooled_session(self):
+        transport = HTTPTransport(pool_size=4, max_retries=2)
+
+        adapter = transport.session.get_adapter('http://thetvdb.com/api/')
+        self.assertEqual(adapter._pool_maxsize, 4)
+        self.assertEqual(adapter.max_retries.total, 2)
+        self.assertIs(
+            transport.session.get_adapter('https://thetvdb.com/api/'),
+            adapter)
+
+    def test_get_uses_session_and_timeout(self):
+        session = mock.Mock()
+        transport = HTTPTransport(timeout=3, session=session)
+
+        response = transport.get('http://thetvdb.com/api/', params={'a': 1})
+
+        self.assertEqual(response, session.get.return_value)
+        session.get.assert_called_once_with(
+            'http://thetvdb.com/api/', params={'a': 1}, timeout=3)
+
+    def test_get_custom_timeout(self):
+        session = mock.Mock()
+        transport = HTTPTransport(timeout=3, session=session)
+
+        transport.get('http://thetvdb.com/api/', timeout=1)
+
+        session.get.assert_called_once_with(
+            'http://thetvdb.com/api/', params=None, timeout=1)
+
+    def test_close(self):
+        session = mock.Mock()
+        transport = HTTPTransport(session=session)
+
+        transport.close()
+
+        session.close.assert_called_once_with()
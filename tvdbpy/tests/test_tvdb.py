@@ -2,22 +2,37 @@ from __future__ import unicode_literals
 
 import codecs
 import os
+import shutil
+import tempfile
+import threading
+import time
 import unittest
 import xml.etree.ElementTree as ET
 
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from io import BytesIO
 
 import mock
 import requests
 
-from tvdbpy import TvDB
+from tvdbpy import TvDB, cache
+from tvdbpy.cache import DiskCache, MemoryCache
 from tvdbpy.errors import (
     APIClientNotAvailableError,
     APIKeyRequiredError,
     APIResponseError,
     TvDBException,
 )
+from tvdbpy.helpers import (
+    BaseTvDB,
+    FieldSchema,
+    as_date,
+    as_float,
+    as_int,
+    as_list,
+    as_timestamp,
+    memoized,
+)
 from tvdbpy.tvdb import Episode, SearchResult, Series, Update
 
 
@@ -35,13 +50,13 @@ class BaseTestCase(unittest.TestCase):
     """Base test case."""
 
     def setUp(self):
-        patcher = mock.patch('tvdbpy.helpers.requests')
-        self.requests = patcher.start()
+        patcher = mock.patch('tvdbpy.tvdb.HTTPTransport')
+        self.transport = patcher.start().return_value
         self.addCleanup(patcher.stop)
 
-    def response(self, method='GET', status_code=200, filename=None,
-                 content_type='text/xml'):
-        """Set a custom response from a file."""
+    def make_response(self, status_code=200, filename=None,
+                      content_type='text/xml', headers=None):
+        """Return a response with the content from a file."""
         data = b''
         if filename is not None:
             path = os.path.join(TESTS_DIR, 'testdata', filename)
@@ -56,11 +71,83 @@ class BaseTestCase(unittest.TestCase):
         response = requests.Response()
         response.status_code = status_code
         response.headers['content-type'] = content_type
+        if headers is not None:
+            response.headers.update(headers)
         response.encoding = 'utf-8'
         response.raw = RequestsBytesIO(data)
+        return response
 
-        requests_method = getattr(self.requests, method.lower())
-        setattr(requests_method, 'return_value', response)
+    def response(self, method='GET', **kwargs):
+        """Set a custom response from a file."""
+        response = self.make_response(**kwargs)
+        transport_method = getattr(self.transport, method.lower())
+        setattr(transport_method, 'return_value', response)
+        # streamed bodies are read once, so each call gets a new response
+        setattr(transport_method, 'side_effect',
+                lambda *args, **params: self.make_response(**kwargs))
+
+    def responses(self, urls, method='GET'):
+        """Set custom responses by url, from a mapping of url to kwargs."""
+        def get(url, **kwargs):
+            return self.make_response(**urls[url])
+        transport_method = getattr(self.transport, method.lower())
+        setattr(transport_method, 'side_effect', get)
+
+
+class FieldSchemaTestCase(unittest.TestCase):
+    """XML fields loading test case."""
+
+    class Item(BaseTvDB):
+        _fields = FieldSchema(
+            ('name', 'Name', None),
+            ('number', 'Number', int),
+            ('tags', 'Tags', as_list),
+            ('missing', 'Missing', float),
+        )
+
+    def test_load_fields(self):
+        xml = """
+            <Item>
+                <Name>first</Name>
+                <Name>second</Name>
+                <Number>nan</Number>
+                <Tags>|a|b|</Tags>
+                <Missing />
+            </Item>"""
+        item = self.Item()
+        item._load_fields(ET.fromstring(xml))
+
+        self.assertEqual(item.name, 'first')
+        self.assertIsNone(item.number)
+        self.assertEqual(item.tags, ['a', 'b'])
+        self.assertIsNone(item.missing)
+
+    def test_schema_concat(self):
+        schema = self.Item._fields + (('other', 'Other', int),)
+
+        self.assertIsInstance(schema, FieldSchema)
+        self.assertEqual(len(schema), 5)
+        self.assertEqual(schema.plain, (('name', 'Name'),))
+        self.assertEqual([f[0] for f in schema.casted],
+                         ['number', 'tags', 'missing', 'other'])
+
+    def test_pack_fields(self):
+        xml = """
+            <Item>
+                <Name>first</Name>
+                <Number>12</Number>
+                <Tags />
+                <Unused>value</Unused>
+            </Item>"""
+        packed = self.Item._fields.pack(ET.fromstring(xml))
+        item = self.Item()
+        item._load_fields(self.Item._fields.unpack('Item', packed))
+
+        self.assertEqual(packed, ('first', '12', None, None))
+        self.assertEqual(item.name, 'first')
+        self.assertEqual(item.number, 12)
+        self.assertIsNone(item.tags)
+        self.assertIsNone(item.missing)
 
 
 class BaseSeriesMixin(object):
@@ -135,7 +222,7 @@ class TvDBSearchResultTestCase(BaseTestCase, BaseSeriesMixin):
         result = self.result.get_series()
 
         self.assertIsInstance(result, Series)
-        self.requests.get.assert_called_with(
+        self.transport.get.assert_called_with(
             'http://thetvdb.com/api/123456789/series/80348/en.xml', params={})
 
 
@@ -261,13 +348,39 @@ class TvDBEpisodeTestCase(BaseTestCase):
         result = self.result.series
 
         self.assertIsInstance(result, Series)
-        self.requests.get.assert_called_with(
+        self.transport.get.assert_called_with(
             'http://thetvdb.com/api/123456789/series/80348/en.xml', params={})
 
     def test_rating_data(self):
         self.assertEqual(self.result.rating, 7.7)
         self.assertEqual(self.result.rating_count, None)
 
+    def test_compact(self):
+        self.assertFalse(hasattr(self.result, '__dict__'))
+        with self.assertRaises(AttributeError):
+            self.result.unknown = 'value'
+
+    def test_invalid_date(self):
+        xml = """
+            <Episode>
+                <id>332179</id>
+                <FirstAired>2007-13-45</FirstAired>
+            </Episode>"""
+        result = Episode(ET.fromstring(xml))
+        self.assertIsNone(result.first_aired)
+
+    def test_repeated_values_interned(self):
+        xml = """
+            <Episode>
+                <id>%s</id>
+                <Director>Robert Duncan McNeill</Director>
+                <Language>en</Language>
+            </Episode>"""
+        first = Episode(ET.fromstring(xml % 1))
+        second = Episode(ET.fromstring(xml % 2))
+        self.assertIs(first.director, second.director)
+        self.assertIs(first.language, second.language)
+
     def test_writers_is_a_list(self):
         self.assertEqual(self.result.writers, ['Josh Schwartz', 'Chris Fedak'])
 
@@ -415,7 +528,7 @@ class AnonymousTvDBTestCase(BaseTestCase):
         results = self.tvdb.search('nothing')
 
         self.assertEqual(results, [])
-        self.requests.get.assert_called_once_with(
+        self.transport.get.assert_called_once_with(
             'http://thetvdb.com/api/GetSeries.php',
             params={'seriesname': 'nothing'})
 
@@ -423,7 +536,7 @@ class AnonymousTvDBTestCase(BaseTestCase):
         self.response(filename='getseries.xml')
         results = self.tvdb.search('chuck')
 
-        self.requests.get.assert_called_once_with(
+        self.transport.get.assert_called_once_with(
             'http://thetvdb.com/api/GetSeries.php',
             params={'seriesname': 'chuck'})
         self.assertEqual(len(results), 7)
@@ -453,7 +566,7 @@ class TvDBTestCase(BaseTestCase):
         result = self.tvdb.get_series_by_id(321)
 
         self.assertIsInstance(result, Series)
-        self.requests.get.assert_called_once_with(
+        self.transport.get.assert_called_once_with(
             'http://thetvdb.com/api/123456789/series/321/en.xml', params={})
 
     def test_get_series_by_id_missing_data(self):
@@ -461,7 +574,7 @@ class TvDBTestCase(BaseTestCase):
         result = self.tvdb.get_series_by_id(321)
 
         self.assertIsNone(result)
-        self.requests.get.assert_called_once_with(
+        self.transport.get.assert_called_once_with(
             'http://thetvdb.com/api/123456789/series/321/en.xml', params={})
 
     def test_get_series_by_id_full_data(self):
@@ -469,19 +582,123 @@ class TvDBTestCase(BaseTestCase):
         result = self.tvdb.get_series_by_id(80348, extended=True)
 
         self.assertIsInstance(result, Series)
-        self.requests.get.assert_called_once_with(
+        self.transport.get.assert_called_once_with(
             'http://thetvdb.com/api/123456789/series/80348/all/en.zip',
-            params={})
+            params={}, stream=True)
         # check episodes were loaded
         self.assertEqual(len(result.seasons), 6)
         self.assertEqual(len(result.seasons[1]), 13)
 
+    def test_get_series_by_id_full_data_lazy_episodes(self):
+        self.response(filename='80348.zip', content_type='application/zip')
+        result = self.tvdb.get_series_by_id(80348, extended=True)
+        season = result.seasons[1]
+
+        # episodes are not built until accessed, nor their elements kept
+        self.assertTrue(
+            all(isinstance(e, tuple) for e in season._items.values()))
+        self.assertEqual(list(season), list(range(1, 14)))
+
+        episode = season[1]
+        self.assertIsInstance(episode, Episode)
+        self.assertIs(season[1], episode)
+        self.assertIs(episode.series, result)
+        self.assertIs(episode._client, self.tvdb)
+        self.assertEqual(episode.name, 'Chuck Versus the Intersect')
+        self.assertEqual((episode.season, episode.number), (1, 1))
+
+    def test_get_series_by_id_full_data_episodes(self):
+        self.response(filename='80348.zip', content_type='application/zip')
+        result = self.tvdb.get_series_by_id(80348, extended=True)
+        data = self.tvdb._get_series_full_data(80348)
+
+        expected = [Episode(e) for e in data.findall('./Episode')]
+        episodes = [e for s in result.seasons.values() for e in s.values()]
+
+        self.assertEqual(len(episodes), len(expected))
+        for episode, other in zip(episodes, expected):
+            self.assertEqual(episode.id, other.id)
+            self.assertEqual(episode.name, other.name)
+            self.assertIs(result.seasons[episode.season][episode.number],
+                          episode)
+        self.assertEqual(result.seasons.get(99, {}).get(1), None)
+
+    def test_series_get_episode_loaded(self):
+        self.response(filename='80348.zip', content_type='application/zip')
+        series = self.tvdb.get_series_by_id(80348, extended=True)
+
+        episode = series.get_episode(1, 2)
+
+        self.assertEqual((episode.season, episode.number), (1, 2))
+        self.assertIs(episode, series.seasons[1][2])
+        self.assertIsNone(series.get_episode(99, 1))
+        self.assertEqual(self.transport.get.call_count, 1)
+
+    def test_series_get_episode_single_requests(self):
+        base_url = 'http://thetvdb.com/api/123456789/series/80348/'
+        self.response(filename='series.xml')
+        series = self.tvdb.get_series_by_id(80348)
+        self.response(filename='episode.xml')
+
+        episode = series.get_episode(1, 1)
+
+        self.assertIsInstance(episode, Episode)
+        self.transport.get.assert_called_with(
+            base_url + 'default/1/1/en.xml', params={})
+        self.assertIsNone(series._seasons)
+
+    def test_series_get_episode_loads_full_data(self):
+        base_url = 'http://thetvdb.com/api/123456789/series/80348/'
+        self.response(filename='series.xml')
+        series = self.tvdb.get_series_by_id(80348)
+        self.responses(dict(
+            [(base_url + 'default/1/%d/en.xml' % number,
+              {'filename': 'episode.xml'}) for number in range(1, 14)] +
+            [(base_url + 'all/en.zip',
+              {'filename': '80348.zip', 'content_type': 'application/zip'})]))
+
+        episodes = [series.get_episode(1, number) for number in range(1, 14)]
+
+        urls = [c[0][0] for c in self.transport.get.call_args_list[1:]]
+        self.assertEqual(
+            urls, [base_url + 'default/1/%d/en.xml' % number
+                   for number in range(1, Series.zip_threshold + 1)] +
+            [base_url + 'all/en.zip'])
+        self.assertEqual([e.number for e in episodes[Series.zip_threshold:]],
+                         list(range(Series.zip_threshold + 1, 14)))
+
+    def test_series_get_episodes(self):
+        self.response(filename='series.xml')
+        series = self.tvdb.get_series_by_id(80348)
+        self.response(filename='80348.zip', content_type='application/zip')
+
+        episodes = series.get_episodes([(1, 1), (2, 3), (99, 1)])
+
+        self.assertEqual([(e.season, e.number) for e in episodes[:2]],
+                         [(1, 1), (2, 3)])
+        self.assertIsNone(episodes[2])
+        self.transport.get.assert_called_with(
+            'http://thetvdb.com/api/123456789/series/80348/all/en.zip',
+            params={}, stream=True)
+        self.assertEqual(self.transport.get.call_count, 2)
+
+    def test_get_series_episodes(self):
+        self.response(filename='80348.zip', content_type='application/zip')
+
+        keys = [(1, number) for number in range(1, 14)]
+        episodes = self.tvdb.get_series_episodes(80348, keys)
+
+        self.assertEqual([(e.season, e.number) for e in episodes], keys)
+        self.transport.get.assert_called_once_with(
+            'http://thetvdb.com/api/123456789/series/80348/all/en.zip',
+            params={}, stream=True)
+
     def test_get_episode_by_id(self):
         self.response(filename='episode.xml')
         result = self.tvdb.get_episode_by_id(332179)
 
         self.assertIsInstance(result, Episode)
-        self.requests.get.assert_called_once_with(
+        self.transport.get.assert_called_once_with(
             'http://thetvdb.com/api/123456789/episodes/332179/en.xml',
             params={})
 
@@ -490,7 +707,7 @@ class TvDBTestCase(BaseTestCase):
         result = self.tvdb.get_episode_by_id(321)
 
         self.assertIsNone(result)
-        self.requests.get.assert_called_once_with(
+        self.transport.get.assert_called_once_with(
             'http://thetvdb.com/api/123456789/episodes/321/en.xml', params={})
 
     def test_get_episode(self):
@@ -498,7 +715,7 @@ class TvDBTestCase(BaseTestCase):
         result = self.tvdb.get_episode(80348, 1, 1)
 
         self.assertIsInstance(result, Episode)
-        self.requests.get.assert_called_once_with(
+        self.transport.get.assert_called_once_with(
             'http://thetvdb.com/api/123456789/series/80348/default/1/1/en.xml',
             params={})
 
@@ -507,7 +724,7 @@ class TvDBTestCase(BaseTestCase):
         result = self.tvdb.get_episode(80348, 6, 1)
 
         self.assertIsNone(result)
-        self.requests.get.assert_called_once_with(
+        self.transport.get.assert_called_once_with(
             'http://thetvdb.com/api/123456789/series/80348/default/6/1/en.xml',
             params={})
 
@@ -519,9 +736,9 @@ class TvDBTestCase(BaseTestCase):
         for result in results:
             self.assertIsInstance(result, Update)
 
-        self.requests.get.assert_called_once_with(
+        self.transport.get.assert_called_once_with(
             'http://thetvdb.com/api/123456789/updates/updates_day.zip',
-            params={})
+            params={}, stream=True)
 
     def test_updated_with_timeframe(self):
         self.response(
@@ -531,14 +748,86 @@ class TvDBTestCase(BaseTestCase):
         for result in results:
             self.assertIsInstance(result, Update)
 
-        self.requests.get.assert_called_once_with(
+        self.transport.get.assert_called_once_with(
             'http://thetvdb.com/api/123456789/updates/updates_month.zip',
-            params={})
+            params={}, stream=True)
 
     def test_updated_with_invalid_timeframe(self):
         with self.assertRaises(TvDBException):
             self.tvdb.updated('anything')
 
+    def test_iter_updated(self):
+        self.response(
+            filename='updates_day.zip', content_type='application/zip')
+        results = self.tvdb.iter_updated()
+
+        self.assertFalse(isinstance(results, list))
+        # requested once iterated
+        self.assertFalse(self.transport.get.called)
+        results = list(results)
+        self.assertEqual([r.kind for r in results],
+                         [TvDB.SERIES, TvDB.EPISODE, TvDB.BANNER])
+        self.assertEqual(results[1].series, '80348')
+        self.assertEqual(results[2].path, 'posters/77170.jpg')
+        self.assertEqual(
+            results[0].timestamp, datetime(2009, 2, 13, 23, 31, 30))
+        self.transport.get.assert_called_once_with(
+            'http://thetvdb.com/api/123456789/updates/updates_day.zip',
+            params={}, stream=True)
+
+    def test_iter_updated_same_as_updated(self):
+        self.response(
+            filename='updates_month.zip', content_type='application/zip')
+        expected = self.tvdb.updated(TvDB.MONTH)
+        self.response(
+            filename='updates_month.zip', content_type='application/zip')
+        results = list(self.tvdb.iter_updated(TvDB.MONTH))
+
+        def values(item):
+            return [getattr(item, attr) for attr in Update.__slots__]
+
+        self.assertEqual([values(r) for r in results],
+                         [values(r) for r in expected])
+
+    def test_iter_updated_by_kind(self):
+        self.response(
+            filename='updates_day.zip', content_type='application/zip')
+        results = list(self.tvdb.iter_updated(kind=TvDB.EPISODE))
+
+        self.assertEqual([(r.kind, r.id) for r in results],
+                         [(TvDB.EPISODE, '332179')])
+
+    def test_iter_updated_since(self):
+        self.response(
+            filename='updates_day.zip', content_type='application/zip')
+        results = list(self.tvdb.iter_updated(since=1234567890))
+        self.assertEqual(len(results), 3)
+
+        self.response(
+            filename='updates_day.zip', content_type='application/zip')
+        results = list(self.tvdb.iter_updated(
+            since=datetime(2009, 2, 13, 23, 31, 31)))
+        self.assertEqual(results, [])
+
+    def test_iter_updated_closed(self):
+        self.response(
+            filename='updates_day.zip', content_type='application/zip')
+        entry = self.tvdb._get_compressed_entry(
+            '123456789/updates/updates_day.zip')
+        spooled = entry.file
+
+        with mock.patch.object(
+                self.tvdb, '_get_compressed_entry', return_value=entry):
+            results = self.tvdb.iter_updated()
+            next(results)
+            results.close()
+
+        self.assertTrue(spooled.closed)
+
+    def test_iter_updated_with_invalid_kind(self):
+        with self.assertRaises(TvDBException):
+            self.tvdb.iter_updated(kind='anything')
+
     def test_updated_since_no_kind_specified(self):
         self.response(filename='updates_since.xml')
         results = self.tvdb.updated_since(1234567890)
@@ -546,7 +835,7 @@ class TvDBTestCase(BaseTestCase):
         for result in results:
             self.assertIsInstance(result, Update)
 
-        self.requests.get.assert_called_once_with(
+        self.transport.get.assert_called_once_with(
             'http://thetvdb.com/api/Updates.php?type=all&time=1234567890',
             params={})
 
@@ -558,10 +847,634 @@ class TvDBTestCase(BaseTestCase):
             self.assertIsInstance(result, Update)
             self.assertEqual(result.kind, TvDB.EPISODE)
 
-        self.requests.get.assert_called_once_with(
+        self.transport.get.assert_called_once_with(
             'http://thetvdb.com/api/Updates.php?type=episode&time=1234567890',
             params={})
 
     def test_updated_since_with_invalid_kind(self):
         with self.assertRaises(TvDBException):
             self.tvdb.updated_since(123456780, 'anything')
+
+    def test_custom_transport(self):
+        transport = mock.Mock()
+        tvdb = TvDB(api_key='123456789', transport=transport)
+        self.response(filename='series.xml')
+        transport.get.return_value = self.transport.get.return_value
+
+        result = tvdb.get_series_by_id(321)
+
+        self.assertIsInstance(result, Series)
+        transport.get.assert_called_once_with(
+            'http://thetvdb.com/api/123456789/series/321/en.xml', params={})
+        self.assertFalse(self.transport.get.called)
+
+    def test_cached_responses(self):
+        tvdb = TvDB(api_key='123456789', cache=MemoryCache())
+        self.response(filename='series.xml')
+
+        first = tvdb.get_series_by_id(321)
+        second = tvdb.get_series_by_id(321)
+
+        self.assertEqual(first.name, second.name)
+        self.transport.get.assert_called_once_with(
+            'http://thetvdb.com/api/123456789/series/321/en.xml', params={})
+        self.assertEqual(tvdb._cache.stats.hits, 1)
+        self.assertEqual(tvdb._cache.stats.misses, 1)
+
+    def test_cached_compressed_responses(self):
+        tvdb = TvDB(api_key='123456789', cache=MemoryCache())
+        self.response(filename='80348.zip', content_type='application/zip')
+
+        tvdb.get_series_by_id(80348, extended=True)
+        result = tvdb.get_series_by_id(80348, extended=True)
+
+        self.assertEqual(len(result.seasons), 6)
+        self.assertEqual(self.transport.get.call_count, 1)
+
+    def test_compressed_responses_streamed(self):
+        self.response(filename='80348.zip', content_type='application/zip')
+        self.tvdb.spool_size = 1024
+
+        entry = self.tvdb._get_compressed_entry(
+            '123456789/series/80348/all/en.zip')
+        self.addCleanup(entry.close)
+
+        self.assertIsInstance(entry.file, tempfile.SpooledTemporaryFile)
+        # larger bodies are spooled to disk
+        self.assertTrue(entry.file._rolled)
+        with open(os.path.join(TESTS_DIR, 'testdata', '80348.zip'), 'rb') as f:
+            self.assertEqual(entry.content, f.read())
+
+    def test_spooled_responses_closed(self):
+        self.response(filename='80348.zip', content_type='application/zip')
+        spooled = []
+
+        def spool(response):
+            spooled.append(TvDB._spool(self.tvdb, response))
+            return spooled[-1]
+
+        with mock.patch.object(self.tvdb, '_spool', side_effect=spool):
+            self.tvdb.get_series_by_id(80348, extended=True)
+
+        self.assertTrue(spooled[0].closed)
+
+    def test_disk_cached_compressed_responses(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.response(filename='80348.zip', content_type='application/zip')
+
+        TvDB(api_key='123456789', cache=DiskCache(directory)).get_series_by_id(
+            80348, extended=True)
+        tvdb = TvDB(api_key='123456789', cache=DiskCache(directory))
+        result = tvdb.get_series_by_id(80348, extended=True)
+
+        self.assertEqual(len(result.seasons), 6)
+        self.assertEqual(result.seasons[1][1].name,
+                         'Chuck Versus the Intersect')
+        self.assertEqual(self.transport.get.call_count, 1)
+
+    def test_disk_cached_payloads_closed(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.responses({
+            'http://thetvdb.com/api/123456789/series/80348/all/en.zip': {
+                'filename': '80348.zip', 'content_type': 'application/zip'},
+            'http://thetvdb.com/api/123456789/updates/updates_day.zip': {
+                'filename': 'updates_day.zip',
+                'content_type': 'application/zip'},
+        })
+        tvdb = TvDB(api_key='123456789', cache=DiskCache(directory))
+        tvdb.get_series_by_id(80348, extended=True)
+        tvdb.updated()
+        mapped = []
+        original = cache.open_mapped
+
+        def open_mapped(path):
+            mapped.append(original(path))
+            return mapped[-1]
+
+        # cached payloads are read from disk
+        tvdb = TvDB(api_key='123456789', cache=DiskCache(directory))
+        with mock.patch('tvdbpy.cache.open_mapped', open_mapped):
+            result = tvdb.get_series_by_id(80348, extended=True)
+            tvdb.updated()
+
+        self.assertEqual(len(result.seasons), 6)
+        self.assertEqual(self.transport.get.call_count, 2)
+        self.assertEqual(len(mapped), 2)
+        self.assertTrue(all(f.closed for f in mapped))
+
+    def test_conditional_request_not_modified(self):
+        clock = mock.Mock(return_value=0)
+        tvdb = TvDB(api_key='123456789', cache=MemoryCache(clock=clock))
+        self.response(filename='80348.zip', content_type='application/zip',
+                      headers={'ETag': '"v1"'})
+        data = tvdb._get_series_full_data(80348)
+
+        # entry expired, server says it is unchanged
+        clock.return_value = 24 * 60 * 60
+        self.response(status_code=304, content_type='')
+        result = tvdb.get_series_by_id(80348, extended=True)
+
+        self.transport.get.assert_called_with(
+            'http://thetvdb.com/api/123456789/series/80348/all/en.zip',
+            params={}, headers={'If-None-Match': '"v1"'},
+            stream=True)
+        self.assertEqual(len(result.seasons), 6)
+        # payload was not parsed again
+        self.assertIs(tvdb._get_series_full_data(80348), data)
+        self.assertEqual(self.transport.get.call_count, 2)
+        self.assertEqual(tvdb._cache.stats.revalidations, 1)
+
+    def test_conditional_request_not_modified_disk_cache(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        clock = mock.Mock(return_value=0)
+        tvdb = TvDB(api_key='123456789',
+                    cache=DiskCache(directory, clock=clock))
+        self.response(filename='80348.zip', content_type='application/zip',
+                      headers={'ETag': '"v1"'})
+        data = tvdb._get_series_full_data(80348)
+
+        clock.return_value = 24 * 60 * 60
+        self.response(status_code=304, content_type='')
+        with mock.patch.object(tvdb, '_parse_zipped_xml') as parse:
+            self.assertIs(tvdb._get_series_full_data(80348), data)
+        self.assertFalse(parse.called)
+        self.assertEqual(tvdb._cache.stats.revalidations, 1)
+
+    def test_conditional_request_modified(self):
+        clock = mock.Mock(return_value=0)
+        tvdb = TvDB(api_key='123456789', cache=MemoryCache(clock=clock))
+        self.response(filename='series.xml',
+                      headers={'Last-Modified': 'Mon, 01 Jul 2013'})
+        tvdb.get_series_by_id(321)
+
+        clock.return_value = 24 * 60 * 60
+        self.response(filename='series.xml')
+        result = tvdb.get_series_by_id(321)
+
+        self.assertEqual(result.name, 'Chuck')
+        self.transport.get.assert_called_with(
+            'http://thetvdb.com/api/123456789/series/321/en.xml',
+            params={}, headers={'If-Modified-Since': 'Mon, 01 Jul 2013'})
+        entry = tvdb._cache.get('123456789/series/321/en.xml')
+        self.assertIsNone(entry.last_modified)
+
+    def test_cache_errors_not_stored(self):
+        tvdb = TvDB(api_key='123456789', cache=MemoryCache())
+        self.response(status_code=404)
+
+        with self.assertRaises(APIResponseError):
+            tvdb.get_series_by_id(321)
+        self.assertEqual(len(tvdb._cache), 0)
+
+
+class TvDBBatchTestCase(BaseTestCase):
+    """TvDB client batch calls test case."""
+
+    base_url = 'http://thetvdb.com/api/123456789/'
+
+    def setUp(self):
+        super(TvDBBatchTestCase, self).setUp()
+        self.tvdb = TvDB(api_key='123456789')
+        self.responses({
+            self.base_url + 'series/1/en.xml': {'filename': 'series.xml'},
+            self.base_url + 'series/2/en.xml': {'filename': 'empty.xml'},
+            self.base_url + 'series/3/en.xml': {'status_code': 404},
+            self.base_url + 'series/80348/all/en.zip': {
+                'filename': '80348.zip', 'content_type': 'application/zip'},
+            self.base_url + 'episodes/332179/en.xml': {
+                'filename': 'episode.xml'},
+            self.base_url + 'series/80348/default/1/1/en.xml': {
+                'filename': 'episode.xml'},
+            self.base_url + 'episodes/5/en.xml': {'status_code': 500},
+        })
+
+    def test_get_many_series(self):
+        batch = self.tvdb.get_many_series([3, 1, 2, 1])
+
+        self.assertEqual(list(batch.results), [3, 1, 2])
+        self.assertEqual(len(batch), 3)
+        self.assertIsNone(batch[3])
+        self.assertIsInstance(batch[1], Series)
+        self.assertIsNone(batch[2])
+        self.assertEqual(list(batch.errors), [3])
+        self.assertIsInstance(batch.errors[3], APIResponseError)
+        # duplicated ids are fetched once
+        self.assertEqual(self.transport.get.call_count, 3)
+
+    def test_get_many_series_extended(self):
+        batch = self.tvdb.get_many_series([80348], extended=True)
+
+        self.assertEqual(len(batch[80348].seasons), 6)
+        self.assertEqual(batch.errors, {})
+
+    def test_iter_many_series(self):
+        results = self.tvdb.iter_many_series([1, 2, 3], max_workers=2)
+
+        results = dict((key, (r, e)) for key, r, e in results)
+        self.assertEqual(sorted(results), [1, 2, 3])
+        self.assertIsInstance(results[1][0], Series)
+        self.assertIsNone(results[1][1])
+        self.assertIsInstance(results[3][1], APIResponseError)
+
+    def test_get_many_episodes(self):
+        batch = self.tvdb.get_many_episodes([332179, (80348, 1, 1), 5])
+
+        self.assertEqual(list(batch), [batch[332179], batch[(80348, 1, 1)],
+                                       None])
+        self.assertEqual(batch[332179].id, '332179')
+        self.assertEqual(batch[(80348, 1, 1)].id, '332179')
+        self.assertEqual(list(batch.errors), [5])
+
+    def test_batch_requires_api_key(self):
+        tvdb = TvDB()
+        with self.assertRaises(APIKeyRequiredError):
+            tvdb.get_many_series([1])
+        with self.assertRaises(APIKeyRequiredError):
+            tvdb.iter_many_episodes([1])
+
+
+class TvDBLanguagesTestCase(BaseTestCase):
+    """TvDB client languages test case."""
+
+    base_url = 'http://thetvdb.com/api/123456789/'
+
+    def setUp(self):
+        super(TvDBLanguagesTestCase, self).setUp()
+        self.tvdb = TvDB(api_key='123456789')
+        self.responses({
+            self.base_url + 'series/80348/de.xml': {'filename': 'series.xml'},
+            self.base_url + 'series/80348/all/en.zip': {
+                'filename': '80348.zip', 'content_type': 'application/zip'},
+            self.base_url + 'series/80348/all/de.zip': {
+                'filename': '80348_de.zip',
+                'content_type': 'application/zip'},
+            self.base_url + 'series/80348/all/fr.zip': {'status_code': 404},
+            self.base_url + 'episodes/332179/de.xml': {
+                'filename': 'episode.xml'},
+            self.base_url + 'series/80348/default/1/1/de.xml': {
+                'filename': 'episode.xml'},
+        })
+
+    def test_default_language(self):
+        self.assertIsNone(self.tvdb.language)
+        self.assertEqual(
+            self.tvdb._series_path(80348),
+            '123456789/series/80348/en.xml')
+
+    def test_client_language(self):
+        tvdb = TvDB(api_key='123456789', language='de')
+        tvdb.get_series_by_id(80348)
+        tvdb.get_episode_by_id(332179)
+        tvdb.get_episode(80348, 1, 1)
+
+        self.assertEqual(self.transport.get.call_args_list, [
+            mock.call(self.base_url + 'series/80348/de.xml', params={}),
+            mock.call(self.base_url + 'episodes/332179/de.xml', params={}),
+            mock.call(self.base_url + 'series/80348/default/1/1/de.xml',
+                      params={}),
+        ])
+
+    def test_call_language(self):
+        tvdb = TvDB(api_key='123456789', language='fr')
+        series = tvdb.get_series_by_id(80348, extended=True, language='de')
+
+        self.assertEqual(series.language, 'de')
+        self.assertEqual(
+            series.seasons[1][1].name, 'Chuck gegen den Intersect')
+        self.transport.get.assert_called_once_with(
+            self.base_url + 'series/80348/all/de.zip', params={},
+            stream=True)
+
+    def test_search_language(self):
+        self.response(filename='getseries.xml')
+        self.tvdb.search('chuck')
+        self.tvdb.search('chuck', language='de')
+
+        self.assertEqual(self.transport.get.call_args_list, [
+            mock.call('http://thetvdb.com/api/GetSeries.php',
+                      params={'seriesname': 'chuck'}),
+            mock.call('http://thetvdb.com/api/GetSeries.php',
+                      params={'seriesname': 'chuck', 'language': 'de'}),
+        ])
+
+    def test_lazy_lookups_keep_language(self):
+        series = self.tvdb.get_series_by_id(80348, extended=True,
+                                            language='de')
+        episode = series.seasons[1][1]
+        episode._series = None
+        self.assertEqual(episode.series.id, '80348')
+        self.transport.get.assert_called_with(
+            self.base_url + 'series/80348/de.xml', params={})
+
+    def test_get_series_languages(self):
+        batch = self.tvdb.get_series_languages(
+            80348, ['en', 'de', 'fr', 'de'], extended=True)
+
+        self.assertEqual(list(batch.results), ['en', 'de', 'fr'])
+        self.assertEqual(batch['en'].language, 'en')
+        self.assertEqual(batch['de'].language, 'de')
+        self.assertIsNone(batch['fr'])
+        self.assertIsInstance(batch.errors['fr'], APIResponseError)
+        english, german = batch['en'].seasons[1][1], batch['de'].seasons[1][1]
+        self.assertEqual(english.name, 'Chuck Versus the Intersect')
+        self.assertEqual(german.name, 'Chuck gegen den Intersect')
+        # language independent values are shared between the variants
+        for attr in ('id', 'series_id', 'first_aired', 'rating',
+                     'rating_count'):
+            self.assertIs(getattr(english, attr), getattr(german, attr))
+
+    def test_variants_cached_apart(self):
+        tvdb = TvDB(api_key='123456789', cache=MemoryCache())
+        tvdb.get_series_languages(80348, ['en', 'de'], extended=True)
+        batch = tvdb.get_series_languages(80348, ['de', 'en'], extended=True)
+
+        self.assertEqual(self.transport.get.call_count, 2)
+        self.assertEqual(batch['de'].language, 'de')
+        self.assertEqual(batch['en'].language, 'en')
+
+
+class FieldCastsTestCase(unittest.TestCase):
+    """Field value parsers test case."""
+
+    def test_as_date(self):
+        self.assertEqual(as_date('2007-09-24'), date(2007, 9, 24))
+        self.assertIs(as_date('2007-09-24'), as_date('2007-09-24'))
+
+    def test_as_date_slow_path(self):
+        # not zero padded, still accepted by strptime
+        self.assertEqual(as_date('2007-9-4'), date(2007, 9, 4))
+
+    def test_as_date_invalid(self):
+        for value in ('2007-02-30', '2007-+9-24', 'not a date'):
+            self.assertRaises(ValueError, as_date, value)
+            self.assertNotIn(value, as_date.memo)
+
+    def test_as_int_and_float(self):
+        self.assertEqual(as_int('818'), 818)
+        self.assertIs(as_int('818'), as_int('818'))
+        self.assertEqual(as_float('8.8'), 8.8)
+        self.assertIs(as_float('8.8'), as_float('8.8'))
+        self.assertRaises(ValueError, as_int, '8.8')
+
+    def test_as_timestamp(self):
+        self.assertEqual(
+            as_timestamp('1234567890'), datetime(2009, 2, 13, 23, 31, 30))
+        self.assertRaises(ValueError, as_timestamp, 'abc')
+
+    def test_memo_bounded(self):
+        parse = memoized(size=2)(int)
+        for value in ('1', '2', '3'):
+            self.assertEqual(parse(value), int(value))
+        self.assertEqual(parse.memo, {'3': 3})
+
+
+class SingleFlightTestCase(BaseTestCase):
+    """Concurrent identical lookups test case."""
+
+    def setUp(self):
+        super(SingleFlightTestCase, self).setUp()
+        self.tvdb = TvDB(api_key='123456789')
+        self.release = threading.Event()
+
+    def slow_response(self, **kwargs):
+        def get(url, **params):
+            self.release.wait(5)
+            return self.make_response(**kwargs)
+        self.transport.get.side_effect = get
+
+    def run_threads(self, func, count=5):
+        results = []
+        errors = []
+
+        def target():
+            try:
+                results.append(func())
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=target) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        # let all the threads join the in-flight request
+        time.sleep(0.1)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        return results, errors
+
+    def test_shared_request(self):
+        self.slow_response(filename='series.xml')
+
+        results, errors = self.run_threads(
+            lambda: self.tvdb.get_series_by_id(80348))
+
+        self.assertEqual(errors, [])
+        self.assertEqual(self.transport.get.call_count, 1)
+        # each caller gets its own instance
+        self.assertEqual(len(set(id(r) for r in results)), 5)
+        self.assertEqual(set(r.name for r in results), set(['Chuck']))
+        self.assertEqual(self.tvdb._flights._calls, {})
+
+    def test_shared_extended_request(self):
+        self.slow_response(
+            filename='80348.zip', content_type='application/zip')
+
+        results, errors = self.run_threads(
+            lambda: self.tvdb.get_series_by_id(80348, extended=True))
+
+        self.assertEqual(self.transport.get.call_count, 1)
+        for result in results:
+            self.assertEqual(len(result.seasons), 6)
+        self.assertIsNot(results[0].seasons[1][1], results[1].seasons[1][1])
+
+    def test_shared_error(self):
+        self.slow_response(status_code=500)
+
+        results, errors = self.run_threads(
+            lambda: self.tvdb.get_series_by_id(80348))
+
+        self.assertEqual(results, [])
+        self.assertEqual(len(errors), 5)
+        self.assertEqual(self.transport.get.call_count, 1)
+
+    def test_different_paths(self):
+        self.release.set()
+        self.slow_response(filename='series.xml')
+
+        self.tvdb.get_series_by_id(1)
+        self.tvdb.get_series_by_id(2)
+        self.tvdb.get_series_by_id(1)
+
+        self.assertEqual(self.transport.get.call_count, 3)
+
+
+class TvDBObserversTestCase(BaseTestCase):
+    """Instrumentation events test case."""
+
+    def setUp(self):
+        super(TvDBObserversTestCase, self).setUp()
+        self.events = []
+        self.tvdb = TvDB(api_key='123456789', observers=[self.events.append])
+
+    def kinds(self):
+        return [event.kind for event in self.events]
+
+    def test_get_series_by_id(self):
+        self.response(filename='series.xml')
+        self.tvdb.get_series_by_id(321)
+
+        self.assertEqual(self.kinds(), ['request', 'parse'])
+        request, parse = self.events
+        self.assertEqual(request.path, '123456789/series/321/en.xml')
+        self.assertEqual(request.status, 200)
+        self.assertEqual(request.bytes, os.path.getsize(
+            os.path.join(TESTS_DIR, 'testdata', 'series.xml')))
+        self.assertGreaterEqual(request.elapsed, 0)
+        self.assertAlmostEqual(
+            request.wait + request.transfer, request.elapsed)
+        self.assertEqual((parse.model, parse.count), ('Series', 1))
+
+    def test_get_series_by_id_extended(self):
+        self.response(filename='80348.zip', content_type='application/zip')
+        self.tvdb.get_series_by_id(80348, extended=True)
+
+        self.assertEqual(self.kinds(), ['request', 'unzip', 'parse'])
+        unzip = self.events[1]
+        self.assertEqual(unzip.path, '123456789/series/80348/all/en.zip')
+        self.assertEqual(unzip.member, 'en.xml')
+        self.assertEqual(unzip.bytes, 127447)
+        self.assertLess(unzip.compressed_bytes, unzip.bytes)
+
+    def test_parse_multiple_entries(self):
+        self.response(filename='updates_since.xml')
+        self.tvdb.updated_since(1234567890)
+
+        parses = [e for e in self.events if e.kind == 'parse']
+        self.assertEqual([e.model for e in parses], ['Update', 'Update'])
+
+    def test_failed_request(self):
+        self.response(status_code=404)
+
+        with self.assertRaises(APIResponseError) as ctx:
+            self.tvdb.get_series_by_id(321)
+
+        self.assertEqual(self.kinds(), ['request'])
+        self.assertEqual(self.events[0].status, 404)
+        self.assertEqual(self.events[0].bytes, 0)
+        self.assertEqual(ctx.exception.response.status_code, 404)
+
+    def test_cache_events(self):
+        clock = mock.Mock(return_value=0)
+        self.tvdb._cache = MemoryCache(clock=clock)
+        self.response(filename='series.xml', headers={'ETag': '"v1"'})
+        self.tvdb.get_series_by_id(321)
+        self.tvdb.get_series_by_id(321)
+        clock.return_value = 24 * 60 * 60
+        self.response(status_code=304, content_type='')
+        self.tvdb.get_series_by_id(321)
+        clock.return_value = 48 * 60 * 60
+        self.response(filename='series.xml')
+        self.tvdb.get_series_by_id(321)
+
+        results = [e.result for e in self.events if e.kind == 'cache']
+        self.assertEqual(results, ['miss', 'hit', 'revalidated', 'expired'])
+        statuses = [e.status for e in self.events if e.kind == 'request']
+        self.assertEqual(statuses, [200, 304, 200])
+
+    def test_add_remove_observer(self):
+        other = []
+        self.tvdb.add_observer(other.append)
+        self.response(filename='series.xml')
+        self.tvdb.get_series_by_id(321)
+        self.tvdb.remove_observer(other.append)
+        self.tvdb.get_series_by_id(321)
+
+        self.assertEqual(len(other), 2)
+        self.assertEqual(len(self.events), 4)
+
+
+class TvDBLimitsTestCase(BaseTestCase):
+    """Request rate and concurrency limits test case."""
+
+    def setUp(self):
+        super(TvDBLimitsTestCase, self).setUp()
+        self.rate_limiter = mock.Mock()
+        self.concurrency_limiter = mock.Mock()
+        self.tvdb = TvDB(
+            api_key='123456789', rate_limiter=self.rate_limiter,
+            concurrency_limiter=self.concurrency_limiter)
+
+    def test_limited_requests(self):
+        self.response(filename='series.xml')
+        self.tvdb.get_series_by_id(321)
+        self.tvdb.get_series_by_id(322)
+
+        self.assertEqual(self.rate_limiter.acquire.call_count, 2)
+        self.assertEqual(self.concurrency_limiter.acquire.call_count, 2)
+        latency, = self.concurrency_limiter.release.call_args[0]
+        self.assertGreaterEqual(latency, 0)
+        self.assertEqual(
+            self.concurrency_limiter.release.call_args[1], {'failed': False})
+
+    def test_latency_until_headers(self):
+        response = self.make_response(
+            filename='80348.zip', content_type='application/zip')
+        response.elapsed = timedelta(seconds=1.5)
+        self.transport.get.return_value = response
+
+        # the streamed body takes 4 seconds in all
+        with mock.patch('tvdbpy.helpers.timer', side_effect=[10.0, 14.0]):
+            self.tvdb._get_compressed_entry(
+                '123456789/series/80348/all/en.zip').close()
+
+        self.concurrency_limiter.release.assert_called_once_with(
+            1.5, failed=False)
+
+    def test_not_found_is_not_throttling(self):
+        self.response(status_code=404)
+
+        with self.assertRaises(APIResponseError):
+            self.tvdb.get_series_by_id(321)
+
+        self.assertEqual(
+            self.concurrency_limiter.release.call_args[1], {'failed': False})
+
+    def test_throttled_requests(self):
+        self.response(status_code=429, headers={'Retry-After': '7'})
+
+        with self.assertRaises(APIResponseError):
+            self.tvdb.get_series_by_id(321)
+
+        self.assertEqual(
+            self.concurrency_limiter.release.call_args[1], {'failed': True})
+        self.rate_limiter.pause.assert_called_once_with(7.0)
+
+    def test_server_errors(self):
+        self.response(status_code=503,
+                      headers={'Retry-After': 'Wed, 21 Oct 2026 07:28:00 GMT'})
+
+        with self.assertRaises(APIResponseError):
+            self.tvdb.get_series_by_id(321)
+
+        self.assertEqual(
+            self.concurrency_limiter.release.call_args[1], {'failed': True})
+        self.assertFalse(self.rate_limiter.pause.called)
+
+    def test_transport_errors(self):
+        self.transport.get.side_effect = requests.ConnectionError()
+
+        with self.assertRaises(requests.ConnectionError):
+            self.tvdb.get_series_by_id(321)
+
+        self.assertEqual(
+            self.concurrency_limiter.release.call_args[1], {'failed': True})
+
+    def test_cached_responses_not_limited(self):
+        self.tvdb._cache = MemoryCache()
+        self.response(filename='series.xml')
+        self.tvdb.get_series_by_id(321)
+        self.tvdb.get_series_by_id(321)
+
+        self.assertEqual(self.rate_limiter.acquire.call_count, 1)
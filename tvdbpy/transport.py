@@ -0,0 +1,63 @@
+from __future__ import unicode_literals
+
+import threading
+
+
+class HTTPTransport(object):
+    """Persistent, pooled HTTP session used to talk to the TvDB API.
+
+    Connections are kept alive and reused between requests; transient
+    server errors are retried with exponential backoff. The session (and
+    requests) is loaded on first use.
+
+    """
+
+    retry_statuses = (500, 502, 503, 504)
+
+    def __init__(self, pool_size=10, max_retries=3, backoff_factor=0.5,
+                 timeout=10, session=None):
+        super(HTTPTransport, self).__init__()
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self._session = session
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._create_session()
+        return self._session
+
+    def _create_session(self):
+        import requests
+
+        from requests.adapters import HTTPAdapter
+        try:
+            from urllib3.util.retry import Retry
+        except ImportError:
+            from requests.packages.urllib3.util.retry import Retry
+
+        session = requests.Session()
+        retries = Retry(
+            total=self.max_retries, backoff_factor=self.backoff_factor,
+            status_forcelist=self.retry_statuses, raise_on_status=False)
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_size, pool_maxsize=self.pool_size,
+            max_retries=retries)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def get(self, url, params=None, **kwargs):
+        """Do a GET request to the given url using the pooled session."""
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.get(url, params=params, **kwargs)
+
+    def close(self):
+        """Release pooled connections."""
+        if self._session is not None:
+            self._session.close()
@@ -5,31 +5,58 @@ try:
 except ImportError:
     import urlparse
 
-import xml.etree.ElementTree as ET
-
 from collections import defaultdict
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
 from datetime import datetime
+from io import BytesIO
+from timeit import default_timer as timer
 
 from tvdbpy.errors import (
     APIClientNotAvailableError,
     TvDBException,
 )
-from tvdbpy.helpers import BaseTvDB, api_key_required
+from tvdbpy.helpers import (
+    BaseTvDB,
+    FieldSchema,
+    SingleFlight,
+    api_key_required,
+    as_date,
+    as_float,
+    as_int,
+    as_interned,
+    as_list,
+    as_interned_list,
+    as_timestamp,
+    intern,
+)
+from tvdbpy.observers import UNZIP
+from tvdbpy.parsers import get_parser
+from tvdbpy.transport import HTTPTransport
 
 
 class BaseSeries(BaseTvDB):
     """Minimum shared details for Series and SearchResult."""
 
+    __slots__ = ('id', 'imdb_id', 'name', 'aliases', 'overview', 'language',
+                 '_first_aired', 'network', '_banner')
+
+    _fields = FieldSchema(
+        ('id', 'id', as_interned),
+        ('imdb_id', 'IMDB_ID', as_interned),
+        ('name', 'SeriesName', None),
+        ('aliases', 'AliasNames', as_list),
+        ('overview', 'Overview', None),
+        ('_first_aired', 'FirstAired', as_date),
+        ('network', 'Network', as_interned),
+        ('_banner', 'banner', None),
+    )
+
     def __init__(self, xml_data, client=None):
         super(BaseSeries, self).__init__(client=client)
-        self.id = self._elem_value(xml_data, 'id')
-        self.imdb_id = self._elem_value(xml_data, 'IMDB_ID')
-        self.name = self._elem_value(xml_data, 'SeriesName')
-        self.overview = self._elem_value(xml_data, 'Overview')
-        self.language = self._elem_value(xml_data, 'language')
-        self._first_aired = self._elem_value(xml_data, 'FirstAired')
-        self.network = self._elem_value(xml_data, 'Network')
-        self._banner = self._elem_value(xml_data, 'banner')
+        self._load_fields(xml_data)
 
     def __str__(self):
         return "Series: %s" % self.name
@@ -43,39 +70,48 @@ class BaseSeries(BaseTvDB):
     @property
     def first_aired(self):
         """Return series first aired date."""
-        res = None
-        if self._first_aired is not None:
-            res = datetime.strptime(self._first_aired, "%Y-%m-%d").date()
-        return res
+        return self._first_aired
 
 
 class SearchResult(BaseSeries):
     """Series search result."""
 
+    __slots__ = ()
+
+    _fields = BaseSeries._fields + (
+        ('language', 'language', as_interned),
+    )
+
     def get_series(self, extended=False):
         if self._client is None:
             raise APIClientNotAvailableError("Missing TvDB client")
-        return self._client.get_series_by_id(self.id, extended=extended)
+        return self._client.get_series_by_id(
+            self.id, extended=extended, language=self.language)
 
 
 class Update(BaseTvDB):
     """Updates details."""
 
+    __slots__ = ('id', 'kind', 'series', 'season', 'path', 'type', 'format',
+                 'language', 'timestamp')
+
+    _fields = FieldSchema(
+        ('id', 'id', None),
+        ('series', 'Series', as_interned),
+        # next fields only make sense for banners
+        ('season', 'SeasonNum', None),
+        ('path', 'path', None),
+        ('type', 'type', as_interned),
+        ('format', 'format', as_interned),
+        ('language', 'language', as_interned),
+        ('timestamp', 'time', as_timestamp),
+    )
+    _id_fields = FieldSchema(('id', 'id', None))
+
     def __init__(self, xml_data, metadata=True, client=None):
         super(Update, self).__init__(client=client)
-        self.id = self._elem_value(xml_data, 'id')
-        self.kind = xml_data.tag.lower()
-        if metadata:
-            self.series = self._elem_value(xml_data, 'Series')
-            # next fields only make sense for banners
-            self.season = self._elem_value(xml_data, 'SeasonNum')
-            self.path = self._elem_value(xml_data, 'path')
-            self.type = self._elem_value(xml_data, 'type')
-            self.format = self._elem_value(xml_data, 'format')
-            self.language = self._elem_value(xml_data, 'language')
-            self.timestamp = self._elem_value(
-                xml_data, 'time',
-                cast=lambda v: datetime.utcfromtimestamp(int(v)))
+        self._load_fields(xml_data, None if metadata else self._id_fields)
+        self.kind = intern(xml_data.tag.lower())
 
     @classmethod
     def id_only(cls, xml_data, client=None):
@@ -83,6 +119,12 @@ class Update(BaseTvDB):
         item.id = xml_data.text
         return item
 
+    @property
+    def banner(self):
+        """Return the banner url, for banner updates."""
+        if self.kind == TvDB.BANNER and self.path:
+            return urlparse.urljoin(self._base_image_url, self.path)
+
     def get_updated_item(self, extended=False):
         if self._client is None:
             raise APIClientNotAvailableError("Missing TvDB client")
@@ -92,35 +134,91 @@ class Update(BaseTvDB):
         elif self.kind == self._client.EPISODE:
             item = self._client.get_episode_by_id(self.id)
         elif self.kind == self._client.BANNER:
-            item = urlparse.urljoin(self._base_image_url, self.path)
+            item = self.banner
         return item
 
 
+class Season(MutableMapping):
+    """Season episodes by number.
+
+    Episodes are indexed by their packed fields (or any item
+    _build_episode takes) and only built the first time they are accessed.
+
+    """
+
+    def __init__(self, series=None):
+        super(Season, self).__init__()
+        self._series = series
+        self._items = {}
+
+    def _add_xml_data(self, number, xml_data):
+        self._items[number] = xml_data
+
+    def _build_episode(self, item):
+        client = getattr(self._series, '_client', None)
+        return Episode(Episode._fields.unpack('Episode', item),
+                       series=self._series, client=client)
+
+    def __getitem__(self, number):
+        item = self._items[number]
+        if not isinstance(item, Episode):
+            item = self._build_episode(item)
+            self._items[number] = item
+        return item
+
+    def __setitem__(self, number, episode):
+        self._items[number] = episode
+
+    def __delitem__(self, number):
+        del self._items[number]
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __repr__(self):
+        return 'Season(%s)' % sorted(self._items)
+
+
 class Series(BaseSeries):
     """Series details."""
 
+    __slots__ = ('runtime', 'status', '_poster', 'actors', 'genre', 'rating',
+                 'rating_count', '_seasons', '_episode_requests')
+
+    # single episode requests made before loading all the episodes at once
+    zip_threshold = 3
+
+    _fields = BaseSeries._fields + (
+        ('language', 'Language', as_interned),
+        ('runtime', 'Runtime', as_interned),
+        ('status', 'Status', as_interned),
+        ('_poster', 'poster', None),
+        ('actors', 'Actors', as_interned_list),
+        ('genre', 'Genre', as_interned_list),
+        ('rating', 'Rating', as_float),
+        ('rating_count', 'RatingCount', as_int),
+    )
+
     def __init__(self, xml_data, client=None):
         super(Series, self).__init__(xml_data, client=client)
-        self.runtime = self._elem_value(xml_data, 'Runtime')
-        self.status = self._elem_value(xml_data, 'Status')
-        self._poster = self._elem_value(xml_data, 'poster')
-        self.actors = self._elem_list_value(xml_data, 'Actors')
-        self.genre = self._elem_list_value(xml_data, 'Genre')
-        self.rating = self._elem_value(xml_data, 'Rating', cast=float)
-        self.rating_count = self._elem_value(xml_data, 'RatingCount', cast=int)
         self._seasons = None
+        self._episode_requests = 0
 
     def _load_episodes(self, data=None):
         # assert client is not None
         if data is None:
-            data = self._client._get_series_full_data(self.id)
-        episodes = self._client._parse_multiple_entries(
-            data, Episode, './Episode')
-        self._seasons = defaultdict(dict)
-        for e in episodes:
-            # need to set series into Episode
-            e._series = self
-            self._seasons[e.season][e.number] = e
+            data = self._client._get_series_full_data(
+                self.id, language=self.language)
+        self._seasons = defaultdict(lambda: Season(self))
+        for xml_data in data.findall('./Episode'):
+            season = self._elem_value(xml_data, 'SeasonNumber', cast=int)
+            number = self._elem_value(xml_data, 'EpisodeNumber', cast=int)
+            # the elements (and so the parsed tree) are not kept
+            self._seasons[season]._add_xml_data(
+                number, Episode._fields.pack(xml_data))
 
     @property
     def poster(self):
@@ -136,35 +234,62 @@ class Series(BaseSeries):
         return self._seasons
 
     def get_episode(self, season, number):
-        """Return episode details."""
-        if self._episodes:
-            episode = self._seasons.get(season, {}).get(number)
-        else:
-            episode = self._client.get_episode(self.id, season, number)
-        return episode
+        """Return episode details.
+
+        Until the series episodes are loaded, episodes are requested one
+        by one; after `zip_threshold` such requests, all the episodes are
+        loaded from the series full data instead.
+
+        """
+        if (self._seasons is None and
+                self._episode_requests < self.zip_threshold):
+            self._episode_requests += 1
+            return self._client.get_episode(
+                self.id, season, number, language=self.language)
+        return self.seasons.get(season, {}).get(number)
+
+    def get_episodes(self, keys):
+        """Return the episodes for the given (season, number) pairs.
+
+        All the series episodes are loaded at once, if needed; missing
+        episodes are returned as None.
+
+        """
+        seasons = self.seasons
+        return [seasons.get(season, {}).get(number)
+                for season, number in keys]
 
 
 class Episode(BaseTvDB):
     """Episode details."""
 
+    __slots__ = ('_series', 'id', 'imdb_id', 'series_id', 'number', 'season',
+                 'name', 'overview', 'guest_stars', 'director', 'writers',
+                 'language', '_image', '_first_aired', 'rating',
+                 'rating_count')
+
+    _fields = FieldSchema(
+        ('id', 'id', as_interned),
+        ('imdb_id', 'IMDB_ID', as_interned),
+        ('series_id', 'seriesid', as_interned),
+        ('number', 'EpisodeNumber', as_int),
+        ('season', 'SeasonNumber', as_int),
+        ('name', 'EpisodeName', None),
+        ('overview', 'Overview', None),
+        ('guest_stars', 'GuestStars', as_interned_list),
+        ('director', 'Director', as_interned),
+        ('writers', 'Writer', as_interned_list),
+        ('language', 'Language', as_interned),
+        ('_image', 'filename', None),
+        ('_first_aired', 'FirstAired', as_date),
+        ('rating', 'Rating', as_float),
+        ('rating_count', 'RatingCount', as_int),
+    )
+
     def __init__(self, xml_data, series=None, client=None):
         super(Episode, self).__init__(client=client)
         self._series = series
-        self.id = self._elem_value(xml_data, 'id')
-        self.imdb_id = self._elem_value(xml_data, 'IMDB_ID')
-        self.series_id = self._elem_value(xml_data, 'seriesid')
-        self.number = self._elem_value(xml_data, 'EpisodeNumber', cast=int)
-        self.season = self._elem_value(xml_data, 'SeasonNumber', cast=int)
-        self.name = self._elem_value(xml_data, 'EpisodeName')
-        self.overview = self._elem_value(xml_data, 'Overview')
-        self.guest_stars = self._elem_list_value(xml_data, 'GuestStars')
-        self.director = self._elem_value(xml_data, 'Director')
-        self.writers = self._elem_list_value(xml_data, 'Writer')
-        self.language = self._elem_value(xml_data, 'Language')
-        self._image = self._elem_value(xml_data, 'filename')
-        self._first_aired = self._elem_value(xml_data, 'FirstAired')
-        self.rating = self._elem_value(xml_data, 'Rating', cast=float)
-        self.rating_count = self._elem_value(xml_data, 'RatingCount', cast=int)
+        self._load_fields(xml_data)
 
     def __str__(self):
         return "Episode: %s" % self.name
@@ -173,16 +298,14 @@ class Episode(BaseTvDB):
     def series(self):
         """Return episode related series."""
         if self._series is None:
-            self._series = self._client.get_series_by_id(self.series_id)
+            self._series = self._client.get_series_by_id(
+                self.series_id, language=self.language)
         return self._series
 
     @property
     def first_aired(self):
         """Return episode first aired date."""
-        res = None
-        if self._first_aired is not None:
-            res = datetime.strptime(self._first_aired, "%Y-%m-%d").date()
-        return res
+        return self._first_aired
 
     @property
     def image(self):
@@ -204,18 +327,113 @@ class TvDB(BaseTvDB):
     EPISODE = 'episode'
     BANNER = 'banner'
 
-    def __init__(self, api_key=None):
+    default_language = 'en'
+
+    def __init__(self, api_key=None, transport=None, cache=None,
+                 observers=None, rate_limiter=None, concurrency_limiter=None,
+                 language=None, parser=None):
         super(TvDB, self).__init__(client=None)
         self._api_key = api_key
+        self.language = language
+        self._parser = get_parser(parser)
+        if transport is None:
+            transport = HTTPTransport()
+        self._transport = transport
+        self._cache = cache
+        self._flights = SingleFlight()
+        self._observers = list(observers or [])
+        self._rate_limiter = rate_limiter
+        self._concurrency_limiter = concurrency_limiter
+
+    def add_observer(self, observer):
+        """Call observer with each instrumentation Event."""
+        self._observers.append(observer)
+
+    def remove_observer(self, observer):
+        self._observers.remove(observer)
+
+    def _language(self, language=None):
+        """Return the language to use: the given, client or default one."""
+        return language or self.language or self.default_language
+
+    def _series_path(self, series_id, extended=False, language=None):
+        language = self._language(language)
+        if extended:
+            return '%s/series/%s/all/%s.zip' % (
+                self._api_key, series_id, language)
+        return '%s/series/%s/%s.xml' % (self._api_key, series_id, language)
+
+    def _episode_path(self, episode_id, language=None):
+        return '%s/episodes/%s/%s.xml' % (
+            self._api_key, episode_id, self._language(language))
+
+    def _episode_number_path(self, series_id, season, number, language=None):
+        return '%s/series/%s/default/%s/%s/%s.xml' % (
+            self._api_key, series_id, season, number,
+            self._language(language))
+
+    def _updates_path(self, timeframe):
+        if timeframe not in [TvDB.DAY, TvDB.WEEK, TvDB.MONTH, TvDB.ALL]:
+            raise TvDBException('Invalid timeframe specified')
+        return '%s/updates/updates_%s.zip' % (self._api_key, timeframe)
 
-    def _get_series_full_data(self, series_id):
-        """Return full series XML data."""
-        path = '%s/series/%s/all/en.zip' % (self._api_key, series_id)
-        response = self._get_compressed_data(path)
-        xml_file = response.read('en.xml')
-        data = ET.fromstring(xml_file)
+    def _updates_since_path(self, timestamp, kind):
+        if kind not in [TvDB.SERIES, TvDB.EPISODE, TvDB.ALL]:
+            raise TvDBException('Invalid kind specified')
+        return 'Updates.php?type=%s&time=%s' % (kind, str(timestamp))
+
+    def _unzip_xml(self, content, filename, path=None):
+        """Return the parsed XML file from the zipped content."""
+        return self._parse_zipped_xml(BytesIO(content), filename, path)
+
+    def _parse_zipped_xml(self, zipped_file, filename, path=None):
+        """Return the parsed XML file from a zip file object.
+
+        The file is decompressed as it is parsed, instead of being read
+        in memory beforehand.
+
+        """
+        import zipfile
+
+        start = timer()
+        with zipfile.ZipFile(zipped_file) as response:
+            with response.open(filename) as xml_file:
+                data = self._parser.parse(xml_file)
+            info = response.getinfo(filename)
+        self._emit(
+            UNZIP, path=path, member=filename,
+            compressed_bytes=info.compress_size, bytes=info.file_size,
+            elapsed=timer() - start)
         return data
 
+    def _get_series_full_data(self, series_id, language=None):
+        """Return full series XML data.
+
+        Concurrent requests for the same series (and language) share a
+        single request and parse; the returned data must not be modified.
+
+        """
+        language = self._language(language)
+        path = self._series_path(series_id, extended=True, language=language)
+        return self._flights.do(
+            path, self._fetch_series_full_data, path, '%s.xml' % language)
+
+    def _fetch_series_full_data(self, path, filename):
+        entry = self._get_compressed_entry(path)
+        try:
+            cache = self._cache
+            if cache is None:
+                return self._parse_zipped_xml(entry.open(), filename, path)
+            # unchanged (cached or revalidated) payloads keep their data
+            key = cache.make_key(path)
+            data = cache.get_parsed(key, entry)
+            if data is None:
+                data = self._parse_zipped_xml(entry.open(), filename, path)
+                cache.set_parsed(key, entry, data)
+            return data
+        finally:
+            entry.close()
+
     def _parse_full_series(self, data):
         """Parse XML response and return expected cls instance(s)."""
         series = self._parse_entry(data, Series, './Series')
@@ -223,65 +441,217 @@ class TvDB(BaseTvDB):
             series._load_episodes(data)
         return series
 
-    def search(self, title):
+    def _parse_updates(self, data):
+        return self._parse_multiple_entries(data, Update, './')
+
+    def _parse_updates_since(self, data):
+        series = self._parse_multiple_entries(
+            data, Update.id_only, './Series')
+        episodes = self._parse_multiple_entries(
+            data, Update.id_only, './Episode')
+        return series + episodes
+
+    def search(self, title, language=None):
         """Search for series with the specified title."""
-        response = self._get_xml_data('GetSeries.php', seriesname=title)
+        params = {'seriesname': title}
+        language = language or self.language
+        if language:
+            params['language'] = language
+        response = self._get_xml_data('GetSeries.php', **params)
         return self._parse_multiple_entries(response, SearchResult, './Series')
 
     @api_key_required
-    def get_series_by_id(self, series_id, extended=False):
+    def get_series_by_id(self, series_id, extended=False, language=None):
         """Get Series detail by series id."""
         if extended:
-            data = self._get_series_full_data(series_id)
+            data = self._get_series_full_data(series_id, language)
             series = self._parse_full_series(data)
         else:
-            path = '%s/series/%s/en.xml' % (self._api_key, series_id)
+            path = self._series_path(series_id, language=language)
             response = self._get_xml_data(path)
             series = self._parse_entry(response, Series, './Series')
         return series
 
     @api_key_required
-    def get_episode_by_id(self, episode_id):
+    def get_episode_table(self, series_id, language=None):
+        """Get a series episodes as an EpisodeTable (see tvdbpy.table).
+
+        The table is built from the series full data, the episodes are
+        only built for the rows asked for.
+
+        """
+        from tvdbpy.table import EpisodeTable
+
+        data = self._get_series_full_data(series_id, language)
+        series = self._parse_entry(data, Series, './Series')
+        return EpisodeTable.from_xml(data, series=series, client=self)
+
+    @api_key_required
+    def get_episode_by_id(self, episode_id, language=None):
         """Get Episode details by episode id."""
-        path = '%s/episodes/%s/en.xml' % (self._api_key, episode_id)
+        path = self._episode_path(episode_id, language)
         response = self._get_xml_data(path)
         return self._parse_entry(response, Episode, './Episode')
 
     @api_key_required
-    def get_episode(self, series_id, season, number):
+    def get_episode(self, series_id, season, number, language=None):
         """Get Episode details by season/number."""
-        path = '%s/series/%s/default/%s/%s/en.xml' % (
-            self._api_key, series_id, season, number)
+        path = self._episode_number_path(series_id, season, number, language)
         response = self._get_xml_data(path)
         return self._parse_entry(response, Episode, './Episode')
 
+    @api_key_required
+    def get_series_episodes(self, series_id, keys, language=None):
+        """Get Episode details for several (season, number) pairs.
+
+        The series full data is fetched once, instead of doing a request
+        per episode; missing episodes are returned as None.
+
+        """
+        series = self.get_series_by_id(
+            series_id, extended=True, language=language)
+        if series is None:
+            return [None for key in keys]
+        return series.get_episodes(keys)
+
+    @api_key_required
+    def get_series_languages(self, series_id, languages, extended=False,
+                             max_workers=None):
+        """Get Series details in several languages concurrently.
+
+        Return a BatchResult keyed by language, as get_many_series. Each
+        variant is requested (and cached) apart; ids, numbering, dates and
+        ratings are shared between the variants instead of duplicated.
+
+        """
+        return self._get_batch(
+            lambda language: self.get_series_by_id(
+                series_id, extended, language),
+            languages, max_workers=max_workers)
+
+    @api_key_required
+    def get_many_series(self, series_ids, extended=False, max_workers=None,
+                        language=None):
+        """Get Series details for several series ids concurrently.
+
+        Return a BatchResult with the series in input order (duplicated
+        ids are fetched once); failed lookups are reported in its errors.
+
+        """
+        return self._get_batch(
+            lambda series_id: self.get_series_by_id(
+                series_id, extended, language),
+            series_ids, max_workers=max_workers)
+
+    @api_key_required
+    def iter_many_series(self, series_ids, extended=False, max_workers=None,
+                         language=None):
+        """Yield (series_id, series, error) as concurrent lookups complete."""
+        return self._iter_batch(
+            lambda series_id: self.get_series_by_id(
+                series_id, extended, language),
+            series_ids, max_workers=max_workers)
+
+    def _get_episode_by_key(self, key, language=None):
+        """Get Episode details by id or (series_id, season, number)."""
+        if isinstance(key, tuple):
+            return self.get_episode(*key, language=language)
+        return self.get_episode_by_id(key, language)
+
+    @api_key_required
+    def get_many_episodes(self, keys, max_workers=None, language=None):
+        """Get Episode details for several episodes concurrently.
+
+        Episodes are given by id or by (series_id, season, number) tuples.
+        Return a BatchResult, as get_many_series.
+
+        """
+        return self._get_batch(
+            lambda key: self._get_episode_by_key(key, language),
+            keys, max_workers=max_workers)
+
+    @api_key_required
+    def iter_many_episodes(self, keys, max_workers=None, language=None):
+        """Yield (key, episode, error) as concurrent lookups complete."""
+        return self._iter_batch(
+            lambda key: self._get_episode_by_key(key, language),
+            keys, max_workers=max_workers)
+
     @api_key_required
     def updated(self, timeframe=None):
         """Get details about updated items in a given timeframe."""
         if timeframe is None:
             timeframe = TvDB.DAY
 
-        if timeframe not in [TvDB.DAY, TvDB.WEEK, TvDB.MONTH, TvDB.ALL]:
-            raise TvDBException('Invalid timeframe specified')
+        path = self._updates_path(timeframe)
+        entry = self._get_compressed_entry(path)
+        try:
+            data = self._parse_zipped_xml(
+                entry.open(), 'updates_%s.xml' % timeframe, path)
+        finally:
+            entry.close()
+        return self._parse_updates(data)
 
-        path = '%s/updates/updates_%s.zip' % (self._api_key, timeframe)
-        response = self._get_compressed_data(path)
-        xml_file = response.read('updates_%s.xml' % timeframe)
-        data = ET.fromstring(xml_file)
-        return self._parse_multiple_entries(data, Update, './')
+    @api_key_required
+    def iter_updated(self, timeframe=None, kind=None, since=None):
+        """Yield updated items in a given timeframe, parsed incrementally.
+
+        The zipped updates file is decompressed and parsed as a stream,
+        so memory use does not grow with the timeframe size. Items can be
+        filtered by `kind` (series, episode or banner) and by a minimum
+        `since` timestamp (a datetime or a unix timestamp).
+
+        """
+        if timeframe is None:
+            timeframe = TvDB.DAY
+
+        if kind not in [None, TvDB.SERIES, TvDB.EPISODE, TvDB.BANNER]:
+            raise TvDBException('Invalid kind specified')
+
+        if isinstance(since, datetime):
+            import calendar
+
+            since = calendar.timegm(since.utctimetuple())
+
+        path = self._updates_path(timeframe)
+        return self._iter_updates(
+            path, 'updates_%s.xml' % timeframe, kind, since)
+
+    def _iter_updates(self, path, filename, kind=None, since=None):
+        """Incrementally parse a zipped updates file, yielding Updates.
+
+        The file is only requested once iterated; the zip file and the
+        response payload file are closed once done (or once the generator
+        is closed).
+
+        """
+        import zipfile
+
+        entry = None
+        try:
+            entry = self._get_compressed_entry(path)
+            with zipfile.ZipFile(entry.open()) as zip_file:
+                with zip_file.open(filename) as xml_file:
+                    for elem in self._parser.iterrecords(xml_file):
+                        if self._update_matches(elem, kind, since):
+                            yield Update(elem, client=self)
+        finally:
+            if entry is not None:
+                entry.close()
+
+    def _update_matches(self, elem, kind, since):
+        if kind is not None and elem.tag.lower() != kind:
+            return False
+        if since is not None:
+            timestamp = self._elem_value(elem, 'time', cast=int)
+            return timestamp is not None and timestamp >= since
+        return True
 
     def updated_since(self, timestamp, kind=None):
         """Get updated item ids since a given timestamp."""
         if kind is None:
             kind = TvDB.ALL
 
-        if kind not in [TvDB.SERIES, TvDB.EPISODE, TvDB.ALL]:
-            raise TvDBException('Invalid kind specified')
-
-        path = 'Updates.php?type=%s&time=%s' % (kind, str(timestamp))
+        path = self._updates_since_path(timestamp, kind)
         response = self._get_xml_data(path)
-        series = self._parse_multiple_entries(
-            response, Update.id_only, './Series')
-        episodes = self._parse_multiple_entries(
-            response, Update.id_only, './Episode')
-        return series + episodes
+        return self._parse_updates_since(response)